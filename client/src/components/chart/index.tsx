@@ -1,8 +1,7 @@
 import { useEffect, useRef, useState } from "react";
-import { instrumentService, type Tick } from "../../services/instruments-service";
+import { decodePriceColumns, instrumentService, type Tick } from "../../services/instruments-service";
 import { CandlestickSeries, ColorType, createChart, type ISeriesApi } from "lightweight-charts";
 import { ticksToMinuteCandles } from "../../utils/converters";
-import { useAsync } from "../../hooks/useAsync";
 import { io } from "socket.io-client";
 import { config } from "../../config";
 import styles from './styles.module.css'
@@ -15,6 +14,24 @@ interface ChartProps {
   setMinutesCount: (newValue: number) => void,
 }
 
+type LiveTick = Tick & { seq: number }
+
+type PriceEvent = LiveTick & { instrument: string }
+
+type Snapshot = {
+  instrument: string,
+  stream: string | null,
+  seq: number | null,
+  complete: boolean,
+  columns: ArrayBuffer,
+}
+
+type Deltas = {
+  instrument: string,
+  stream: string,
+  ticks: LiveTick[],
+}
+
 const socket = io(config.backendAddress, { transports: ["websocket"] });
 
 export function Chart({ instrument, height=500, minutesCount, setMinutesCount } : ChartProps) {
@@ -23,7 +40,58 @@ export function Chart({ instrument, height=500, minutesCount, setMinutesCount }
 
   const [minutes, setMinutes] = useState<Tick[]>([])
 
-  const { reload } = useAsync(async () => setMinutes(await instrumentService.getData(instrument, minutesCount)), [instrument])
+  // Read by the socket handlers, which are registered once
+  const instrumentRef = useRef(instrument)
+  const minutesCountRef = useRef(minutesCount)
+  minutesCountRef.current = minutesCount
+
+  // Where the chart is in the instrument's tick sequence, to resume from after a reconnect
+  const streamRef = useRef<string | null>(null)
+  const lastSeqRef = useRef(0)
+  // Live ticks that arrive while a snapshot or the missed ticks are on the way
+  const catchingUpRef = useRef(false)
+  const pendingRef = useRef<LiveTick[]>([])
+
+  const requestSnapshot = () => {
+    streamRef.current = null
+    lastSeqRef.current = 0
+    catchingUpRef.current = true
+    pendingRef.current = []
+    socket.emit("subscribe", { instrument: instrumentRef.current, minutes: minutesCountRef.current })
+  }
+
+  // The ticks after lastSeq as "deltas", or a snapshot when the server no longer has them
+  const requestMissed = (pending: LiveTick[] = []) => {
+    catchingUpRef.current = true
+    pendingRef.current = pending
+    socket.emit("subscribe", {
+      instrument: instrumentRef.current,
+      stream: streamRef.current,
+      since_seq: lastSeqRef.current,
+      minutes: minutesCountRef.current,
+    })
+  }
+
+  const appendTicks = (ticks: LiveTick[]) => {
+    const fresh: Tick[] = []
+
+    const sorted = [...ticks].sort((a, b) => a.seq - b.seq)
+    for (let i = 0; i < sorted.length; i++) {
+      const tick = sorted[i]
+      if (tick.seq <= lastSeqRef.current) continue
+
+      if (streamRef.current !== null && tick.seq > lastSeqRef.current + 1) {
+        // Lost on the way (conflated for a slow client, dropped by a full queue or the message bus)
+        requestMissed(sorted.slice(i))
+        break
+      }
+
+      lastSeqRef.current = tick.seq
+      fresh.push({ timestamp: tick.timestamp, price: tick.price })
+    }
+
+    if (fresh.length > 0) setMinutes(old => [...old, ...fresh])
+  }
 
   useEffect(() => {
     const container = chartContainerRef.current
@@ -81,26 +149,79 @@ export function Chart({ instrument, height=500, minutesCount, setMinutesCount }
   useEffect(() => {
     socket.on("connect", () => {
       console.log("connected:", socket.id)
-      socket.emit("subscribe", { instrument })
+
+      // Without a stream the chart has nothing to resume from, a snapshot is still on the way
+      if (streamRef.current !== null) {
+        requestMissed()
+      } else {
+        requestSnapshot()
+      }
     })
 
     socket.on("disconnect", (reason) => {
       console.log("disconnected:", reason)
     })
 
-    socket.on("price", (tick) => {
-      setMinutes(old => [...old, tick])
+    socket.on("snapshot", (snapshot: Snapshot) => {
+      if (snapshot.instrument !== instrumentRef.current) return
+
+      // Newest first on the wire
+      const ticks = decodePriceColumns(snapshot.columns).reverse()
+
+      streamRef.current = snapshot.stream
+      lastSeqRef.current = snapshot.seq ?? 0
+      catchingUpRef.current = false
+      setMinutes(ticks)
+
+      const pending = pendingRef.current
+      pendingRef.current = []
+      appendTicks(pending)
+
+      if (!snapshot.complete) {
+        // The server's memory does not reach back to the lookback, the older part comes from the database
+        const oldest = ticks.length > 0 ? ticks[0].timestamp : Infinity
+        instrumentService.getData(snapshot.instrument, minutesCountRef.current).then(history => {
+          if (snapshot.instrument !== instrumentRef.current) return
+
+          const older = history.filter(tick => tick.timestamp < oldest).reverse()
+          setMinutes(old => [...older, ...old])
+        })
+      }
+    })
+
+    socket.on("deltas", (deltas: Deltas) => {
+      if (deltas.instrument !== instrumentRef.current || deltas.stream !== streamRef.current) return
+
+      const pending = pendingRef.current
+      pendingRef.current = []
+      catchingUpRef.current = false
+
+      appendTicks([...deltas.ticks, ...pending])
+    })
+
+    socket.on("price", ({ instrument, ...tick }: PriceEvent) => {
+      if (instrument !== instrumentRef.current) return
+
+      if (catchingUpRef.current) {
+        pendingRef.current.push(tick)
+        return
+      }
+
+      appendTicks([tick])
     })
 
     return () => {
       socket.off("connect");
       socket.off("disconnect");
+      socket.off("snapshot");
+      socket.off("deltas");
       socket.off("price");
     }
   }, [])
 
   useEffect(() => {
-    socket.emit("subscribe", { instrument })
+    instrumentRef.current = instrument
+    if (socket.connected) requestSnapshot()
 
     return () => {
       socket.emit("unsubscribe", { instrument });
@@ -113,7 +234,7 @@ export function Chart({ instrument, height=500, minutesCount, setMinutesCount }
         <h3>Minutes lookback</h3>
         <div className={styles.minutes}>
           <input value={minutesCount} onChange={(e) => {setMinutesCount(Number(e.target.value))}} />
-          <Button onClick={() => reload()}>Reload</Button>
+          <Button onClick={() => requestSnapshot()}>Reload</Button>
         </div>
       </div>
       <div ref={chartContainerRef} />
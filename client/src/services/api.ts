@@ -26,12 +26,26 @@ class ApiService {
     async delete<T>(path: string, data?: RequestData) {
         return request<T>("DELETE", path, data)
     }
+
+    async getArrayBuffer(path: string, data?: RequestData) {
+        const response = await send("GET", path, data)
+        return await response.arrayBuffer()
+    }
 }
 
 async function request<T>(
     method: "GET" | "POST" | "PUT" | "PATCH" | "DELETE",
     path: string,
     data?: RequestData,
+) {
+    const response = await send(method, path, data)
+    return await response.json() as T
+}
+
+async function send(
+    method: "GET" | "POST" | "PUT" | "PATCH" | "DELETE",
+    path: string,
+    data?: RequestData,
 ) {
     const url = new URL(
         config.backendAddress.replace(/^\/+|\/+$/g, "") + "/" + path.replace(/^\/+|\/+$/g, ""),
@@ -60,8 +74,7 @@ async function request<T>(
         throw new Error("Unsuccessful response")
     }
 
-    return await response.json() as T
-
+    return response
 }
 
 export const api = new ApiService()
@@ -1,13 +1,43 @@
 import { api } from "./api"
 
+export interface IndicatorPoint {
+  value: number
+  timestamp: number
+}
+
+export interface IndicatorSpec {
+  type: "hurst" | "permutation-entropy" | "multiscale-permutation-entropy"
+  [param: string]: unknown
+}
+
+export interface IndicatorResult {
+  spec: IndicatorSpec
+  value?: number | number[]
+  error?: string
+}
+
 class IndicatorService {
   async getHurst(instrument: string, minutes: number, workers: number) {
     return await api.get<number>(`/instruments/${instrument}/hurst?minutes=${minutes}&workers=${workers}`)
   }
 
+  async getLiveHurst(instrument: string) {
+    return await api.get<number>(`/instruments/${instrument}/hurst/live`)
+  }
+
   async getPermutationEntropy(instrument: string, minutes: number, workers: number) {
     return await api.get<number>(`/instruments/${instrument}/permutation-entropy?minutes=${minutes}&workers=${workers}`)
   }
+
+  async getIndicators(instrument: string, minutes: number, indicators: IndicatorSpec[]) {
+    return await api.post<IndicatorResult[]>(`/instruments/${instrument}/indicators`, {
+      body: { minutes, indicators },
+    })
+  }
+
+  async getLivePermutationEntropy(instrument: string, points: number) {
+    return await api.get<IndicatorPoint[]>(`/instruments/${instrument}/permutation-entropy/live?points=${points}`)
+  }
 }
 
 export const indicatorService = new IndicatorService()
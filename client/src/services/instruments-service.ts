@@ -5,9 +5,56 @@ export type Tick = {
   price: number;
 };
 
+export type Resolution = "1m" | "5m" | "15m" | "1h" | "1d";
+
+export type Bar = {
+  timestamp: number;
+  open: number;
+  high: number;
+  low: number;
+  close: number;
+  tick_count: number;
+};
+
+const PRICE_COLUMNS_MEDIA_TYPE = "application/vnd.pytrade.price-columns"
+const PRICE_COLUMNS_HEADER_BYTES = 12
+
+// "PTC1", uint32 count, uint32 price scale, int64 epoch ms x count, int32 scaled price x count, little-endian
+export function decodePriceColumns(buffer: ArrayBuffer): Tick[] {
+    const view = new DataView(buffer)
+    const count = view.getUint32(4, true)
+    const priceScale = view.getUint32(8, true)
+    const pricesOffset = PRICE_COLUMNS_HEADER_BYTES + count * 8
+
+    const ticks: Tick[] = new Array(count)
+    for (let i = 0; i < count; i++) {
+        ticks[i] = {
+            timestamp: Math.floor(Number(view.getBigInt64(PRICE_COLUMNS_HEADER_BYTES + i * 8, true)) / 1000),
+            price: view.getInt32(pricesOffset + i * 4, true) / priceScale,
+        }
+    }
+
+    return ticks
+}
+
 class InstrumentService {
     async getData(instrument: string, minutes: number) {
-        return await api.get<Tick[]>(`/instruments/${instrument}?minutes=${minutes}`)
+        const buffer = await api.getArrayBuffer(`/instruments/${instrument}`, {
+            queryParams: { minutes },
+            headers: { Accept: PRICE_COLUMNS_MEDIA_TYPE },
+        })
+
+        return decodePriceColumns(buffer)
+    }
+
+    async getBars(instrument: string, resolution: Resolution, from?: number, to?: number) {
+        return await api.get<Bar[]>(`/instruments/${instrument}/bars`, {
+            queryParams: {
+                resolution,
+                ...(from !== undefined ? { from } : {}),
+                ...(to !== undefined ? { to } : {}),
+            },
+        })
     }
 }
 
@@ -0,0 +1,43 @@
+"""create instrument_bars table
+
+Revision ID: 5d2f8e61a3c7
+Revises: c4e1a7d2b9f0
+Create Date: 2026-10-18 11:03:17.204586
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2f8e61a3c7'
+down_revision: Union[str, Sequence[str], None] = 'c4e1a7d2b9f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('instrument_bars',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('instrument_id', sa.Integer(), nullable=False),
+    sa.Column('resolution', sa.String(length=8), nullable=False),
+    sa.Column('start', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('open', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('high', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('low', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('close', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('tick_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['instrument_id'], ['instruments.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('instrument_id', 'resolution', 'start', name='uq_instrument_bars_instrument_id_resolution_start')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('instrument_bars')
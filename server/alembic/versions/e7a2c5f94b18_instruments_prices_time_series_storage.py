@@ -0,0 +1,52 @@
+"""instruments_prices time series storage
+
+Revision ID: e7a2c5f94b18
+Revises: 5d2f8e61a3c7
+Create Date: 2026-10-18 15:42:08.531274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.partitions import PRICES_PARTITIONING, partition_prices_table, unpartition_prices_table
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a2c5f94b18'
+down_revision: Union[str, Sequence[str], None] = '5d2f8e61a3c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column('instruments_prices', 'price',
+               existing_type=sa.Numeric(precision=10, scale=2),
+               type_=sa.Integer(),
+               postgresql_using='round(price * 100)::integer',
+               existing_nullable=False)
+    op.alter_column('instruments_prices', 'price', new_column_name='price_ticks')
+
+    op.drop_index(op.f('ix_instruments_prices_instrument_id'), table_name='instruments_prices')
+    op.create_index('ix_instruments_prices_instrument_id_created_at', 'instruments_prices', ['instrument_id', 'created_at'], unique=False)
+
+    # Opt-in, set INSTRUMENTS_PRICES_PARTITIONING=daily (or run `python3 -m app.db.partitions partition` later)
+    if PRICES_PARTITIONING == "daily":
+        partition_prices_table(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    unpartition_prices_table(op.get_bind())
+
+    op.drop_index('ix_instruments_prices_instrument_id_created_at', table_name='instruments_prices')
+    op.create_index(op.f('ix_instruments_prices_instrument_id'), 'instruments_prices', ['instrument_id'], unique=False)
+
+    op.alter_column('instruments_prices', 'price_ticks', new_column_name='price')
+    op.alter_column('instruments_prices', 'price',
+               existing_type=sa.Integer(),
+               type_=sa.Numeric(precision=10, scale=2),
+               postgresql_using='price / 100.0',
+               existing_nullable=False)
@@ -0,0 +1,307 @@
+import asyncio
+import json
+import os
+import traceback
+
+from app.models.instrument import InstrumentNameEnum
+from app.models.instrument_price import PRICE_TICK_SCALE
+from app.services.instrument_ids import load_instrument_ids
+from app.services.instruments import (
+    iter_price_history_json_async,
+    load_instrument_price_columns_async,
+    open_instrument_price_batches_async,
+    price_history_from_columns,
+)
+from app.price_generator import register_price_update_callback, start_price_generation
+from app.db.partitions import start_partition_maintenance
+from app.services.indicator_cache import invalidate_indicator_cache
+from app.services.indicators import instrument_hurst_async, instrument_permutation_entropy_async
+from app.services.price_store import load_price_store
+from app.services.streaming_hurst import seed_streaming_hurst
+from app.services.streaming_permutation_entropy import seed_rolling_permutation_entropy
+from app.services.worker_pool import start_worker_pool
+from app.services.response_versions import indicator_etag, price_history_etag
+from app.utils.http_caching import body_etag, etag_matches, format_weak_etag
+from app.utils.http_streaming import LAST_CHUNK, StreamingResponse, chunk_frame
+from app.utils.price_columns import PRICE_COLUMNS_MEDIA_TYPE, accepts_price_columns, encode_price_columns
+from app.selector_server import (
+    HOST,
+    KEEP_ALIVE_TIMEOUT,
+    MAX_KEEP_ALIVE_REQUESTS,
+    MAX_REQUEST_BODY_BYTES,
+    MAX_REQUEST_HEADER_BYTES,
+    PORT,
+    REQUEST_READ_TIMEOUT,
+    build_http_response,
+    build_streaming_response,
+    handle_http_request,
+    on_price_update,
+    parse_http_request,
+    parse_request_head,
+    supports_chunked,
+    wants_keep_alive,
+    with_connection_header,
+)
+
+# Pending connections the kernel queues while the loop is busy
+LISTEN_BACKLOG = int(os.getenv("ASYNC_SERVER_BACKLOG", 4096))
+
+
+async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """
+    One coroutine per connection. An idle keep-alive connection is just a coroutine
+    waiting on its reader, so thousands of them cost no threads.
+    """
+    requests_served = 0
+
+    try:
+        while requests_served < MAX_KEEP_ALIVE_REQUESTS:
+            try:
+                head = await asyncio.wait_for(
+                    reader.readuntil(b"\r\n\r\n"),
+                    KEEP_ALIVE_TIMEOUT if requests_served else REQUEST_READ_TIMEOUT,
+                )
+            except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                return
+            except asyncio.LimitOverrunError:
+                await respond_and_close(writer, 431, "Request header fields too large\n")
+                return
+
+            try:
+                http_version, headers = parse_request_head(head[:-4].decode("iso-8859-1"))
+                content_length = int(headers.get("content-length", "0"))
+                if content_length < 0:
+                    raise ValueError("negative Content-Length")
+            except ValueError:
+                await respond_and_close(writer, 400, "Bad request\n")
+                return
+
+            if "transfer-encoding" in headers:
+                await respond_and_close(writer, 501, "Chunked request bodies are not supported\n")
+                return
+            if content_length > MAX_REQUEST_BODY_BYTES:
+                await respond_and_close(writer, 413, "Request body too large\n")
+                return
+
+            try:
+                body = await asyncio.wait_for(reader.readexactly(content_length), REQUEST_READ_TIMEOUT)
+            except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                return
+
+            keep_alive = wants_keep_alive(http_version, headers) and requests_served + 1 < MAX_KEEP_ALIVE_REQUESTS
+
+            resp = await handle_http_request_async(head + body)
+            if isinstance(resp, StreamingResponse):
+                await stream_response(writer, resp, keep_alive)
+            else:
+                writer.writelines(with_connection_header(resp, keep_alive))
+                await writer.drain()
+            requests_served += 1
+
+            if not keep_alive:
+                return
+    except ConnectionError:
+        pass
+    except Exception as e:
+        print("[!] Error in handle_connection:", e)
+        traceback.print_exc()
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+
+async def stream_response(writer: asyncio.StreamWriter, resp: StreamingResponse, keep_alive: bool):
+    """
+    Write each chunk as it is produced; drain() holds the producer back while the client is slow.
+    A failure after the head leaves the body unterminated and closes the connection.
+    """
+    writer.writelines(with_connection_header(resp.head, keep_alive))
+
+    async for chunk in resp.chunks:
+        if chunk:
+            writer.writelines(chunk_frame(chunk))
+            await writer.drain()
+
+    writer.write(LAST_CHUNK)
+    await writer.drain()
+
+
+async def respond_and_close(writer: asyncio.StreamWriter, status_code: int, body: str):
+    writer.writelines(with_connection_header(build_http_response(status_code, body), False))
+    try:
+        await writer.drain()
+    except ConnectionError:
+        pass
+
+
+async def handle_http_request_async(request_bytes: bytes) -> bytes | StreamingResponse:
+    try:
+        method, path, query_params, headers, body, http_version = parse_http_request(request_bytes)
+        segments = [s for s in path.split("/") if s]
+
+        if method.upper() == "GET" and len(segments) >= 2 and segments[0] == "instruments":
+            print(f"[HTTP] {method} {path} {query_params}")
+
+            if len(segments) == 2:
+                return await handle_price_fetch(segments, query_params, headers, http_version)
+            if len(segments) == 3 and segments[2] == "hurst":
+                return await handle_indicator_fetch("hurst", instrument_hurst_async, segments, query_params, headers)
+            if len(segments) == 3 and segments[2] == "permutation-entropy":
+                return await handle_indicator_fetch(
+                    "permutation-entropy", instrument_permutation_entropy_async, segments, query_params, headers,
+                )
+    except Exception as e:
+        print("[!] Error in handle_http_request_async:", e)
+        traceback.print_exc()
+        return build_http_response(500, "Internal Server Error\n")
+
+    # Every other route keeps the selector server's blocking handler, run off the loop
+    return await asyncio.to_thread(handle_http_request, request_bytes)
+
+
+def parse_positive_int(query_params: dict[str, str | list[str]], name: str) -> int:
+    raw = query_params.get(name)
+    if not isinstance(raw, str):
+        raise ValueError(f"Invalid '{name}' value")
+
+    value = int(raw)
+    if value <= 0:
+        raise ValueError(f"Invalid '{name}' value")
+
+    return value
+
+
+def error_response(e: ValueError) -> bytes:
+    status = 404 if "Unknown instrument" in str(e) else 400
+    return build_http_response(status, f"{e}\n")
+
+
+async def handle_price_fetch(
+    segments: list[str],
+    query_params: dict[str, str | list[str]],
+    headers: dict[str, str],
+    http_version: str = "HTTP/1.1",
+    ) -> bytes | StreamingResponse:
+    try:
+        minutes = parse_positive_int(query_params, "minutes")
+    except ValueError:
+        return build_http_response(400, "Invalid 'minutes' value\n")
+
+    binary = accepts_price_columns(headers.get("accept"))
+    content_type = PRICE_COLUMNS_MEDIA_TYPE if binary else "application/json; charset=utf-8"
+
+    etag = price_history_etag(segments[1], minutes, PRICE_COLUMNS_MEDIA_TYPE if binary else "application/json")
+    if etag is not None and etag_matches(headers.get("if-none-match"), etag):
+        return build_http_response(304, "", extra_headers={"ETag": format_weak_etag(etag), "Vary": "Accept"})
+
+    if etag is None and not binary and supports_chunked(http_version):
+        # The lookback reaches into the DB and can be any size, rows are sent as they are read
+        try:
+            batches = await open_instrument_price_batches_async(segments[1], minutes)
+        except ValueError as e:
+            return error_response(e)
+
+        return build_streaming_response(
+            200,
+            iter_price_history_json_async(batches),
+            content_type=content_type,
+            extra_headers={"Vary": "Accept"},
+            accept_encoding=headers.get("accept-encoding"),
+        )
+
+    try:
+        columns = await load_instrument_price_columns_async(segments[1], minutes)
+    except ValueError as e:
+        return error_response(e)
+
+    def encode() -> bytes:
+        if binary:
+            resp_body = encode_price_columns(*columns, PRICE_TICK_SCALE)
+        else:
+            resp_body = json.dumps([tick.to_dict() for tick in price_history_from_columns(columns)]).encode("utf-8")
+
+        response_etag = etag
+        if response_etag is None:
+            response_etag = body_etag(resp_body)
+            if etag_matches(headers.get("if-none-match"), response_etag):
+                return build_http_response(
+                    304, "", extra_headers={"ETag": format_weak_etag(response_etag), "Vary": "Accept"},
+                )
+
+        return build_http_response(
+            200,
+            resp_body,
+            content_type=content_type,
+            extra_headers={"ETag": format_weak_etag(response_etag), "Vary": "Accept"},
+            accept_encoding=headers.get("accept-encoding"),
+            compressible=True,
+        )
+
+    # Serializing and compressing a long history is CPU work, it must not stall the other connections
+    return await asyncio.to_thread(encode)
+
+
+async def handle_indicator_fetch(
+    indicator: str,
+    compute,
+    segments: list[str],
+    query_params: dict[str, str | list[str]],
+    headers: dict[str, str],
+    ) -> bytes:
+    try:
+        minutes = parse_positive_int(query_params, "minutes")
+        workers = parse_positive_int(query_params, "workers") if "workers" in query_params else None
+    except ValueError:
+        return build_http_response(400, "Invalid query params\n")
+
+    etag = indicator_etag(indicator, segments[1], minutes)
+    if etag is not None and etag_matches(headers.get("if-none-match"), etag):
+        return build_http_response(304, "", extra_headers={"ETag": format_weak_etag(etag)})
+
+    try:
+        value = await compute(segments[1], minutes, workers)
+    except ValueError as e:
+        return error_response(e)
+
+    return build_http_response(
+        200,
+        json.dumps(value),
+        content_type="application/json; charset=utf-8",
+        extra_headers={"ETag": format_weak_etag(etag)} if etag is not None else None,
+    )
+
+
+async def main():
+    server = await asyncio.start_server(
+        handle_connection,
+        HOST,
+        PORT,
+        limit=MAX_REQUEST_HEADER_BYTES,
+        backlog=LISTEN_BACKLOG,
+        reuse_address=True,
+    )
+    print(f"[*] Listening on {HOST}:{PORT} (asyncio)")
+
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    # Fork the analytics workers before any generator/server threads exist
+    start_worker_pool()
+    start_partition_maintenance()
+    load_instrument_ids()
+    load_price_store()
+    seed_streaming_hurst(InstrumentNameEnum)
+    seed_rolling_permutation_entropy(InstrumentNameEnum)
+    register_price_update_callback(on_price_update)
+    register_price_update_callback(invalidate_indicator_cache)
+    start_price_generation()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n[!] Shutting down...")
@@ -0,0 +1,19 @@
+import os
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.db.db import DATABASE_URL
+
+
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", 10))
+ASYNC_DB_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", 20))
+
+# Same database through psycopg's asyncio interface. Requests beyond the pool wait for a connection,
+# so any number of client connections maps onto a bounded number of DB connections.
+async_engine = create_async_engine(
+    make_url(DATABASE_URL).set(drivername="postgresql+psycopg"),
+    echo=False,
+    pool_size=ASYNC_DB_POOL_SIZE,
+    max_overflow=ASYNC_DB_MAX_OVERFLOW,
+)
+
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
@@ -0,0 +1,109 @@
+from sqlalchemy import text
+from app.db.db import SessionLocal
+from app.services.bar_rollups import RESOLUTION_SECONDS, ROLLUP_PARENT
+
+
+# Aggregates every closed minute of the raw ticks (stored as 0.01 ticks) into instrument_minute_bars.
+# Already stored bars are overwritten, so the command can be re-run safely.
+BACKFILL_MINUTE_BARS_SQL = text("""
+    INSERT INTO instrument_minute_bars (instrument_id, minute, open, high, low, close, tick_count)
+    SELECT
+        instrument_id,
+        date_trunc('minute', created_at) AS minute,
+        (array_agg(price_ticks ORDER BY created_at ASC, id ASC))[1] / 100.0 AS open,
+        max(price_ticks) / 100.0 AS high,
+        min(price_ticks) / 100.0 AS low,
+        (array_agg(price_ticks ORDER BY created_at DESC, id DESC))[1] / 100.0 AS close,
+        count(*) AS tick_count
+    FROM instruments_prices
+    WHERE created_at < date_trunc('minute', now())
+    GROUP BY instrument_id, date_trunc('minute', created_at)
+    ON CONFLICT ON CONSTRAINT uq_instrument_minute_bars_instrument_id_minute DO UPDATE SET
+        open = EXCLUDED.open,
+        high = EXCLUDED.high,
+        low = EXCLUDED.low,
+        close = EXCLUDED.close,
+        tick_count = EXCLUDED.tick_count,
+        updated_at = now()
+""")
+
+# Rolls the parent resolution up into complete buckets of :seconds.
+# The source is filled in from constants, never from user input.
+BACKFILL_ROLLUP_SQL = """
+    INSERT INTO instrument_bars (instrument_id, resolution, start, open, high, low, close, tick_count)
+    SELECT
+        instrument_id,
+        :resolution,
+        bucket,
+        (array_agg(open ORDER BY bar_start ASC))[1],
+        max(high),
+        min(low),
+        (array_agg(close ORDER BY bar_start DESC))[1],
+        sum(tick_count)
+    FROM (
+        SELECT
+            instrument_id,
+            {start_column} AS bar_start,
+            to_timestamp(floor(extract(epoch FROM {start_column}) / :seconds) * :seconds) AS bucket,
+            open, high, low, close, tick_count
+        FROM {source}
+    ) AS parent
+    WHERE bucket + make_interval(secs => :seconds) <= date_trunc('minute', now())
+    GROUP BY instrument_id, bucket
+    ON CONFLICT ON CONSTRAINT uq_instrument_bars_instrument_id_resolution_start DO UPDATE SET
+        open = EXCLUDED.open,
+        high = EXCLUDED.high,
+        low = EXCLUDED.low,
+        close = EXCLUDED.close,
+        tick_count = EXCLUDED.tick_count,
+        updated_at = now()
+"""
+
+
+def _rollup_source(parent: str) -> tuple[str, str]:
+    if parent == "1m":
+        return "instrument_minute_bars", "minute"
+
+    return f"(SELECT * FROM instrument_bars WHERE resolution = '{parent}')", "start"
+
+
+def backfill_minute_bars() -> int:
+    db = SessionLocal()
+    
+    try:
+        result = db.execute(BACKFILL_MINUTE_BARS_SQL)
+        db.commit()
+        return result.rowcount
+    except:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def backfill_bar_rollups() -> dict[str, int]:
+    db = SessionLocal()
+    rowcounts: dict[str, int] = {}
+    
+    try:
+        # Finest first, every resolution reads the one just written
+        for resolution, parent in ROLLUP_PARENT.items():
+            source, start_column = _rollup_source(parent)
+            stmt = text(BACKFILL_ROLLUP_SQL.format(source=source, start_column=start_column))
+            result = db.execute(stmt, {"resolution": resolution, "seconds": RESOLUTION_SECONDS[resolution]})
+            rowcounts[resolution] = result.rowcount
+        
+        db.commit()
+        return rowcounts
+    except:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__=="__main__":
+    print(f"Backfilled {backfill_minute_bars()} minute bars")
+    
+    for resolution, count in backfill_bar_rollups().items():
+        print(f"Backfilled {count} {resolution} bars")
@@ -0,0 +1,174 @@
+import argparse
+import io
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Iterator, List, Optional
+
+from sqlalchemy import select
+from app.db.backfill_minute_bars import backfill_bar_rollups, backfill_minute_bars
+from app.db.db import SessionLocal, engine
+from app.models.instrument import Instrument, InstrumentNameEnum
+from app.db.partitions import ensure_price_partitions_for_range
+from app.models.instrument_price import InstrumentPrice, price_to_ticks
+from app.price_generator import (
+    AUTOREGRESSIVE_COEFFICIENT_LOWER_BOUND,
+    AUTOREGRESSIVE_COEFFICIENT_UPPER_BOUND,
+    NEXT_AUTOREGRESSIVE_COEFFICIENT_MAX_SLEEP_TIME,
+    NEXT_AUTOREGRESSIVE_COEFFICIENT_MIN_SLEEP_TIME,
+    STARTING_PRICE,
+    RandomBatch,
+    calculate_new_price,
+)
+
+
+COPY_CHUNK_ROWS = 50_000
+
+
+def synthesize_prices(
+    instrument_name: InstrumentNameEnum,
+    anchor_price: Decimal,
+    count: int,
+    interval: float,
+    random_batch: RandomBatch,
+) -> List[Decimal]:
+    """
+    Walk `count` ticks away from `anchor_price` with the live AR(1) process.
+    The direction chain is time reversible, so the walk read backwards is an equally
+    likely history that ends at the anchor.
+    """
+    prices: List[Decimal] = []
+    price = anchor_price
+    previous_tick_change = 1 if random_batch.next() < 0.5 else -1
+    phi = 0.0
+    seconds_to_phi_change = 0.0
+
+    for _ in range(count):
+        if seconds_to_phi_change <= 0.0:
+            phi = random_batch.uniform(AUTOREGRESSIVE_COEFFICIENT_LOWER_BOUND, AUTOREGRESSIVE_COEFFICIENT_UPPER_BOUND)
+            seconds_to_phi_change = random_batch.uniform(
+                NEXT_AUTOREGRESSIVE_COEFFICIENT_MIN_SLEEP_TIME, NEXT_AUTOREGRESSIVE_COEFFICIENT_MAX_SLEEP_TIME)
+
+        price, previous_tick_change = calculate_new_price(
+            price, instrument_name, previous_tick_change, phi, random_batch.next())
+        prices.append(price)
+        seconds_to_phi_change -= interval
+
+    prices.reverse()
+    return prices
+
+
+def copy_chunks(instrument_id: int, prices: List[Decimal], first_tick: datetime, interval: float) -> Iterator[bytes]:
+    """
+    COPY text format rows: instrument_id, price_ticks, created_at, updated_at.
+    """
+    buf = io.StringIO()
+
+    for i, price in enumerate(prices):
+        created_at = (first_tick + timedelta(seconds=i * interval)).isoformat()
+        buf.write(f"{instrument_id}\t{price_to_ticks(price)}\t{created_at}\t{created_at}\n")
+
+        if (i + 1) % COPY_CHUNK_ROWS == 0:
+            yield buf.getvalue().encode()
+            buf = io.StringIO()
+
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+
+def generate_history(
+    days: float,
+    interval: float,
+    names: List[InstrumentNameEnum],
+    seed: Optional[int] = None,
+) -> int:
+    """
+    Back-date `days` of ticks for every instrument, ending right before its oldest stored tick
+    (or now, if it has none). Returns the number of inserted rows.
+    """
+    count = int(days * 24 * 60 * 60 / interval)
+    random_batch = RandomBatch(seed=seed)
+    total = 0
+
+    with SessionLocal() as db:
+        instruments = db.scalars(select(Instrument).where(Instrument.name.in_(names))).all()
+
+        anchors = {}
+        for instrument in instruments:
+            oldest = db.execute(
+                select(InstrumentPrice.created_at, InstrumentPrice.price)
+                .where(InstrumentPrice.instrument_id == instrument.id)
+                .order_by(InstrumentPrice.created_at.asc())
+                .limit(1)
+            ).first()
+
+            if oldest is None:
+                anchors[instrument.id] = (datetime.now(timezone.utc), STARTING_PRICE[instrument.name])
+            else:
+                anchors[instrument.id] = (oldest.created_at, oldest.price)
+
+    raw_connection = engine.raw_connection()
+
+    try:
+        driver_connection = raw_connection.driver_connection
+
+        for instrument in instruments:
+            end, anchor_price = anchors[instrument.id]
+            prices = synthesize_prices(instrument.name, anchor_price, count, interval, random_batch)
+            first_tick = end - timedelta(seconds=count * interval)
+            ensure_price_partitions_for_range(first_tick, end)
+
+            with driver_connection.cursor() as cursor:
+                with cursor.copy(
+                    "COPY instruments_prices (instrument_id, price_ticks, created_at, updated_at) FROM STDIN"
+                ) as copy:
+                    for chunk in copy_chunks(instrument.id, prices, first_tick, interval):
+                        copy.write(chunk)
+
+            driver_connection.commit()
+            total += len(prices)
+            print(f"{instrument.name.value}: {len(prices)} ticks from {first_tick} to {end}")
+    except:
+        raw_connection.rollback()
+        raise
+    finally:
+        raw_connection.close()
+
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate back-dated AR(1) tick history")
+    parser.add_argument("--days", type=float, default=30, help="length of the generated history")
+    parser.add_argument("--interval-ms", type=int, default=5000, help="time between two ticks")
+    parser.add_argument(
+        "--instruments",
+        nargs="+",
+        default=[name.value for name in InstrumentNameEnum],
+        choices=[name.value for name in InstrumentNameEnum],
+    )
+    parser.add_argument("--seed", type=int, default=None, help="random seed for reproducible fixtures")
+    parser.add_argument("--skip-bars", action="store_true", help="do not rebuild the minute bars and rollups")
+    args = parser.parse_args()
+
+    if args.days <= 0 or args.interval_ms <= 0:
+        parser.error("--days and --interval-ms must be positive")
+
+    started = time.monotonic()
+    total = generate_history(
+        args.days,
+        args.interval_ms / 1000,
+        [InstrumentNameEnum(name) for name in args.instruments],
+        args.seed,
+    )
+    elapsed = time.monotonic() - started
+    print(f"Inserted {total} ticks in {elapsed:.1f}s ({total / max(elapsed, 1e-9) * 60:.0f} rows/min)")
+
+    if not args.skip_bars:
+        print(f"Backfilled {backfill_minute_bars()} minute bars")
+        for resolution, rows in backfill_bar_rollups().items():
+            print(f"Backfilled {rows} {resolution} bars")
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,223 @@
+import argparse
+import os
+import re
+import time
+from datetime import date, datetime, timedelta, timezone
+from threading import Thread
+from typing import Final, List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from app.db.db import engine
+
+
+# "daily" turns instruments_prices into a table range partitioned by created_at, one partition per UTC day
+PRICES_PARTITIONING: Final[str] = os.getenv("INSTRUMENTS_PRICES_PARTITIONING", "none")
+# Partitions older than this many days are dropped, 0 keeps everything
+PRICES_RETENTION_DAYS: Final[int] = int(os.getenv("INSTRUMENTS_PRICES_RETENTION_DAYS", 0))
+PRICES_PARTITIONS_AHEAD: Final[int] = int(os.getenv("INSTRUMENTS_PRICES_PARTITIONS_AHEAD", 3))
+PARTITION_MAINTENANCE_INTERVAL: Final[int] = 60 * 60
+
+PRICES_TABLE: Final[str] = "instruments_prices"
+PRICES_INDEX: Final[str] = "ix_instruments_prices_instrument_id_created_at"
+PARTITION_NAME_PATTERN = re.compile(rf"^{PRICES_TABLE}_p(\d{{8}})$")
+
+PRICES_COLUMNS_DDL = """
+    id integer NOT NULL DEFAULT nextval('instruments_prices_id_seq'),
+    instrument_id integer NOT NULL REFERENCES instruments(id) ON DELETE CASCADE,
+    price_ticks integer NOT NULL,
+    created_at timestamp with time zone NOT NULL DEFAULT now(),
+    updated_at timestamp with time zone NOT NULL DEFAULT now()
+"""
+
+
+def partition_name(day: date) -> str:
+    return f"{PRICES_TABLE}_p{day:%Y%m%d}"
+
+
+def is_prices_partitioned(conn: Connection) -> bool:
+    return conn.execute(text("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = :table AND c.relnamespace = current_schema()::regnamespace
+        )
+    """), {"table": PRICES_TABLE}).scalar()
+
+
+def list_price_partitions(conn: Connection) -> List[date]:
+    rows = conn.execute(text("""
+        SELECT child.relname FROM pg_inherits i
+        JOIN pg_class child ON child.oid = i.inhrelid
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        WHERE parent.relname = :table AND parent.relnamespace = current_schema()::regnamespace
+    """), {"table": PRICES_TABLE}).scalars()
+
+    days = []
+    for name in rows:
+        match = PARTITION_NAME_PATTERN.match(name)
+        if match:
+            days.append(datetime.strptime(match.group(1), "%Y%m%d").date())
+
+    return sorted(days)
+
+
+def ensure_price_partitions(conn: Connection, first_day: date, last_day: date) -> int:
+    """
+    Create the missing daily partitions for [first_day, last_day]. Returns how many were created.
+    """
+    existing = set(list_price_partitions(conn))
+    created = 0
+    day = first_day
+
+    while day <= last_day:
+        if day not in existing:
+            # Names and bounds come from dates, never from user input
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(day)} PARTITION OF {PRICES_TABLE} "
+                f"FOR VALUES FROM ('{day.isoformat()} 00:00:00+00') TO ('{(day + timedelta(days=1)).isoformat()} 00:00:00+00')"
+            ))
+            created += 1
+        day += timedelta(days=1)
+
+    return created
+
+
+def drop_expired_price_partitions(conn: Connection, retention_days: int, today: date) -> List[str]:
+    """
+    Drop the daily partitions that end before `today - retention_days`.
+    Minute bars and rollups live in their own tables and are kept.
+    """
+    if retention_days <= 0:
+        return []
+
+    cutoff = today - timedelta(days=retention_days)
+    dropped = []
+
+    for day in list_price_partitions(conn):
+        if day + timedelta(days=1) <= cutoff:
+            conn.execute(text(f"DROP TABLE IF EXISTS {partition_name(day)}"))
+            dropped.append(partition_name(day))
+
+    return dropped
+
+
+def partition_prices_table(conn: Connection, partitions_ahead: int = PRICES_PARTITIONS_AHEAD) -> None:
+    """
+    Rebuild instruments_prices as a daily range partitioned table and move the existing rows into it.
+    The primary key becomes (id, created_at), since it has to contain the partition key.
+    """
+    if is_prices_partitioned(conn):
+        return
+
+    conn.execute(text(f"ALTER TABLE {PRICES_TABLE} RENAME TO {PRICES_TABLE}_unpartitioned"))
+    conn.execute(text(f"ALTER INDEX {PRICES_TABLE}_pkey RENAME TO {PRICES_TABLE}_unpartitioned_pkey"))
+    conn.execute(text(f"ALTER INDEX {PRICES_INDEX} RENAME TO {PRICES_INDEX}_unpartitioned"))
+    conn.execute(text("ALTER SEQUENCE instruments_prices_id_seq OWNED BY NONE"))
+
+    conn.execute(text(
+        f"CREATE TABLE {PRICES_TABLE} ({PRICES_COLUMNS_DDL}, PRIMARY KEY (id, created_at)) PARTITION BY RANGE (created_at)"
+    ))
+    conn.execute(text(f"CREATE INDEX {PRICES_INDEX} ON {PRICES_TABLE} (instrument_id, created_at)"))
+    conn.execute(text("ALTER SEQUENCE instruments_prices_id_seq OWNED BY instruments_prices.id"))
+
+    today = datetime.now(timezone.utc).date()
+    oldest = conn.execute(text(f"SELECT min(created_at) FROM {PRICES_TABLE}_unpartitioned")).scalar()
+    newest = conn.execute(text(f"SELECT max(created_at) FROM {PRICES_TABLE}_unpartitioned")).scalar()
+    first_day = oldest.astimezone(timezone.utc).date() if oldest is not None else today
+    last_day = max(newest.astimezone(timezone.utc).date(), today) if newest is not None else today
+    ensure_price_partitions(conn, first_day, last_day + timedelta(days=partitions_ahead))
+
+    conn.execute(text(f"""
+        INSERT INTO {PRICES_TABLE} (id, instrument_id, price_ticks, created_at, updated_at)
+        SELECT id, instrument_id, price_ticks, created_at, updated_at FROM {PRICES_TABLE}_unpartitioned
+    """))
+    conn.execute(text(f"DROP TABLE {PRICES_TABLE}_unpartitioned"))
+
+
+def unpartition_prices_table(conn: Connection) -> None:
+    """
+    Inverse of partition_prices_table: copy every partition back into a plain table.
+    """
+    if not is_prices_partitioned(conn):
+        return
+
+    conn.execute(text(f"ALTER TABLE {PRICES_TABLE} RENAME TO {PRICES_TABLE}_partitioned"))
+    conn.execute(text(f"ALTER INDEX {PRICES_TABLE}_pkey RENAME TO {PRICES_TABLE}_partitioned_pkey"))
+    conn.execute(text(f"ALTER INDEX {PRICES_INDEX} RENAME TO {PRICES_INDEX}_partitioned"))
+    conn.execute(text("ALTER SEQUENCE instruments_prices_id_seq OWNED BY NONE"))
+
+    conn.execute(text(f"CREATE TABLE {PRICES_TABLE} ({PRICES_COLUMNS_DDL}, PRIMARY KEY (id))"))
+    conn.execute(text(f"CREATE INDEX {PRICES_INDEX} ON {PRICES_TABLE} (instrument_id, created_at)"))
+    conn.execute(text("ALTER SEQUENCE instruments_prices_id_seq OWNED BY instruments_prices.id"))
+
+    conn.execute(text(f"""
+        INSERT INTO {PRICES_TABLE} (id, instrument_id, price_ticks, created_at, updated_at)
+        SELECT id, instrument_id, price_ticks, created_at, updated_at FROM {PRICES_TABLE}_partitioned
+    """))
+    conn.execute(text(f"DROP TABLE {PRICES_TABLE}_partitioned"))
+
+
+def ensure_price_partitions_for_range(start: datetime, end: datetime) -> None:
+    """
+    Make sure rows with created_at in [start, end] have a partition (no-op for a plain table).
+    """
+    with engine.begin() as conn:
+        if is_prices_partitioned(conn):
+            ensure_price_partitions(conn, start.astimezone(timezone.utc).date(), end.astimezone(timezone.utc).date())
+
+
+def maintain_price_partitions(
+    retention_days: int = PRICES_RETENTION_DAYS,
+    partitions_ahead: int = PRICES_PARTITIONS_AHEAD,
+) -> None:
+    with engine.begin() as conn:
+        if not is_prices_partitioned(conn):
+            return
+
+        today = datetime.now(timezone.utc).date()
+        created = ensure_price_partitions(conn, today, today + timedelta(days=partitions_ahead))
+        dropped = drop_expired_price_partitions(conn, retention_days, today)
+
+    if created or dropped:
+        print(f"Price partitions: {created} created, {len(dropped)} dropped")
+
+
+def start_partition_maintenance(interval: int = PARTITION_MAINTENANCE_INTERVAL) -> None:
+    """
+    Keep partitions ahead of the generator and apply the retention, once now and then every `interval` seconds.
+    """
+    maintain_price_partitions()
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                maintain_price_partitions()
+            except Exception as e:
+                print("[!] Price partition maintenance failed:", e)
+
+    Thread(target=run, daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the daily partitions of instruments_prices")
+    parser.add_argument("command", choices=["partition", "unpartition", "maintain"])
+    parser.add_argument("--retention-days", type=int, default=PRICES_RETENTION_DAYS)
+    args = parser.parse_args()
+
+    if args.command == "maintain":
+        maintain_price_partitions(args.retention_days)
+        return
+
+    with engine.begin() as conn:
+        if args.command == "partition":
+            partition_prices_table(conn)
+        else:
+            unpartition_prices_table(conn)
+
+    print(f"instruments_prices {args.command}ed")
+
+
+if __name__=="__main__":
+    main()
@@ -7,6 +7,7 @@ from app.models.instrument import Instrument
 INSTRUMENT_NAMES = [
     "ES",
     "NQ",
+    "YM",
 ]
 
 
@@ -1,19 +1,55 @@
 
-from datetime import datetime
+from datetime import datetime, timezone
 from decimal import Decimal
-from typing import Iterable
-from flask_socketio import SocketIO, emit, join_room, leave_room, rooms
-from flask import Flask, jsonify, request
+import os
+from flask_socketio import SocketIO, emit, join_room, leave_room
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
+from werkzeug.serving import make_server
 
 from app.price_generator import register_price_update_callback, start_price_generation
 
-from app.services.instruments import load_instrument_price_history
+from app.db.partitions import start_partition_maintenance
+from app.services.instrument_ids import load_instrument_ids
+from app.services.live_ticks import (
+    TICK_STREAM_ID,
+    get_tick_log,
+    next_sequence,
+    subscription_resume,
+    subscription_snapshot,
+    tick_delta,
+)
+from app.services.instruments import (
+    iter_instrument_price_batches,
+    iter_price_history_json,
+    load_instrument_price_columns,
+    load_instrument_price_history,
+)
 from app.models.instrument import InstrumentNameEnum
-from app.models.instrument_price import InstrumentPrice
-from app.utils.tick_time_converter import Tick, minute_bars_from_ticks
-from app.services.hurst_exponent import hurst_exponent_minutes_rs_multiprocessed
-from app.services.permutation_entropy import permutation_entropy_minutes_multiprocessed
+from app.models.instrument_price import PRICE_TICK_SCALE, InstrumentPrice
+from app.services.broadcaster import Broadcaster
+from app.services.message_bus import create_message_bus
+from app.services.minute_bars import last_closed_minute, observe_closed_minute
+from app.services.bar_rollups import bar_to_dict, bars_range, load_instrument_bars
+from app.services.indicator_cache import invalidate_indicator_cache
+from app.services.indicators import (
+    evaluate_indicator_specs,
+    instrument_hurst,
+    instrument_permutation_entropy,
+    load_minute_closes,
+)
+from app.services.price_store import append_tick, load_price_store
+from app.services.streaming_hurst import get_streaming_hurst, seed_streaming_hurst, update_streaming_hurst
+from app.services.streaming_permutation_entropy import (
+    get_rolling_permutation_entropy,
+    seed_rolling_permutation_entropy,
+    update_rolling_permutation_entropy,
+)
+from app.services.worker_pool import start_worker_pool
+from app.services.response_versions import indicator_etag, price_history_etag
+from app.utils.http_caching import COMPRESSION_MIN_BYTES, body_etag, compress_body, negotiate_content_encoding
+from app.utils.http_streaming import compress_stream
+from app.utils.price_columns import PRICE_COLUMNS_MEDIA_TYPE, accepts_price_columns, encode_price_columns
 
 app = Flask("PyTrade API")
 
@@ -24,15 +60,68 @@ CORS(
     supports_credentials=True,
 )
 
+# Logging every packet costs more than delivering it, enable it only to debug the socket layer
+SOCKETIO_LOGGING = os.getenv("SOCKETIO_LOGGING", "0") == "1"
+
 socketio = SocketIO(app,
                     cors_allowed_origins="*",
-                    logger=True,
+                    logger=SOCKETIO_LOGGING,
                     async_mode="threading",
-                    engineio_logger=True)
+                    engineio_logger=SOCKETIO_LOGGING)
+
+broadcaster = Broadcaster(socketio.server)
+
+# Under app.flask_workers only one worker generates prices, every worker gets its ticks from the bus
+PRICE_GENERATOR_ENABLED = os.getenv("PRICE_GENERATOR", "1") == "1"
+TICKS_CHANNEL = "ticks"
+
+message_bus = create_message_bus()
 
 connected_clients: set[str] = set()
 
 
+def not_modified(etag: str, *vary: str) -> Response:
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    for header in vary:
+        response.vary.add(header)
+    return response
+
+
+@app.after_request
+def compress_response(response: Response) -> Response:
+    if response.status_code != 200 or response.direct_passthrough or "Content-Encoding" in response.headers:
+        return response
+
+    response.vary.add("Accept-Encoding")
+
+    encoding = negotiate_content_encoding(request.headers.get("Accept-Encoding"))
+    if encoding is None or (response.content_length or 0) < COMPRESSION_MIN_BYTES:
+        return response
+
+    response.set_data(compress_body(response.get_data(), encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def streaming_json_response(chunks, *vary: str) -> Response:
+    """
+    Chunked response, compressed on the fly. compress_response leaves it alone: it has no length
+    and already carries its Content-Encoding.
+    """
+    encoding = negotiate_content_encoding(request.headers.get("Accept-Encoding"))
+    if encoding is not None:
+        chunks = compress_stream(chunks, encoding)
+
+    response = Response(chunks, mimetype="application/json")
+    for header in vary + ("Accept-Encoding",):
+        response.vary.add(header)
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+
+    return response
+
+
 @app.route("/instruments/<name>", methods=["GET"])
 def getInstrumentPriceHistory(name: str):
     try:
@@ -40,14 +129,56 @@ def getInstrumentPriceHistory(name: str):
     except ValueError:
         return jsonify({"error": "minutes must be an integer"}), 400
 
+    binary = accepts_price_columns(request.headers.get("Accept"))
+
+    etag = price_history_etag(name, minutes, PRICE_COLUMNS_MEDIA_TYPE if binary else "application/json")
+    if etag is not None and request.if_none_match.contains_weak(etag):
+        return not_modified(etag, "Accept")
+
     try:
-        result = load_instrument_price_history(name, minutes)
+        if binary:
+            timestamps, prices = load_instrument_price_columns(name, minutes)
+        elif etag is None:
+            # The lookback reaches into the DB and can be any size, rows are sent as they are read
+            chunks = iter_price_history_json(iter_instrument_price_batches(name, minutes))
+        else:
+            result = load_instrument_price_history(name, minutes)
     
     except ValueError as e:
         status = 404 if "Unknown instrument" in str(e) else 400
-        return jsonify(e), status
+        return jsonify(str(e)), status
     
-    return jsonify(result)
+    if binary:
+        response = Response(encode_price_columns(timestamps, prices, PRICE_TICK_SCALE), mimetype=PRICE_COLUMNS_MEDIA_TYPE)
+    elif etag is None:
+        return streaming_json_response(chunks, "Accept")
+    else:
+        response = jsonify(result)
+
+    response.vary.add("Accept")
+    # Without a version known upfront the body is tagged, which still saves the transfer
+    response.set_etag(etag or body_etag(response.get_data()), weak=True)
+    return response.make_conditional(request)
+
+
+@app.route("/instruments/<name>/bars", methods=["GET"])
+def getInstrumentBars(name: str):
+    resolution = request.args.get("resolution", "1m")
+
+    try:
+        from_ts = int(request.args["from"]) if "from" in request.args else None
+        to_ts = int(request.args["to"]) if "to" in request.args else None
+    except ValueError:
+        return jsonify({"error": "from and to must be epoch seconds"}), 400
+
+    try:
+        start, end = bars_range(resolution, from_ts, to_ts)
+        bars = load_instrument_bars(name, resolution, start, end)
+    except ValueError as e:
+        status = 404 if "Unknown instrument" in str(e) else 400
+        return jsonify(str(e)), status
+
+    return jsonify([bar_to_dict(bar) for bar in bars])
 
 
 @app.route("/instruments/<name>/hurst", methods=["GET"])
@@ -58,18 +189,54 @@ def getHurstExponent(name:str):
     except ValueError:
         return jsonify({"error": "minutes must be an integer"}), 400
 
-    result = load_instrument_price_history(name, minutes)
-    
-    ticksIterable: Iterable[Tick] = sorted([
-        (datetime.fromtimestamp(tick.timestamp), tick.price) for tick in result
-    ])
-    
+    etag = indicator_etag("hurst", name, minutes)
+    if etag is not None and request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+
     try:
-        minutesClosePrice = [bar.close for bar in minute_bars_from_ticks(ticksIterable, fill_missing_minutes=False)]
-        hurst_coefficient = hurst_exponent_minutes_rs_multiprocessed(minutesClosePrice, num_workers=workers)
+        hurst_coefficient = instrument_hurst(name, minutes, workers)
     except Exception as e:
         return jsonify(str(e)), 400
 
+    response = jsonify(hurst_coefficient)
+    if etag is not None:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+@app.route("/instruments/<name>/indicators", methods=["POST"])
+def getIndicators(name: str):
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"error": "body must be a JSON object"}), 400
+
+    try:
+        minutes = int(payload.get("minutes", 100))
+        workers = int(payload["workers"]) if payload.get("workers") is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "minutes and workers must be integers"}), 400
+
+    try:
+        minutesClosePrice = load_minute_closes(name, minutes)
+        results = evaluate_indicator_specs(minutesClosePrice, payload.get("indicators"), workers)
+    except ValueError as e:
+        status = 404 if "Unknown instrument" in str(e) else 400
+        return jsonify(str(e)), status
+
+    return jsonify(results)
+
+
+@app.route("/instruments/<name>/hurst/live", methods=["GET"])
+def getLiveHurstExponent(name: str):
+    try:
+        instrument_name = InstrumentNameEnum(name)
+    except ValueError:
+        return jsonify(f"Unknown instrument: {name}"), 404
+
+    hurst_coefficient = get_streaming_hurst(instrument_name).value
+    if hurst_coefficient is None:
+        return jsonify("Not enough minute points yet"), 400
+
     return jsonify(hurst_coefficient)
 
 
@@ -81,28 +248,73 @@ def getPermutationEntropy(name: str):
     except ValueError:
         return jsonify({"error": "minutes must be an integer"}), 400
 
-    result = load_instrument_price_history(name, minutes)
-    
-    ticksIterable: Iterable[Tick] = sorted([
-        (datetime.fromtimestamp(tick.timestamp), tick.price) for tick in result
-    ])
-    
+    etag = indicator_etag("permutation-entropy", name, minutes)
+    if etag is not None and request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+
     try:
-        minutesClosePrice = [bar.close for bar in minute_bars_from_ticks(ticksIterable, fill_missing_minutes=False)]
-        pe_coefficient = permutation_entropy_minutes_multiprocessed(minutesClosePrice, workers=workers)
+        pe_coefficient = instrument_permutation_entropy(name, minutes, workers)
     except Exception as e:
         return jsonify(str(e)), 400
 
-    return jsonify(pe_coefficient)
+    response = jsonify(pe_coefficient)
+    if etag is not None:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+@app.route("/instruments/<name>/permutation-entropy/live", methods=["GET"])
+def getLivePermutationEntropy(name: str):
+    try:
+        instrument_name = InstrumentNameEnum(name)
+    except ValueError:
+        return jsonify(f"Unknown instrument: {name}"), 404
+
+    try:
+        last = int(request.args.get("points", 1))
+    except ValueError:
+        return jsonify({"error": "points must be an integer"}), 400
+
+    series = get_rolling_permutation_entropy(instrument_name).series(last)
+
+    return jsonify([{"value": value, "timestamp": minute} for minute, value in series])
+
+
+@app.route("/broadcast/queues", methods=["GET"])
+def getBroadcastQueues():
+    return jsonify(broadcaster.stats())
 
 
 @socketio.on("subscribe")
 def handle_subscribe(data):
+    """
+    Joins the instrument's room. With `stream` and `since_seq` (the last tick the client has) the missed
+    ticks are sent as "deltas"; when they are no longer kept, or with `minutes` alone, a "snapshot"
+    of that lookback is sent instead. Live "price" events with a higher seq follow either one.
+    """
     instrument = data.get("instrument", "ES")
-    print(instrument)
+    # Join first: every tick after the one the reply ends with reaches the room
     join_room(instrument)
-    
-    print("rooms:", rooms())
+
+    if data.get("since_seq") is None and data.get("minutes") is None:
+        return
+
+    try:
+        name = InstrumentNameEnum(instrument)
+
+        if data.get("since_seq") is not None and data.get("stream"):
+            deltas = subscription_resume(name, data["stream"], int(data["since_seq"]))
+            if deltas is not None:
+                emit("deltas", deltas)
+                return
+
+        minutes = data.get("minutes")
+        if minutes is None:
+            raise ValueError("minutes is required when the missed ticks are no longer available")
+
+        emit("snapshot", subscription_snapshot(name, int(minutes)))
+    except (TypeError, ValueError) as e:
+        emit("subscribe_error", {"instrument": instrument, "error": str(e)})
 
 
 @socketio.on("unsubscribe")
@@ -111,21 +323,114 @@ def handle_unsubscribe(data):
     leave_room(instrument)
 
 
-def emit_price_update(symbol: InstrumentNameEnum, p: InstrumentPrice):
-    socketio.emit(
+def emit_price_update(symbol: InstrumentNameEnum, p: InstrumentPrice, seq: int):
+    broadcaster.publish(
+        str(symbol.value),
         "price",
+        {"instrument": symbol.value, **tick_delta(seq, p.created_at.timestamp(), float(p.price))},
+    )
+
+
+def emit_hurst_update(symbol: InstrumentNameEnum, p: InstrumentPrice):
+    timestamp = int(p.created_at.timestamp())
+    hurst_coefficient = update_streaming_hurst(symbol, timestamp, float(p.price))
+    
+    if hurst_coefficient is None:
+        return
+    
+    broadcaster.publish(
+        str(symbol.value),
+        "hurst",
+        {
+            "hurst": hurst_coefficient,
+            "timestamp": timestamp,
+        },
+    )
+
+
+def emit_permutation_entropy_update(symbol: InstrumentNameEnum, p: InstrumentPrice):
+    timestamp = int(p.created_at.timestamp())
+    pe_coefficient = update_rolling_permutation_entropy(symbol, timestamp, float(p.price))
+    
+    if pe_coefficient is None:
+        return
+    
+    broadcaster.publish(
+        str(symbol.value),
+        "permutation-entropy",
+        {
+            "value": pe_coefficient,
+            "timestamp": timestamp,
+        },
+    )
+
+
+def publish_tick(symbol: InstrumentNameEnum, p: InstrumentPrice):
+    closed_minute = last_closed_minute(symbol)
+
+    message_bus.publish(
+        TICKS_CHANNEL,
         {
-            "price": float(p.price),
-            "timestamp": int(p.created_at.timestamp()),
+            "instrument": symbol.value,
+            "price": str(p.price),
+            "timestamp": p.created_at.timestamp(),
+            "closed_minute": closed_minute,
+            "stream": TICK_STREAM_ID,
+            "seq": next_sequence(symbol),
         },
-        namespace="/",
-        to=str(symbol.value)
     )
 
 
+def on_tick_message(message: dict):
+    symbol = InstrumentNameEnum(message["instrument"])
+    p = InstrumentPrice(
+        price=Decimal(message["price"]),
+        created_at=datetime.fromtimestamp(message["timestamp"], timezone.utc),
+    )
+
+    if not PRICE_GENERATOR_ENABLED:
+        # The generating worker did this when it committed the tick
+        append_tick(symbol, message["timestamp"], float(p.price))
+        if message["closed_minute"] is not None:
+            observe_closed_minute(symbol, message["closed_minute"])
+    # After the price store, so a snapshot never ends before a tick the log already has
+    get_tick_log(symbol).append(message["stream"], message["seq"], message["timestamp"], float(p.price))
+
+    emit_price_update(symbol, p, message["seq"])
+    emit_hurst_update(symbol, p)
+    emit_permutation_entropy_update(symbol, p)
+    invalidate_indicator_cache(symbol, p)
+
+
+def serve(host: str, port: int):
+    listen_fd = os.getenv("SERVER_LISTEN_FD")
+    if listen_fd is None:
+        socketio.run(app, host=host, port=port, debug=True, use_reloader=False)
+        return
+
+    # A worker of app.flask_workers: accept on the listening socket the workers share
+    server = make_server(host, port, app, threaded=True, fd=int(listen_fd))
+    print(f"[*] Worker {os.getpid()} serving on {host}:{port}")
+    server.serve_forever()
+
+
 if __name__ == "__main__":
-    register_price_update_callback(emit_price_update)
+    # Fork the analytics workers before any generator/server threads exist
+    start_worker_pool()
+    if PRICE_GENERATOR_ENABLED:
+        start_partition_maintenance()
+    load_instrument_ids()
+    load_price_store()
+    
+    seed_streaming_hurst(InstrumentNameEnum)
+    seed_rolling_permutation_entropy(InstrumentNameEnum)
     
-    start_price_generation()
+    broadcaster.start()
+    message_bus.subscribe(TICKS_CHANNEL, on_tick_message)
+
+    if PRICE_GENERATOR_ENABLED:
+        # Published once, every worker delivers it to the subscribers it holds
+        register_price_update_callback(publish_tick)
+        start_price_generation()
     
-    socketio.run(app, host="0.0.0.0", port=5000, debug=True, use_reloader=False)
\ No newline at end of file
+    serve("0.0.0.0", int(os.getenv("SERVER_PORT", 5000)))
\ No newline at end of file
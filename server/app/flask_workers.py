@@ -0,0 +1,103 @@
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing import cpu_count
+from threading import Event, Thread
+
+from app.services.message_bus import run_message_hub
+
+
+HOST = "0.0.0.0"
+PORT = 5000
+LISTEN_BACKLOG = 1024
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run several Flask-SocketIO worker processes on one port, sharing live ticks through a message bus.",
+    )
+    parser.add_argument("--workers", type=int, default=int(os.getenv("FLASK_WORKERS", cpu_count())))
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument(
+        "--message-bus",
+        default=os.getenv("MESSAGE_BUS_URL"),
+        help="unix:///path or redis://host:port/db, a unix socket hub in this process by default",
+    )
+    return parser.parse_args()
+
+
+def start_message_hub() -> str:
+    path = os.path.join(tempfile.gettempdir(), f"pytrade-bus-{os.getpid()}.sock")
+    ready = Event()
+    Thread(target=run_message_hub, args=(path, ready), daemon=True).start()
+    ready.wait()
+
+    print(f"[*] Message hub on {path}")
+    return f"unix://{path}"
+
+
+def create_listen_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(LISTEN_BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+
+def start_worker(index: int, workers: int, listen_sock: socket.socket, bus_url: str, host: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "SERVER_LISTEN_FD": str(listen_sock.fileno()),
+        "SERVER_PORT": str(port),
+        "MESSAGE_BUS_URL": bus_url,
+        # Exactly one worker generates prices and publishes them on the bus
+        "PRICE_GENERATOR": "1" if index == 0 else "0",
+        # Every worker forks its own analytics pool, together they should not oversubscribe the cores
+        "ANALYTICS_POOL_WORKERS": env.get("ANALYTICS_POOL_WORKERS", str(max(1, cpu_count() // workers))),
+    })
+
+    return subprocess.Popen(
+        [sys.executable, "-m", "app.flask_server"],
+        env=env,
+        pass_fds=(listen_sock.fileno(),),
+    )
+
+
+def main():
+    args = parse_args()
+    workers = max(1, args.workers)
+
+    bus_url = args.message_bus
+    if not bus_url or bus_url == "local://":
+        bus_url = start_message_hub()
+
+    listen_sock = create_listen_socket(args.host, args.port)
+    print(f"[*] Listening on {args.host}:{args.port} with {workers} workers")
+
+    processes = [start_worker(i, workers, listen_sock, bus_url, args.host, args.port) for i in range(workers)]
+
+    try:
+        # The hub and the price generator live in these processes, losing one stops the whole group
+        while all(process.poll() is None for process in processes):
+            time.sleep(1)
+        print("[!] A worker exited, shutting down...")
+    except KeyboardInterrupt:
+        print("\n[!] Shutting down...")
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+        for process in processes:
+            process.wait()
+        listen_sock.close()
+
+
+if __name__ == "__main__":
+    main()
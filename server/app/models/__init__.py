@@ -1,3 +1,5 @@
 from app.models.user import User
 from app.models.instrument import Instrument, InstrumentNameEnum
-from app.models.instrument_price import InstrumentPrice
\ No newline at end of file
+from app.models.instrument_price import InstrumentPrice
+from app.models.instrument_minute_bar import InstrumentMinuteBar
+from app.models.instrument_bar import InstrumentBar
\ No newline at end of file
@@ -0,0 +1,26 @@
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import DateTime, ForeignKey, Integer, Numeric, String, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.db import Base
+
+
+class InstrumentBar(Base):
+    """
+    OHLC bars of the rolled up resolutions (5m, 15m, 1h, 1d).
+    The 1 minute bars live in instrument_minute_bars.
+    """
+    __tablename__ = "instrument_bars"
+    __table_args__ = (
+        UniqueConstraint("instrument_id", "resolution", "start", name="uq_instrument_bars_instrument_id_resolution_start"),
+    )
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    instrument_id: Mapped[int] = mapped_column(Integer, ForeignKey("instruments.id", ondelete="CASCADE"), nullable=False)
+    resolution: Mapped[str] = mapped_column(String(8), nullable=False)
+    start: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    open: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    high: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    low: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    close: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    tick_count: Mapped[int] = mapped_column(Integer, nullable=False)
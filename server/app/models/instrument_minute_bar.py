@@ -0,0 +1,21 @@
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import DateTime, ForeignKey, Integer, Numeric, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.db import Base
+
+
+class InstrumentMinuteBar(Base):
+    __tablename__ = "instrument_minute_bars"
+    __table_args__ = (
+        UniqueConstraint("instrument_id", "minute", name="uq_instrument_minute_bars_instrument_id_minute"),
+    )
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    instrument_id: Mapped[int] = mapped_column(Integer, ForeignKey("instruments.id", ondelete="CASCADE"), nullable=False)
+    minute: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    open: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    high: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    low: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    close: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    tick_count: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -1,14 +1,46 @@
-from decimal import Decimal
-from sqlalchemy import ForeignKey, Integer, Numeric
+from decimal import ROUND_HALF_EVEN, Decimal
+from typing import Final, Union
+from sqlalchemy import ForeignKey, Index, Integer
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.db import Base
 
 
+# Prices are stored as a whole number of 0.01 ticks, the resolution of the former Numeric(10, 2)
+PRICE_TICK_DIGITS: Final[int] = 2
+PRICE_TICK_SCALE: Final[int] = 10 ** PRICE_TICK_DIGITS
+
+
+def price_to_ticks(price: Union[Decimal, float, str]) -> int:
+    return int(Decimal(price).scaleb(PRICE_TICK_DIGITS).to_integral_value(ROUND_HALF_EVEN))
+
+
+def ticks_to_price(ticks: int) -> Decimal:
+    return Decimal(ticks).scaleb(-PRICE_TICK_DIGITS)
+
+
+class PriceTicks(TypeDecorator):
+    """
+    Decimal price on the Python side, 4 byte integer tick count in the DB.
+    """
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else price_to_ticks(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else ticks_to_price(value)
+
+
 class InstrumentPrice(Base):
     __tablename__ = "instruments_prices"
-    
+    __table_args__ = (
+        Index("ix_instruments_prices_instrument_id_created_at", "instrument_id", "created_at"),
+    )
+
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    instrument_id: Mapped[int] = mapped_column(Integer, ForeignKey("instruments.id", ondelete="CASCADE"), nullable=False, index=True)
-    price: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
-    
+    instrument_id: Mapped[int] = mapped_column(Integer, ForeignKey("instruments.id", ondelete="CASCADE"), nullable=False)
+    price: Mapped[Decimal] = mapped_column("price_ticks", PriceTicks, nullable=False)
+
     instrument = relationship("Instrument", back_populates="prices")
\ No newline at end of file
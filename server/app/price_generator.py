@@ -1,118 +1,246 @@
+import atexit
+import heapq
+import os
+from dataclasses import dataclass
 from decimal import Decimal
-from threading import Lock, Thread
+from threading import Event, Thread
 import time
 import random
-from typing import Callable, Final, Optional
+from typing import Callable, Final, List, Optional
 
 from sqlalchemy import select
+from sqlalchemy.orm import Session
 from app.db.db import SessionLocal
 from app.models.instrument import Instrument, InstrumentNameEnum
 from app.models.instrument_price import InstrumentPrice
+from app.services.bar_rollups import update_bar_rollups
+from app.services.engines import np
+from app.services.minute_bars import resume_minute_bars, update_minute_bars
+from app.services.price_store import append_tick
+from app.services.tick_writer import TickWriter
 
 
 PriceUpdateCallback = Callable[[InstrumentNameEnum, InstrumentPrice], None]
-_price_update_callback: Optional[PriceUpdateCallback] = None
+_price_update_callbacks: List[PriceUpdateCallback] = []
 
 
 STARTING_PRICE: Final[dict[InstrumentNameEnum, Decimal]] = {
     InstrumentNameEnum.ES: Decimal(100),
-    InstrumentNameEnum.NQ: Decimal(100) 
+    InstrumentNameEnum.NQ: Decimal(100),
+    InstrumentNameEnum.YM: Decimal(100),
 }
 
 TICK_SIZE: Final[dict[InstrumentNameEnum, Decimal]] = {
     InstrumentNameEnum.ES: Decimal(0.25), 
-    InstrumentNameEnum.NQ: Decimal(0.25) 
+    InstrumentNameEnum.NQ: Decimal(0.25),
+    InstrumentNameEnum.YM: Decimal(1),
 }
 
-NEXT_TICK_SLEEP_TIME: Final[int] = 5
+# Time between two ticks of an instrument, can go down to a millisecond
+NEXT_TICK_SLEEP_TIME: Final[float] = int(os.getenv("PRICE_GENERATOR_TICK_INTERVAL_MS", 5000)) / 1000
 NEXT_AUTOREGRESSIVE_COEFFICIENT_MIN_SLEEP_TIME: Final[int] = 100
 NEXT_AUTOREGRESSIVE_COEFFICIENT_MAX_SLEEP_TIME: Final[int] = 10000
 
 AUTOREGRESSIVE_COEFFICIENT_LOWER_BOUND: Final[float] = -0.8
 AUTOREGRESSIVE_COEFFICIENT_UPPER_BOUND: Final[float] = 0.8
 
-autoregressive_coefficient = 0
-_autoregressive_coefficient_lock = Lock()
+RANDOM_BATCH_SIZE: Final[int] = 4096
 
 
-def start_price_generation():
-    start_autoregressive_coefficient_change(
-            NEXT_AUTOREGRESSIVE_COEFFICIENT_MIN_SLEEP_TIME, 
-            NEXT_AUTOREGRESSIVE_COEFFICIENT_MAX_SLEEP_TIME)
-    start_price_generation_for_instrument(InstrumentNameEnum.ES)
-    start_price_generation_for_instrument(InstrumentNameEnum.NQ)
+def handle_committed_ticks(db: Session, ticks: List[tuple[InstrumentNameEnum, InstrumentPrice]]) -> None:
+    for instrument_name, new_price in ticks:
+        try:
+            timestamp = new_price.created_at.timestamp()
+            append_tick(instrument_name, timestamp, float(new_price.price))
+            
+            closed_minute = update_minute_bars(db, new_price.instrument_id, instrument_name, timestamp, float(new_price.price))
+            if closed_minute is not None:
+                update_bar_rollups(db, new_price.instrument_id, instrument_name, closed_minute)
+            
+            for callback in _price_update_callbacks:
+                callback(instrument_name, new_price)
+        except Exception as e:
+            print(e)
+            db.rollback()
 
 
-def change_autoregressive_coefficient(min_seconds: int, max_seconds: int):
-    global autoregressive_coefficient
+tick_writer = TickWriter(handle_committed_ticks)
 
-    while True:
-        new_phi = random.uniform(AUTOREGRESSIVE_COEFFICIENT_LOWER_BOUND, AUTOREGRESSIVE_COEFFICIENT_UPPER_BOUND)
-        with _autoregressive_coefficient_lock:
-            autoregressive_coefficient = new_phi
-        
-        time.sleep(random.uniform(min_seconds, max_seconds))
 
+class RandomBatch:
+    """
+    Uniform [0, 1) draws generated in vectorized batches and handed out one by one.
+    """
+
+    def __init__(self, batch_size: int = RANDOM_BATCH_SIZE, seed: Optional[int] = None):
+        self.batch_size = batch_size
+        self._rng = np.random.default_rng(seed) if np is not None else random.Random(seed)
+        self._values: List[float] = []
+        self._next = 0
+
+    def next(self) -> float:
+        if self._next == len(self._values):
+            if np is not None:
+                self._values = self._rng.random(self.batch_size).tolist()
+            else:
+                self._values = [self._rng.random() for _ in range(self.batch_size)]
+            self._next = 0
+
+        value = self._values[self._next]
+        self._next += 1
+        return value
 
-def start_autoregressive_coefficient_change(min_seconds: int, max_seconds: int):
-    update_thread = Thread(target=change_autoregressive_coefficient, args=(min_seconds, max_seconds), daemon=True)
-    update_thread.start()
+    def uniform(self, low: float, high: float) -> float:
+        return low + (high - low) * self.next()
 
 
-def generate_autoregressive_tick(previous_tick_change: int) -> int:
-    with _autoregressive_coefficient_lock:
-        phi = autoregressive_coefficient
+@dataclass
+class SimulatedInstrument:
+    instrument_id: int
+    name: InstrumentNameEnum
+    tick_size: Decimal
+    price_ticks: int
+    interval: float
+    previous_tick_change: int
+    autoregressive_coefficient: float
+    next_coefficient_change: float
 
+
+def generate_autoregressive_tick(previous_tick_change: int, phi: float, u: float) -> int:
     probability_for_uptick = (1.0 + phi * previous_tick_change) * 0.5
 
     probability_for_uptick = max(0.0, min(1.0, probability_for_uptick))
 
-    return 1 if random.random() < probability_for_uptick else -1
+    return 1 if u < probability_for_uptick else -1
 
 
 def calculate_new_price(
         current_price: Decimal,
         instrument_name: InstrumentNameEnum,
-        previous_tick_change: int) -> tuple[Decimal, int]:
+        previous_tick_change: int,
+        phi: float,
+        u: float) -> tuple[Decimal, int]:
     ticks = int(current_price / TICK_SIZE[instrument_name])
     
-    delta_ticks = generate_autoregressive_tick(previous_tick_change)
+    delta_ticks = generate_autoregressive_tick(previous_tick_change, phi, u)
 
     new_ticks = ticks + delta_ticks
     
     return (new_ticks * TICK_SIZE[instrument_name], delta_ticks)
 
 
-def generate_price(instrument_id: int, instrument_name: InstrumentNameEnum, current_price: Decimal) -> None:
-    previous_tick_change: int = 1 if random.random() < 0.5 else -1
+class PriceSimulator:
+    """
+    Drives any number of instruments from one scheduler loop.
+    Each instrument keeps its own AR(1) state and tick interval; the loop sleeps
+    until the earliest instrument is due, so intervals down to milliseconds are fine.
+    """
+
+    def __init__(self, writer: TickWriter, random_batch: Optional[RandomBatch] = None):
+        self.writer = writer
+        self.instruments: List[SimulatedInstrument] = []
+        self._random = random_batch or RandomBatch()
+        self._schedule: List[tuple[float, int]] = []
+        self._stopping = Event()
+        self._thread: Optional[Thread] = None
+
+    def add_instrument(
+        self,
+        instrument_id: int,
+        name: InstrumentNameEnum,
+        current_price: Decimal,
+        interval: float = NEXT_TICK_SLEEP_TIME,
+    ) -> SimulatedInstrument:
+        if self._thread is not None:
+            raise RuntimeError("Instruments must be added before the simulator starts")
+
+        now = time.monotonic()
+        instrument = SimulatedInstrument(
+            instrument_id=instrument_id,
+            name=name,
+            tick_size=TICK_SIZE[name],
+            price_ticks=int(current_price / TICK_SIZE[name]),
+            interval=interval,
+            previous_tick_change=1 if self._random.next() < 0.5 else -1,
+            autoregressive_coefficient=0.0,
+            next_coefficient_change=now,
+        )
+        self.instruments.append(instrument)
+        heapq.heappush(self._schedule, (now + interval, len(self.instruments) - 1))
+
+        return instrument
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set() and self._schedule:
+            due, index = self._schedule[0]
+            now = time.monotonic()
+
+            if due > now:
+                self._stopping.wait(due - now)
+                continue
+
+            heapq.heappop(self._schedule)
+            instrument = self.instruments[index]
+
+            self._tick(instrument, now)
+
+            # Skip the missed ticks instead of bursting when the loop fell behind
+            next_due = due + instrument.interval
+            if next_due < now:
+                next_due = now + instrument.interval
+            heapq.heappush(self._schedule, (next_due, index))
+
+    def _tick(self, instrument: SimulatedInstrument, now: float) -> None:
+        if now >= instrument.next_coefficient_change:
+            instrument.autoregressive_coefficient = self._random.uniform(
+                AUTOREGRESSIVE_COEFFICIENT_LOWER_BOUND, AUTOREGRESSIVE_COEFFICIENT_UPPER_BOUND)
+            instrument.next_coefficient_change = now + self._random.uniform(
+                NEXT_AUTOREGRESSIVE_COEFFICIENT_MIN_SLEEP_TIME, NEXT_AUTOREGRESSIVE_COEFFICIENT_MAX_SLEEP_TIME)
+
+        delta_ticks = generate_autoregressive_tick(
+            instrument.previous_tick_change,
+            instrument.autoregressive_coefficient,
+            self._random.next(),
+        )
+        instrument.price_ticks += delta_ticks
+        instrument.previous_tick_change = delta_ticks
+
+        # Blocks while the writer is backed up, so a stalled DB slows the generation down
+        self.writer.submit(instrument.instrument_id, instrument.name, instrument.price_ticks * instrument.tick_size)
+
+
+simulator = PriceSimulator(tick_writer)
+
+
+def start_price_generation():
+    tick_writer.start()
+    # Flush the ticks still queued when the server exits
+    atexit.register(tick_writer.stop, 5)
     
-    while True:
-        with SessionLocal() as db:
-            try:
-                current_price, previous_tick_change = (
-                    calculate_new_price(current_price, instrument_name, previous_tick_change))
-                
-                new_price = InstrumentPrice(instrument_id=instrument_id, price=current_price)
-                
-                db.add(new_price)
-                db.commit()
-                
-                if _price_update_callback is not None:
-                    _price_update_callback(instrument_name, new_price)
-            except Exception as e:
-                print(e)
-                db.rollback()
-                
-        time.sleep(NEXT_TICK_SLEEP_TIME)
-
-
-def start_price_generation_for_instrument(instrument_name: InstrumentNameEnum) -> None:
+    for instrument_name in InstrumentNameEnum:
+        start_price_generation_for_instrument(instrument_name)
+    
+    simulator.start()
+
+
+def start_price_generation_for_instrument(instrument_name: InstrumentNameEnum, interval: float = NEXT_TICK_SLEEP_TIME) -> None:
     with SessionLocal() as db:
         instrument_stmt = select(Instrument).where(Instrument.name == instrument_name)
         instrument = db.scalars(instrument_stmt).first()
         
         if instrument is None:
-            raise Exception("Instrument with such name does not exist to start price generation for it")
+            print(f"Instrument {instrument_name.value} is not seeded, no prices will be generated for it")
+            return
         
         current_price_stmt = (
             select(InstrumentPrice.price)
@@ -124,10 +252,10 @@ def start_price_generation_for_instrument(instrument_name: InstrumentNameEnum) -
         if current_price is None:
             current_price = STARTING_PRICE[instrument_name]
         
-    thread = Thread(target=generate_price, args=(instrument.id, instrument.name, current_price), daemon=True)
-    thread.start()
+        resume_minute_bars(db, instrument.id, instrument.name)
+        
+    simulator.add_instrument(instrument.id, instrument.name, current_price, interval)
 
 
 def register_price_update_callback(cb: PriceUpdateCallback) -> None:
-    global _price_update_callback
-    _price_update_callback = cb
\ No newline at end of file
+    _price_update_callbacks.append(cb)
\ No newline at end of file
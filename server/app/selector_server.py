@@ -1,17 +1,61 @@
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime
+from dataclasses import dataclass, field
+from itertools import islice
+from queue import Queue
+from threading import Condition
+from typing import AsyncIterator, Iterator
 import selectors
 import socket
 import json
+import time
 import traceback
-from typing import Iterable
 from urllib.parse import parse_qs, urlsplit
 
-from app.services.instruments import load_instrument_price_history
-from app.price_generator import start_price_generation
-from app.services.hurst_exponent import hurst_exponent_minutes_rs_multiprocessed
-from app.services.permutation_entropy import permutation_entropy_minutes_multiprocessed
-from app.utils.tick_time_converter import Tick, minute_bars_from_ticks
+from app.models.instrument import InstrumentNameEnum
+from app.models.instrument_price import PRICE_TICK_SCALE, InstrumentPrice
+from app.services.instrument_ids import load_instrument_ids
+from app.services.instruments import (
+    iter_instrument_price_batches,
+    iter_price_history_json,
+    load_instrument_price_columns,
+    load_instrument_price_history,
+)
+from app.price_generator import register_price_update_callback, start_price_generation
+from app.db.partitions import start_partition_maintenance
+from app.services.bar_rollups import bar_to_dict, bars_range, load_instrument_bars
+from app.services.indicator_cache import invalidate_indicator_cache
+from app.services.indicators import (
+    evaluate_indicator_specs,
+    instrument_hurst,
+    instrument_permutation_entropy,
+    load_minute_closes,
+)
+from app.services.price_store import load_price_store
+from app.services.streaming_hurst import get_streaming_hurst, seed_streaming_hurst, update_streaming_hurst
+from app.services.streaming_permutation_entropy import (
+    get_rolling_permutation_entropy,
+    seed_rolling_permutation_entropy,
+    update_rolling_permutation_entropy,
+)
+from app.services.worker_pool import start_worker_pool
+from app.services.response_versions import indicator_etag, price_history_etag
+from app.utils.http_caching import (
+    COMPRESSION_MIN_BYTES,
+    body_etag,
+    compress_body,
+    etag_matches,
+    format_weak_etag,
+    negotiate_content_encoding,
+)
+from app.utils.http_streaming import (
+    LAST_CHUNK,
+    StreamingResponse,
+    chunk_frame,
+    compress_stream,
+    compress_stream_async,
+)
+from app.utils.price_columns import PRICE_COLUMNS_MEDIA_TYPE, accepts_price_columns, encode_price_columns
 
 HOST = "0.0.0.0"
 PORT = 5000
@@ -19,45 +63,392 @@ ALLOWED_ORIGIN = "http://localhost:5173"
 # ALLOWED_ORIGIN = "http://192.168.100.94:5173"
 MAX_WORKERS = 8
 
+RECV_BUFFER_SIZE = 64 * 1024
+MAX_REQUEST_HEADER_BYTES = 64 * 1024
+MAX_REQUEST_BODY_BYTES = 1024 * 1024
+# Seconds an idle keep-alive connection is kept open
+KEEP_ALIVE_TIMEOUT = 15
+# Seconds a started request may take to arrive completely
+REQUEST_READ_TIMEOUT = 30
+MAX_KEEP_ALIVE_REQUESTS = 1000
+# Seconds a response may go without any of it being accepted by the client
+RESPONSE_WRITE_TIMEOUT = 30
+# A streaming worker waits while more than this much of its response is unsent
+STREAM_HIGH_WATERMARK = 1024 * 1024
+# Buffers handed to one sendmsg() call
+MAX_SEND_BUFFERS = 64
+
+HTTP_REASONS = {
+    200: "OK",
+    204: "No Content",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    413: "Content Too Large",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+    501: "Not Implemented",
+}
+
 selector = selectors.DefaultSelector()
 executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
 
-def accept(server_sock: socket.socket):
+
+@dataclass(eq=False)
+class ClientConnection:
+    sock: socket.socket
+    addr: tuple
+    inbuf: bytearray = field(default_factory=bytearray)
+    # Response buffers not sent yet, written with scatter-gather
+    outbufs: deque[memoryview] = field(default_factory=deque)
+    # A request of this connection is in the thread pool; pipelined requests wait in inbuf
+    busy: bool = False
+    # The worker has queued the last part of the response
+    response_done: bool = False
+    # Bytes queued by the worker and not sent yet, guarded by `writable`
+    pending_bytes: int = 0
+    writable: Condition = field(default_factory=Condition)
+    close_after_write: bool = False
+    closed: bool = False
+    requests_served: int = 0
+    last_activity: float = field(default_factory=time.monotonic)
+    # When the first byte of the request still being received arrived
+    request_started: float | None = None
+
+
+connections: dict[socket.socket, ClientConnection] = {}
+
+# Workers hand response parts to the selector thread, which alone touches sockets and the selector:
+# (connection, buffers, last part, keep alive)
+completed_responses: Queue[tuple[ClientConnection, list[memoryview], bool, bool]] = Queue()
+wakeup_recv, wakeup_send = socket.socketpair()
+wakeup_recv.setblocking(False)
+wakeup_send.setblocking(False)
+
+
+def accept(server_sock: socket.socket, mask: int):
     try:
         client_sock, addr = server_sock.accept()
         print(f"[+] Accepted connection from {addr}")
         
         client_sock.setblocking(False)
-        
-        selector.register(client_sock, selectors.EVENT_READ, read)
+        client_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        connections[client_sock] = ClientConnection(client_sock, addr)
+        selector.register(client_sock, selectors.EVENT_READ, client_ready)
     except Exception as e:
         print("[!] Error in accept_connection:", e)
         traceback.print_exc()
 
 
-def read(client_sock: socket.socket):
+def client_ready(client_sock: socket.socket, mask: int):
+    conn = connections.get(client_sock)
+    if conn is None:
+        return
+
     try:
-        request_bytes = client_sock.recv(4096)
-        if not request_bytes:
-            print("[*] Client closed connection")
-            
-            selector.unregister(client_sock)
-            
-            client_sock.close()
-            return
+        if mask & selectors.EVENT_READ:
+            read(conn)
+        if mask & selectors.EVENT_WRITE and not conn.closed:
+            write(conn)
+    except Exception as e:
+        print("[!] Error in client_ready:", e)
+        traceback.print_exc()
+        close_connection(conn)
+
+
+def read(conn: ClientConnection):
+    try:
+        data = conn.sock.recv(RECV_BUFFER_SIZE)
+    except (BlockingIOError, InterruptedError):
+        return
+    except ConnectionError:
+        close_connection(conn)
+        return
+
+    if not data:
+        print("[*] Client closed connection")
+        close_connection(conn)
+        return
+
+    now = time.monotonic()
+    if not conn.inbuf:
+        conn.request_started = now
+    conn.inbuf += data
+    conn.last_activity = now
+
+    dispatch_next_request(conn)
+
+
+def dispatch_next_request(conn: ClientConnection):
+    """
+    Hand the next complete request in the buffer to the thread pool.
+    The socket leaves the selector until its response is written, so requests are answered in order.
+    """
+    if conn.busy or conn.closed:
+        return
+
+    header_end = conn.inbuf.find(b"\r\n\r\n")
+    if header_end < 0:
+        if len(conn.inbuf) > MAX_REQUEST_HEADER_BYTES:
+            respond_and_close(conn, 431, "Request header fields too large\n")
+        return
+
+    head = bytes(conn.inbuf[:header_end]).decode("iso-8859-1")
+    try:
+        http_version, headers = parse_request_head(head)
+        content_length = int(headers.get("content-length", "0"))
+        if content_length < 0:
+            raise ValueError("negative Content-Length")
+    except ValueError:
+        respond_and_close(conn, 400, "Bad request\n")
+        return
+
+    if "transfer-encoding" in headers:
+        respond_and_close(conn, 501, "Chunked request bodies are not supported\n")
+        return
+    if content_length > MAX_REQUEST_BODY_BYTES:
+        respond_and_close(conn, 413, "Request body too large\n")
+        return
+
+    request_end = header_end + 4 + content_length
+    if len(conn.inbuf) < request_end:
+        return
+
+    request_bytes = bytes(conn.inbuf[:request_end])
+    del conn.inbuf[:request_end]
+    conn.request_started = time.monotonic() if conn.inbuf else None
+
+    keep_alive = wants_keep_alive(http_version, headers) and conn.requests_served + 1 < MAX_KEEP_ALIVE_REQUESTS
+
+    conn.busy = True
+    conn.response_done = False
+    selector.unregister(conn.sock)
+    executor.submit(process_request, conn, request_bytes, keep_alive)
+
+
+def parse_request_head(head: str) -> tuple[str, dict[str, str]]:
+    lines = head.split("\r\n")
+    parts = lines[0].split(" ")
+
+    if len(parts) < 3 or not parts[2].startswith("HTTP/"):
+        raise ValueError("Malformed request line")
+
+    headers: dict[str, str] = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
 
-        selector.unregister(client_sock)
+    return parts[2], headers
 
-        executor.submit(handle_http_request, client_sock, request_bytes)
 
+def wants_keep_alive(http_version: str, headers: dict[str, str]) -> bool:
+    tokens = {token.strip().lower() for token in headers.get("connection", "").split(",")}
+
+    if http_version == "HTTP/1.0":
+        return "keep-alive" in tokens
+    return "close" not in tokens
+
+
+def process_request(conn: ClientConnection, request_bytes: bytes, keep_alive: bool):
+    # Runs in the thread pool
+    resp = handle_http_request(request_bytes)
+
+    if isinstance(resp, StreamingResponse):
+        stream_response(conn, resp, keep_alive)
+    else:
+        queue_response(conn, with_connection_header(resp, keep_alive), True, keep_alive)
+
+
+def stream_response(conn: ClientConnection, resp: StreamingResponse, keep_alive: bool):
+    """
+    Queue the body chunk by chunk as it is produced, waiting while too much of it is unsent,
+    so a slow client holds at most STREAM_HIGH_WATERMARK of it in memory.
+    """
+    try:
+        queue_response(conn, with_connection_header(resp.head, keep_alive), False, keep_alive)
+
+        for chunk in resp.chunks:
+            if not chunk:
+                continue
+
+            with conn.writable:
+                while conn.pending_bytes > STREAM_HIGH_WATERMARK and not conn.closed:
+                    conn.writable.wait()
+            if conn.closed:
+                return
+
+            queue_response(conn, chunk_frame(chunk), False, keep_alive)
+
+        queue_response(conn, [LAST_CHUNK], True, keep_alive)
     except Exception as e:
-        print("[!] Error in handle_client_ready:", e)
+        print("[!] Error in stream_response:", e)
         traceback.print_exc()
-        try:
-            selector.unregister(client_sock)
-        except Exception:
+        # The status line is already out, an unterminated body is how the client learns about it
+        queue_response(conn, [], True, False)
+    finally:
+        resp.chunks.close()
+
+
+def queue_response(conn: ClientConnection, buffers: list[bytes | memoryview], last: bool, keep_alive: bool):
+    views = [memoryview(buffer) for buffer in buffers]
+    with conn.writable:
+        conn.pending_bytes += sum(view.nbytes for view in views)
+
+    completed_responses.put((conn, views, last, keep_alive))
+    try:
+        wakeup_send.send(b"\0")
+    except (BlockingIOError, InterruptedError):
+        # The wakeup socket is full, so the selector is already going to wake up
+        pass
+
+
+def with_connection_header(resp: bytes, keep_alive: bool) -> list[bytes | memoryview]:
+    """
+    Buffers of the response with the Connection headers after its status line. The rest is not copied.
+    """
+    status_line_end = resp.index(b"\r\n") + 2
+
+    if keep_alive:
+        connection = f"Connection: keep-alive\r\nKeep-Alive: timeout={KEEP_ALIVE_TIMEOUT}\r\n".encode("ascii")
+    else:
+        connection = b"Connection: close\r\n"
+
+    view = memoryview(resp)
+    return [view[:status_line_end], connection, view[status_line_end:]]
+
+
+def drain_completed_responses(sock: socket.socket, mask: int):
+    try:
+        while sock.recv(4096):
             pass
-        client_sock.close()
+    except (BlockingIOError, InterruptedError):
+        pass
+
+    while not completed_responses.empty():
+        conn, buffers, last, keep_alive = completed_responses.get_nowait()
+        if conn.closed:
+            continue
+
+        conn.outbufs.extend(buffers)
+        conn.last_activity = time.monotonic()
+        if last:
+            conn.response_done = True
+            conn.close_after_write = not keep_alive
+
+        watch_for_write(conn)
+        # Most responses fit in the socket buffer, try right away instead of waiting for the next select
+        write(conn)
+
+
+def watch_for_write(conn: ClientConnection):
+    try:
+        selector.modify(conn.sock, selectors.EVENT_WRITE, client_ready)
+    except KeyError:
+        selector.register(conn.sock, selectors.EVENT_WRITE, client_ready)
+
+
+def send_buffers(conn: ClientConnection) -> int:
+    if hasattr(conn.sock, "sendmsg"):
+        return conn.sock.sendmsg(list(islice(conn.outbufs, MAX_SEND_BUFFERS)))
+
+    return conn.sock.send(conn.outbufs[0])
+
+
+def consume_sent(conn: ClientConnection, sent: int):
+    remaining = sent
+    while remaining:
+        view = conn.outbufs[0]
+        if view.nbytes <= remaining:
+            remaining -= view.nbytes
+            conn.outbufs.popleft()
+        else:
+            conn.outbufs[0] = view[remaining:]
+            remaining = 0
+
+    with conn.writable:
+        conn.pending_bytes -= sent
+        conn.writable.notify_all()
+
+
+def write(conn: ClientConnection):
+    if conn.outbufs:
+        try:
+            sent = send_buffers(conn)
+        except (BlockingIOError, InterruptedError):
+            return
+        except ConnectionError:
+            close_connection(conn)
+            return
+
+        consume_sent(conn, sent)
+        conn.last_activity = time.monotonic()
+        if conn.outbufs:
+            return
+
+    if not conn.response_done:
+        # The worker is still producing the body, its next part watches the socket again
+        selector.unregister(conn.sock)
+        return
+
+    conn.requests_served += 1
+    if conn.close_after_write:
+        close_connection(conn)
+        return
+
+    conn.busy = False
+    selector.modify(conn.sock, selectors.EVENT_READ, client_ready)
+    # A pipelined request may already be buffered
+    dispatch_next_request(conn)
+
+
+def respond_and_close(conn: ClientConnection, status_code: int, body: str):
+    """
+    Answer a request that cannot be parsed or accepted, from the selector thread.
+    """
+    conn.busy = True
+    conn.response_done = False
+    conn.inbuf.clear()
+    selector.unregister(conn.sock)
+    queue_response(conn, with_connection_header(build_http_response(status_code, body), False), True, False)
+
+
+def close_connection(conn: ClientConnection):
+    if conn.closed:
+        return
+
+    conn.closed = True
+    connections.pop(conn.sock, None)
+    # Wake a worker waiting for this connection's buffers to drain
+    with conn.writable:
+        conn.writable.notify_all()
+    try:
+        selector.unregister(conn.sock)
+    except (KeyError, ValueError):
+        pass
+    try:
+        conn.sock.close()
+    except OSError:
+        pass
+
+
+def close_idle_connections():
+    now = time.monotonic()
+
+    for conn in list(connections.values()):
+        if conn.busy:
+            if conn.outbufs and now - conn.last_activity > RESPONSE_WRITE_TIMEOUT:
+                print(f"[*] Response write timeout for {conn.addr}")
+                close_connection(conn)
+            continue
+
+        if conn.request_started is not None and now - conn.request_started > REQUEST_READ_TIMEOUT:
+            print(f"[*] Request read timeout for {conn.addr}")
+            close_connection(conn)
+        elif now - conn.last_activity > KEEP_ALIVE_TIMEOUT:
+            close_connection(conn)
 
 
 def parse_http_request(request_bytes: bytes):
@@ -93,12 +484,12 @@ def parse_http_request(request_bytes: bytes):
         name, _, value = line.partition(":")
         headers[name.strip().lower()] = value.strip()
 
-    return method, path, query_params, headers, body
+    return method, path, query_params, headers, body, http_version
 
 
-def handle_http_request(client_sock: socket.socket, request_bytes: bytes):
+def handle_http_request(request_bytes: bytes) -> bytes | StreamingResponse:
     try:
-        method, path, query_params, headers, body = parse_http_request(request_bytes)
+        method, path, query_params, headers, body, http_version = parse_http_request(request_bytes)
         print(f"[HTTP] {method} {path} {query_params}")
 
         if method.upper() == "OPTIONS":
@@ -111,11 +502,19 @@ def handle_http_request(client_sock: socket.socket, request_bytes: bytes):
             segments = [s for s in path.split("/") if s]
 
             if len(segments) == 2 and segments[0] == "instruments":
-                resp = handle_price_fetch(segments, query_params)
+                resp = handle_price_fetch(segments, query_params, headers, http_version)
+            elif len(segments) == 3 and segments[0] == "instruments" and segments[2] == "bars":
+                resp = handle_bars_fetch(segments, query_params, headers)
             elif len(segments) == 3 and segments[0] == "instruments" and segments[2] == "hurst":
-                resp = handle_hurst_fetch(segments, query_params)
+                resp = handle_hurst_fetch(segments, query_params, headers)
             elif len(segments) == 3 and segments[0] == "instruments" and segments[2] == "permutation-entropy":
-                resp = handle_pe_fetch(segments, query_params)
+                resp = handle_pe_fetch(segments, query_params, headers)
+            elif len(segments) == 3 and segments[0] == "instruments" and segments[2] == "indicators" and method.upper() == "POST":
+                resp = handle_indicators_fetch(segments, body, headers)
+            elif len(segments) == 4 and segments[0] == "instruments" and segments[2] == "hurst" and segments[3] == "live":
+                resp = handle_live_hurst_fetch(segments)
+            elif len(segments) == 4 and segments[0] == "instruments" and segments[2] == "permutation-entropy" and segments[3] == "live":
+                resp = handle_live_pe_fetch(segments, query_params, headers)
             else:
                 resp = build_http_response(404, f"Not found: {path}\n")
 
@@ -124,22 +523,15 @@ def handle_http_request(client_sock: socket.socket, request_bytes: bytes):
         traceback.print_exc()
         resp = build_http_response(500, "Internal Server Error\n")
 
-    try:
-        client_sock.sendall(resp)
-    except Exception as e:
-        print("[!] Error sending response:", e)
-        traceback.print_exc()
-    finally:
-        try:
-            client_sock.close()
-        except Exception:
-            pass
+    return resp
 
 
 def handle_price_fetch(
     segments: list[str],
-    query_params: dict[str, str|list[str]]
-    ) -> bytes:
+    query_params: dict[str, str|list[str]],
+    headers: dict[str, str],
+    http_version: str = "HTTP/1.1",
+    ) -> bytes | StreamingResponse:
     try:
         minutes_raw = query_params.get("minutes")
 
@@ -150,21 +542,92 @@ def handle_price_fetch(
     except TypeError or ValueError:
         resp = build_http_response(400, "Invalid 'minutes' value\n")
 
-    data = load_instrument_price_history(segments[1], minutes)
+    binary = accepts_price_columns(headers.get("accept"))
+    content_type = PRICE_COLUMNS_MEDIA_TYPE if binary else "application/json; charset=utf-8"
+
+    etag = price_history_etag(segments[1], minutes, PRICE_COLUMNS_MEDIA_TYPE if binary else "application/json")
+    if etag is not None and etag_matches(headers.get("if-none-match"), etag):
+        return build_http_response(304, "", extra_headers={"ETag": format_weak_etag(etag), "Vary": "Accept"})
+
+    if binary:
+        timestamps, prices = load_instrument_price_columns(segments[1], minutes)
+        resp_body = encode_price_columns(timestamps, prices, PRICE_TICK_SCALE)
+    elif etag is None and supports_chunked(http_version):
+        # The lookback reaches into the DB and can be any size, rows are sent as they are read
+        try:
+            chunks = iter_price_history_json(iter_instrument_price_batches(segments[1], minutes))
+        except ValueError as e:
+            status = 404 if "Unknown instrument" in str(e) else 400
+            return build_http_response(status, f"{e}\n")
+
+        return build_streaming_response(
+            200,
+            chunks,
+            content_type=content_type,
+            extra_headers={"Vary": "Accept"},
+            accept_encoding=headers.get("accept-encoding"),
+        )
+    else:
+        data = load_instrument_price_history(segments[1], minutes)
+        resp_body = json.dumps([tick.to_dict() for tick in data]).encode("utf-8")
+
+    if etag is None:
+        # Without a version known upfront the body is tagged, which still saves the transfer
+        etag = body_etag(resp_body)
+        if etag_matches(headers.get("if-none-match"), etag):
+            return build_http_response(304, "", extra_headers={"ETag": format_weak_etag(etag), "Vary": "Accept"})
 
-    resp_body = json.dumps([tick.to_dict() for tick in data])
     resp = build_http_response(
         200,
         resp_body,
-        content_type="application/json; charset=utf-8",
+        content_type=content_type,
+        extra_headers={"ETag": format_weak_etag(etag), "Vary": "Accept"},
+        accept_encoding=headers.get("accept-encoding"),
+        compressible=True,
     )
     
     return resp
 
 
+def handle_bars_fetch(
+    segments: list[str],
+    query_params: dict[str, str|list[str]],
+    headers: dict[str, str],
+    ) -> bytes:
+    resolution = query_params.get("resolution", "1m")
+
+    try:
+        from_raw = query_params.get("from")
+        to_raw = query_params.get("to")
+
+        if not isinstance(resolution, str) or isinstance(from_raw, list) or isinstance(to_raw, list):
+            raise TypeError
+
+        from_ts = int(from_raw) if from_raw is not None else None
+        to_ts = int(to_raw) if to_raw is not None else None
+    except (TypeError, ValueError):
+        return build_http_response(400, "Invalid query params\n")
+
+    try:
+        start, end = bars_range(resolution, from_ts, to_ts)
+        bars = load_instrument_bars(segments[1], resolution, start, end)
+    except ValueError as e:
+        status = 404 if "Unknown instrument" in str(e) else 400
+        return build_http_response(status, f"{e}\n")
+
+    return build_http_response(
+        200,
+        json.dumps([bar_to_dict(bar) for bar in bars]),
+        content_type="application/json; charset=utf-8",
+        accept_encoding=headers.get("accept-encoding"),
+        compressible=True,
+    )
+
+
 def handle_hurst_fetch(
     segments: list[str],
-    query_params: dict[str, str|list[str]]
+    query_params: dict[str, str|list[str]],
+    headers: dict[str, str],
     ) -> bytes:
     try:
         minutes_raw = query_params.get("minutes")
@@ -178,21 +641,19 @@ def handle_hurst_fetch(
     except TypeError or ValueError:
         resp = build_http_response(400, "Invalid query params\n")
     
-    result = load_instrument_price_history(segments[1], minutes)
+    etag = indicator_etag("hurst", segments[1], minutes)
+    if etag is not None and etag_matches(headers.get("if-none-match"), etag):
+        return build_http_response(304, "", extra_headers={"ETag": format_weak_etag(etag)})
 
-    ticksIterable: Iterable[Tick] = sorted([
-        (datetime.fromtimestamp(tick.timestamp), tick.price) for tick in result
-    ])
-    
     try:
-        minutesClosePrice = [bar.close for bar in minute_bars_from_ticks(ticksIterable, fill_missing_minutes=False)]
-        hurst_coefficient = hurst_exponent_minutes_rs_multiprocessed(minutesClosePrice, num_workers=workers)
+        hurst_coefficient = instrument_hurst(segments[1], minutes, workers)
     
         resp_body = json.dumps(hurst_coefficient)
         resp = build_http_response(
             200,
             resp_body,
             content_type="application/json; charset=utf-8",
+            extra_headers={"ETag": format_weak_etag(etag)} if etag is not None else None,
         )
     except:
         resp = build_http_response(400, "Invalid hurst calculation\n")
@@ -200,9 +661,85 @@ def handle_hurst_fetch(
     return resp
 
 
+def handle_indicators_fetch(segments: list[str], body: str, headers: dict[str, str]) -> bytes:
+    try:
+        payload = json.loads(body)
+        if not isinstance(payload, dict):
+            raise ValueError
+
+        minutes = int(payload.get("minutes", 100))
+        workers = int(payload["workers"]) if payload.get("workers") is not None else None
+    except (TypeError, ValueError):
+        return build_http_response(400, "Invalid request body\n")
+
+    try:
+        minutesClosePrice = load_minute_closes(segments[1], minutes)
+        results = evaluate_indicator_specs(minutesClosePrice, payload.get("indicators"), workers)
+    except ValueError as e:
+        status = 404 if "Unknown instrument" in str(e) else 400
+        return build_http_response(status, f"{e}\n")
+
+    return build_http_response(
+        200,
+        json.dumps(results),
+        content_type="application/json; charset=utf-8",
+        accept_encoding=headers.get("accept-encoding"),
+        compressible=True,
+    )
+
+
+def handle_live_hurst_fetch(segments: list[str]) -> bytes:
+    try:
+        instrument_name = InstrumentNameEnum(segments[1])
+    except ValueError:
+        return build_http_response(404, f"Unknown instrument: {segments[1]}\n")
+
+    hurst_coefficient = get_streaming_hurst(instrument_name).value
+    if hurst_coefficient is None:
+        return build_http_response(400, "Not enough minute points yet\n")
+
+    return build_http_response(
+        200,
+        json.dumps(hurst_coefficient),
+        content_type="application/json; charset=utf-8",
+    )
+
+
+def handle_live_pe_fetch(
+    segments: list[str],
+    query_params: dict[str, str|list[str]],
+    headers: dict[str, str],
+    ) -> bytes:
+    try:
+        instrument_name = InstrumentNameEnum(segments[1])
+    except ValueError:
+        return build_http_response(404, f"Unknown instrument: {segments[1]}\n")
+
+    try:
+        points_raw = query_params.get("points", "1")
+
+        if not isinstance(points_raw, str):
+            raise TypeError
+
+        last = int(points_raw)
+    except (TypeError, ValueError):
+        return build_http_response(400, "Invalid 'points' value\n")
+
+    series = get_rolling_permutation_entropy(instrument_name).series(last)
+
+    return build_http_response(
+        200,
+        json.dumps([{"value": value, "timestamp": minute} for minute, value in series]),
+        content_type="application/json; charset=utf-8",
+        accept_encoding=headers.get("accept-encoding"),
+        compressible=True,
+    )
+
+
 def handle_pe_fetch(
     segments: list[str],
-    query_params: dict[str, str|list[str]]
+    query_params: dict[str, str|list[str]],
+    headers: dict[str, str],
     ) -> bytes:
     try:
         minutes_raw = query_params.get("minutes")
@@ -216,21 +753,19 @@ def handle_pe_fetch(
     except TypeError or ValueError:
         resp = build_http_response(400, "Invalid query params\n")
     
-    result = load_instrument_price_history(segments[1], minutes)
+    etag = indicator_etag("permutation-entropy", segments[1], minutes)
+    if etag is not None and etag_matches(headers.get("if-none-match"), etag):
+        return build_http_response(304, "", extra_headers={"ETag": format_weak_etag(etag)})
 
-    ticksIterable: Iterable[Tick] = sorted([
-        (datetime.fromtimestamp(tick.timestamp), tick.price) for tick in result
-    ])
-    
     try:
-        minutesClosePrice = [bar.close for bar in minute_bars_from_ticks(ticksIterable, fill_missing_minutes=False)]
-        pe_coefficient = permutation_entropy_minutes_multiprocessed(minutesClosePrice, workers=workers)
+        pe_coefficient = instrument_permutation_entropy(segments[1], minutes, workers)
     
         resp_body = json.dumps(pe_coefficient)
         resp = build_http_response(
             200,
             resp_body,
             content_type="application/json; charset=utf-8",
+            extra_headers={"ETag": format_weak_etag(etag)} if etag is not None else None,
         )
     except:
         resp = build_http_response(400, "Invalid hurst calculation\n")
@@ -240,24 +775,64 @@ def handle_pe_fetch(
 
 def build_http_response(
     status_code: int,
-    body: str,
+    body: str | bytes,
     content_type: str = "text/plain; charset=utf-8",
     extra_headers: dict[str, str] | None = None,
+    accept_encoding: str | None = None,
+    compressible: bool = False,
 ) -> bytes:
-    reason = {
-        200: "OK",
-        204: "No Content",
-        400: "Bad Request",
-        404: "Not Found",
-        500: "Internal Server Error",
-    }.get(status_code, "OK")
+    body_bytes = body.encode("utf-8") if isinstance(body, str) else body
 
-    body_bytes = body.encode("utf-8")
+    headers = response_headers(content_type, extra_headers)
+    headers["Content-Length"] = str(len(body_bytes))
 
+    if compressible and status_code == 200:
+        headers["Vary"] = ", ".join(filter(None, [headers.get("Vary"), "Accept-Encoding"]))
+
+        encoding = negotiate_content_encoding(accept_encoding)
+        if encoding is not None and len(body_bytes) >= COMPRESSION_MIN_BYTES:
+            body_bytes = compress_body(body_bytes, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body_bytes))
+
+    return build_http_head(status_code, headers) + body_bytes
+
+
+def supports_chunked(http_version: str) -> bool:
+    """
+    HTTP/1.0 clients do not know chunked transfer coding, they get the buffered response.
+    """
+    return http_version != "HTTP/1.0"
+
+
+def build_streaming_response(
+    status_code: int,
+    chunks: Iterator[bytes] | AsyncIterator[bytes],
+    content_type: str = "text/plain; charset=utf-8",
+    extra_headers: dict[str, str] | None = None,
+    accept_encoding: str | None = None,
+) -> StreamingResponse:
+    """
+    Chunked response of a body whose size is not known upfront. Compressed on the fly when the client accepts it.
+    """
+    headers = response_headers(content_type, extra_headers)
+    headers["Transfer-Encoding"] = "chunked"
+    headers["Vary"] = ", ".join(filter(None, [headers.get("Vary"), "Accept-Encoding"]))
+
+    encoding = negotiate_content_encoding(accept_encoding)
+    if encoding is not None:
+        if hasattr(chunks, "__aiter__"):
+            chunks = compress_stream_async(chunks, encoding)
+        else:
+            chunks = compress_stream(chunks, encoding)
+        headers["Content-Encoding"] = encoding
+
+    return StreamingResponse(build_http_head(status_code, headers), chunks)
+
+
+def response_headers(content_type: str, extra_headers: dict[str, str] | None) -> dict[str, str]:
     headers = {
         "Content-Type": content_type,
-        "Content-Length": str(len(body_bytes)),
-        "Connection": "close",
         "Access-Control-Allow-Origin": ALLOWED_ORIGIN,
         "Access-Control-Allow-Credentials": "true",
         "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
@@ -267,12 +842,17 @@ def build_http_response(
     if extra_headers:
         headers.update(extra_headers)
 
+    return headers
+
+
+def build_http_head(status_code: int, headers: dict[str, str]) -> bytes:
+    reason = HTTP_REASONS.get(status_code, "OK")
+
     header_lines = [f"HTTP/1.1 {status_code} {reason}"]
     header_lines += [f"{k}: {v}" for k, v in headers.items()]
     header_lines += ["", ""]
 
-    header_bytes = "\r\n".join(header_lines).encode("ascii")
-    return header_bytes + body_bytes
+    return "\r\n".join(header_lines).encode("ascii")
 
 
 def create_listen_socket(host: str, port: int) -> socket.socket:
@@ -289,21 +869,41 @@ def main():
     print(f"[*] Listening on {HOST}:{PORT}")
 
     selector.register(server_sock, selectors.EVENT_READ, accept)
+    selector.register(wakeup_recv, selectors.EVENT_READ, drain_completed_responses)
 
     try:
         while True:
             events = selector.select(timeout=1.0)
-            for key, _ in events:
+            for key, mask in events:
                 callback = key.data
-                callback(key.fileobj)
+                callback(key.fileobj, mask)
+
+            close_idle_connections()
     except KeyboardInterrupt:
         print("\n[!] Shutting down...")
     finally:
+        for conn in list(connections.values()):
+            close_connection(conn)
         selector.close()
         server_sock.close()
         executor.shutdown(wait=False)
 
 
+def on_price_update(symbol: InstrumentNameEnum, p: InstrumentPrice):
+    timestamp = int(p.created_at.timestamp())
+    update_streaming_hurst(symbol, timestamp, float(p.price))
+    update_rolling_permutation_entropy(symbol, timestamp, float(p.price))
+
+
 if __name__ == "__main__":
+    # Fork the analytics workers before any generator/server threads exist
+    start_worker_pool()
+    start_partition_maintenance()
+    load_instrument_ids()
+    load_price_store()
+    seed_streaming_hurst(InstrumentNameEnum)
+    seed_rolling_permutation_entropy(InstrumentNameEnum)
+    register_price_update_callback(on_price_update)
+    register_price_update_callback(invalidate_indicator_cache)
     start_price_generation()
     main()
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Dict, Final, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.db.db import SessionLocal
+from app.models.instrument import InstrumentNameEnum
+from app.models.instrument_bar import InstrumentBar
+from app.models.instrument_minute_bar import InstrumentMinuteBar
+from app.services.instrument_ids import get_instrument_id
+from app.utils.tick_time_converter import MinuteBar, rollup_bars
+
+
+RESOLUTION_SECONDS: Final[Dict[str, int]] = {
+    "1m": 60,
+    "5m": 5 * 60,
+    "15m": 15 * 60,
+    "1h": 60 * 60,
+    "1d": 24 * 60 * 60,
+}
+
+# Every resolution is rolled up from the previous one
+ROLLUP_PARENT: Final[Dict[str, str]] = {
+    "5m": "1m",
+    "15m": "5m",
+    "1h": "15m",
+    "1d": "1h",
+}
+
+MAX_BARS_PER_REQUEST: Final[int] = 5000
+
+# Start of the bucket still being filled, per instrument and resolution
+_open_buckets: Dict[InstrumentNameEnum, Dict[str, Optional[int]]] = {
+    name: {resolution: None for resolution in ROLLUP_PARENT} for name in InstrumentNameEnum
+}
+_open_buckets_lock = Lock()
+
+
+def _select_bars(db: Session, instrument_id: int, resolution: str, start: datetime, end: datetime) -> List[MinuteBar]:
+    """
+    Stored bars with start in [start, end), oldest first.
+    """
+    if resolution == "1m":
+        stmt = (
+            select(
+                InstrumentMinuteBar.minute,
+                InstrumentMinuteBar.open,
+                InstrumentMinuteBar.high,
+                InstrumentMinuteBar.low,
+                InstrumentMinuteBar.close,
+                InstrumentMinuteBar.tick_count,
+            )
+            .where(
+                InstrumentMinuteBar.instrument_id == instrument_id,
+                InstrumentMinuteBar.minute >= start,
+                InstrumentMinuteBar.minute < end,
+            )
+            .order_by(InstrumentMinuteBar.minute)
+        )
+    else:
+        stmt = (
+            select(
+                InstrumentBar.start,
+                InstrumentBar.open,
+                InstrumentBar.high,
+                InstrumentBar.low,
+                InstrumentBar.close,
+                InstrumentBar.tick_count,
+            )
+            .where(
+                InstrumentBar.instrument_id == instrument_id,
+                InstrumentBar.resolution == resolution,
+                InstrumentBar.start >= start,
+                InstrumentBar.start < end,
+            )
+            .order_by(InstrumentBar.start)
+        )
+
+    return [
+        MinuteBar(bar_start, float(o), float(h), float(l), float(c), tick_count)
+        for bar_start, o, h, l, c, tick_count in db.execute(stmt).all()
+    ]
+
+
+def _persist_bar(db: Session, instrument_id: int, resolution: str, bar: MinuteBar) -> None:
+    stmt = insert(InstrumentBar).values(
+        instrument_id=instrument_id,
+        resolution=resolution,
+        start=bar.minute,
+        open=bar.open,
+        high=bar.high,
+        low=bar.low,
+        close=bar.close,
+        tick_count=bar.tick_count,
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_instrument_bars_instrument_id_resolution_start",
+        set_={
+            "open": stmt.excluded.open,
+            "high": stmt.excluded.high,
+            "low": stmt.excluded.low,
+            "close": stmt.excluded.close,
+            "tick_count": stmt.excluded.tick_count,
+            "updated_at": func.now(),
+        },
+    )
+    db.execute(stmt)
+
+
+def _close_bucket(db: Session, instrument_id: int, resolution: str, bucket_start: int) -> None:
+    seconds = RESOLUTION_SECONDS[resolution]
+    children = _select_bars(
+        db,
+        instrument_id,
+        ROLLUP_PARENT[resolution],
+        datetime.fromtimestamp(bucket_start, timezone.utc),
+        datetime.fromtimestamp(bucket_start + seconds, timezone.utc),
+    )
+
+    for bar in rollup_bars(children, seconds):
+        _persist_bar(db, instrument_id, resolution, bar)
+
+
+def update_bar_rollups(db: Session, instrument_id: int, name: InstrumentNameEnum, closed_minute: MinuteBar) -> None:
+    """
+    Called after a 1 minute bar is stored. Closes every higher resolution bucket
+    that ends with this minute, or that was left open because its last minutes had no ticks.
+    Resolutions are processed from the finest, so each one reads an up to date parent.
+    """
+    minute_start = int(closed_minute.minute.timestamp())
+    minute_end = minute_start + RESOLUTION_SECONDS["1m"]
+
+    for resolution in ROLLUP_PARENT:
+        seconds = RESOLUTION_SECONDS[resolution]
+        bucket = minute_start // seconds * seconds
+        to_close: List[int] = []
+
+        with _open_buckets_lock:
+            previous = _open_buckets[name][resolution]
+            if previous is not None and previous < bucket:
+                to_close.append(previous)
+
+            if minute_end % seconds == 0:
+                to_close.append(bucket)
+                _open_buckets[name][resolution] = None
+            else:
+                _open_buckets[name][resolution] = bucket
+
+        for bucket_start in to_close:
+            _close_bucket(db, instrument_id, resolution, bucket_start)
+
+    db.commit()
+
+
+def resume_bar_rollups(name: InstrumentNameEnum, last_minute: int) -> None:
+    """
+    After a restart: treat the buckets of the newest stored minute as open, so the next closed minute
+    closes them even if the server stopped before they ended. Closing an already stored one again only rewrites it.
+    """
+    with _open_buckets_lock:
+        for resolution in ROLLUP_PARENT:
+            seconds = RESOLUTION_SECONDS[resolution]
+            _open_buckets[name][resolution] = last_minute // seconds * seconds
+
+
+def load_instrument_bars(name: str, resolution: str, start: datetime, end: datetime) -> List[MinuteBar]:
+    """
+    Stored bars of the given resolution with start in [start, end), oldest first.
+    """
+    if resolution not in RESOLUTION_SECONDS:
+        raise ValueError(f"Unknown resolution: {resolution}")
+    if end <= start:
+        raise ValueError("'to' must be after 'from'")
+    if (end - start).total_seconds() / RESOLUTION_SECONDS[resolution] > MAX_BARS_PER_REQUEST:
+        raise ValueError(f"Range too long for {resolution} bars, at most {MAX_BARS_PER_REQUEST} bars per request")
+
+    try:
+        instrument_name = InstrumentNameEnum(name)
+    except ValueError:
+        raise ValueError(f"Unknown instrument: {name}")
+
+    instrument_id = get_instrument_id(instrument_name)
+    if instrument_id is None:
+        raise ValueError(f"Instrument {name} not found in DB")
+
+    with SessionLocal() as db:
+        return _select_bars(db, instrument_id, resolution, start, end)
+
+
+def _epoch_datetime(timestamp: float, name: str) -> datetime:
+    # Out of datetime's range the conversion raises OverflowError or OSError, not only ValueError
+    try:
+        return datetime.fromtimestamp(timestamp, timezone.utc)
+    except (OverflowError, OSError, ValueError):
+        raise ValueError(f"Invalid '{name}' value")
+
+
+def bars_range(resolution: str, from_ts: Optional[int], to_ts: Optional[int], default_bars: int = 100) -> tuple[datetime, datetime]:
+    """
+    [start, end) of a bars request given as epoch seconds; by default the last `default_bars` bars.
+    """
+    if resolution not in RESOLUTION_SECONDS:
+        raise ValueError(f"Unknown resolution: {resolution}")
+
+    end = _epoch_datetime(to_ts, "to") if to_ts is not None else datetime.now(timezone.utc)
+
+    if from_ts is not None:
+        start = _epoch_datetime(from_ts, "from")
+    else:
+        start = _epoch_datetime(end.timestamp() - default_bars * RESOLUTION_SECONDS[resolution], "to")
+
+    return start, end
+
+
+def bar_to_dict(bar: MinuteBar) -> dict:
+    return {
+        "timestamp": int(bar.minute.timestamp()),
+        "open": bar.open,
+        "high": bar.high,
+        "low": bar.low,
+        "close": bar.close,
+        "tick_count": bar.tick_count,
+    }
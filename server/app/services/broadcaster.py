@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import os
+import traceback
+from collections import deque
+from dataclasses import dataclass, field
+from threading import Condition, Thread
+from typing import Any, Deque, Dict, Final, List, Optional, Tuple
+
+from engineio import packet as eio_packet
+from socketio import packet
+
+
+# Messages a room holds for the broadcast thread; when it is full the oldest one is dropped
+BROADCAST_ROOM_QUEUE_SIZE: Final[int] = int(os.getenv("BROADCAST_ROOM_QUEUE_SIZE", 1024))
+# Packets a client may have queued in its socket before it counts as slow
+BROADCAST_SLOW_CONSUMER_PACKETS: Final[int] = int(os.getenv("BROADCAST_SLOW_CONSUMER_PACKETS", 64))
+# How often the latest messages held back for slow clients are retried
+BROADCAST_RETRY_INTERVAL: Final[float] = 0.05
+
+
+@dataclass
+class RoomQueue:
+    messages: Deque[Tuple[str, Any]] = field(default_factory=lambda: deque(maxlen=BROADCAST_ROOM_QUEUE_SIZE))
+    # Messages pushed out of the full queue before the broadcast thread got to them
+    dropped: int = 0
+    # Messages a slow client never got because a newer one of the same event replaced them
+    conflated: int = 0
+
+
+class Broadcaster:
+    """
+    Delivers room messages from one thread, so publishers (the tick writer) never wait for clients.
+
+    Each message is encoded once per room and the same packets are handed to every participant.
+    A participant whose socket already has BROADCAST_SLOW_CONSUMER_PACKETS queued is skipped;
+    only the latest message per room and event is kept for it and sent once it has caught up.
+    Until then its newer messages are held back too, so it never gets an older one after a newer one.
+    """
+
+    def __init__(self, server, namespace: str = "/"):
+        self.server = server
+        self.namespace = namespace
+
+        self._rooms: Dict[str, RoomQueue] = {}
+        self._condition = Condition()
+        # eio sid -> (room, event) -> packets of the latest message held back for a slow client
+        self._held_back: Dict[str, Dict[Tuple[str, str], List[eio_packet.Packet]]] = {}
+        self._stopping = False
+        self._thread: Optional[Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def publish(self, room: str, event: str, data: Any) -> None:
+        with self._condition:
+            queue = self._rooms.get(room)
+            if queue is None:
+                queue = self._rooms[room] = RoomQueue()
+
+            if len(queue.messages) == queue.messages.maxlen:
+                queue.dropped += 1
+            queue.messages.append((event, data))
+            self._condition.notify()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Per room: messages waiting for the broadcast thread, dropped and conflated message counts,
+        and how many of its participants are being held back.
+        """
+        with self._condition:
+            slow = set(self._held_back)
+            rooms = {
+                room: {"depth": len(queue.messages), "dropped": queue.dropped, "conflated": queue.conflated}
+                for room, queue in self._rooms.items()
+            }
+
+        for room, room_stats in rooms.items():
+            room_stats["slow_consumers"] = sum(
+                1 for _, eio_sid in self.server.manager.get_participants(self.namespace, room) if eio_sid in slow
+            )
+
+        return rooms
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopping and not any(queue.messages for queue in self._rooms.values()):
+                    if self._held_back:
+                        self._condition.wait(BROADCAST_RETRY_INTERVAL)
+                        break
+                    self._condition.wait()
+
+                if self._stopping:
+                    return
+
+                batch = [(room, list(queue.messages)) for room, queue in self._rooms.items() if queue.messages]
+                for queue in self._rooms.values():
+                    queue.messages.clear()
+
+            try:
+                for room, messages in batch:
+                    for event, data in messages:
+                        self._deliver(room, event, data)
+
+                self._send_held_back()
+            except Exception:
+                traceback.print_exc()
+
+    def _encode(self, event: str, data: Any) -> List[eio_packet.Packet]:
+        encoded = self.server.packet_class(packet.EVENT, namespace=self.namespace, data=[event, data]).encode()
+        if not isinstance(encoded, list):
+            encoded = [encoded]
+
+        return [eio_packet.Packet(eio_packet.MESSAGE, part) for part in encoded]
+
+    def _deliver(self, room: str, event: str, data: Any) -> None:
+        eio_packets = self._encode(event, data)
+        conflated = 0
+
+        for _, eio_sid in self.server.manager.get_participants(self.namespace, room):
+            # A client with held back messages gets this one after them, not before
+            if eio_sid not in self._held_back and self._queued_packets(eio_sid) < BROADCAST_SLOW_CONSUMER_PACKETS:
+                self._send(eio_sid, eio_packets)
+                continue
+
+            with self._condition:
+                held_back = self._held_back.setdefault(eio_sid, {})
+                if held_back.pop((room, event), None) is not None:
+                    conflated += 1
+                held_back[(room, event)] = eio_packets
+
+        if conflated:
+            with self._condition:
+                self._rooms[room].conflated += conflated
+
+    def _send_held_back(self) -> None:
+        # Only the broadcast thread adds held back messages, so nothing new arrives while this runs
+        for eio_sid in list(self._held_back):
+            if eio_sid not in self.server.eio.sockets:
+                with self._condition:
+                    self._held_back.pop(eio_sid, None)
+                continue
+
+            if self._queued_packets(eio_sid) >= BROADCAST_SLOW_CONSUMER_PACKETS:
+                continue
+
+            with self._condition:
+                held_back = self._held_back.pop(eio_sid)
+
+            # Oldest first, a replaced message moved to the end when it was replaced
+            for eio_packets in held_back.values():
+                self._send(eio_sid, eio_packets)
+
+    def _queued_packets(self, eio_sid: str) -> int:
+        socket = self.server.eio.sockets.get(eio_sid)
+        if socket is None:
+            return 0
+
+        return socket.queue.qsize()
+
+    def _send(self, eio_sid: str, eio_packets: List[eio_packet.Packet]) -> None:
+        for eio_pkt in eio_packets:
+            try:
+                self.server._send_eio_packet(eio_sid, eio_pkt)
+            except Exception:
+                # The client went away between listing and sending
+                pass
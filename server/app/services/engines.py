@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from typing import Optional
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+
+ENGINE_NUMPY = "numpy"
+ENGINE_MULTIPROCESSING = "multiprocessing"
+DEFAULT_ENGINE = ENGINE_NUMPY if np is not None else ENGINE_MULTIPROCESSING
+
+
+def resolve_engine(engine: Optional[str]) -> str:
+    engine = engine or DEFAULT_ENGINE
+
+    if engine not in (ENGINE_NUMPY, ENGINE_MULTIPROCESSING):
+        raise ValueError(f"Unknown engine: {engine}")
+    if engine == ENGINE_NUMPY and np is None:
+        raise ValueError("numpy engine requested, but numpy is not installed")
+
+    return engine
@@ -2,9 +2,12 @@ from __future__ import annotations
 
 import math
 import statistics
-from multiprocessing import Pool, cpu_count
 from typing import List, Tuple
 
+from app.services.engines import ENGINE_NUMPY, np, resolve_engine
+from app.services.shared_series import SharedSeriesHandle, read_shared_series, shared_series
+from app.services.worker_pool import clamp_workers, get_worker_pool
+
 
 def logspace_intervals(min_w: int, max_w: int, count: int) -> List[int]:
     min_w = max(2, int(min_w))
@@ -88,6 +91,38 @@ def rs_mean_for_window(args: Tuple[List[float], int]) -> Tuple[int, float]:
     return window, sum(rs_vals) / len(rs_vals)
 
 
+def rs_mean_for_shared_window(args: Tuple[SharedSeriesHandle, int]) -> Tuple[int, float]:
+    handle, window = args
+    return rs_mean_for_window((read_shared_series(handle), window))
+
+
+def rs_mean_for_window_numpy(series: "np.ndarray", window: int) -> Tuple[int, float]:
+    """
+    Same result as rs_mean_for_window, but all chunks of the window are
+    stacked in a (n_chunks, window) matrix and reduced in one pass.
+    """
+    n = series.shape[0]
+
+    if window >= n or window < 2:
+        return window, math.nan
+
+    n_chunks = n // window
+    chunks = series[:n_chunks * window].reshape(n_chunks, window)
+
+    means = chunks.mean(axis=1, keepdims=True)
+    cum = np.cumsum(chunks - means, axis=1)
+
+    # The cumulative walk starts at 0, so 0 takes part in the range too
+    R = np.maximum(cum.max(axis=1), 0.0) - np.minimum(cum.min(axis=1), 0.0)
+    S = chunks.std(axis=1, ddof=1)
+
+    valid = (S > 0.0) & np.isfinite(R) & np.isfinite(S)
+    if not valid.any():
+        return window, math.nan
+
+    return window, float((R[valid] / S[valid]).mean())
+
+
 def hurst_exponent_minutes_rs_multiprocessed(
     minute_series: List[float],
     *,
@@ -96,7 +131,10 @@ def hurst_exponent_minutes_rs_multiprocessed(
     max_window: int | None = None,
     num_windows: int = 20,
     num_workers: int | None = None,
+    engine: str | None = None,
 ) -> float:
+    engine = resolve_engine(engine)
+
     data = [minute_series[i] - minute_series[i-1] for i in range(1, len(minute_series))]
     n = len(data)
 
@@ -110,10 +148,19 @@ def hurst_exponent_minutes_rs_multiprocessed(
     if len(windows) < 5:
         raise ValueError("Not enough distinct window sizes; adjust min/max/num_windows.")
 
-    workers = num_workers or max(1, cpu_count() - 1)
-
-    with Pool(processes=workers) as pool:
-        results = pool.map(rs_mean_for_window, [(data, w) for w in windows])
+    if engine == ENGINE_NUMPY:
+        series = np.asarray(data, dtype=np.float64)
+        results = [rs_mean_for_window_numpy(series, w) for w in windows]
+    else:
+        workers = clamp_workers(num_workers)
+        chunksize = max(1, len(windows) // workers)
+
+        with shared_series(data) as handle:
+            results = get_worker_pool().map(
+                rs_mean_for_shared_window,
+                [(handle, w) for w in windows],
+                chunksize=chunksize,
+            )
 
     xs: List[float] = []
     ys: List[float] = []
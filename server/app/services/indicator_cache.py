@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Event, Lock
+from typing import Any, Awaitable, Callable, Dict, Final, Hashable, Optional, Tuple
+
+from app.models.instrument import InstrumentNameEnum
+from app.models.instrument_price import InstrumentPrice
+from app.services.response_versions import indicator_version
+
+
+INDICATOR_CACHE_SIZE: Final[int] = int(os.getenv("INDICATOR_CACHE_SIZE", 256))
+INDICATOR_CACHE_TTL: Final[float] = int(os.getenv("INDICATOR_CACHE_TTL_SECONDS", 120))
+
+
+@dataclass
+class _Computation:
+    done: Event = field(default_factory=Event)
+    value: Any = None
+    error: Optional[BaseException] = None
+
+
+class IndicatorCache:
+    """
+    Bounded LRU of indicator results with a TTL.
+    Concurrent requests for the same key wait for the one computation in progress
+    instead of starting their own. Failures are passed to the waiters but not cached.
+    """
+
+    def __init__(self, max_entries: int = INDICATOR_CACHE_SIZE, ttl: float = INDICATOR_CACHE_TTL):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+
+        self._entries: OrderedDict[Hashable, Tuple[float, Any]] = OrderedDict()
+        self._in_flight: Dict[Hashable, _Computation] = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        # Caller holds the lock
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                return True, value
+            del self._entries[key]
+
+        return False, None
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        # Caller holds the lock
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        (True, value) for a fresh entry, (False, None) otherwise. Never waits for a computation.
+        """
+        with self._lock:
+            return self._lookup(key)
+
+    def store(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._store(key, value)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                return value
+
+            computation = self._in_flight.get(key)
+            owner = computation is None
+            if owner:
+                computation = _Computation()
+                self._in_flight[key] = computation
+
+        if not owner:
+            computation.done.wait()
+            if computation.error is not None:
+                raise computation.error
+            return computation.value
+
+        try:
+            computation.value = compute()
+        except BaseException as e:
+            computation.error = e
+            raise
+        else:
+            with self._lock:
+                self._store(key, computation.value)
+            return computation.value
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            computation.done.set()
+
+    def evict(self, predicate: Callable[[Hashable], bool]) -> int:
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                del self._entries[key]
+
+        return len(stale)
+
+
+indicator_cache = IndicatorCache()
+
+# Version the cache was last pruned for, per instrument
+_pruned_versions: Dict[InstrumentNameEnum, Optional[tuple]] = {name: None for name in InstrumentNameEnum}
+_pruned_versions_lock = Lock()
+
+
+# Computations of the asyncio server, awaited by every request for the same key
+_async_in_flight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+
+def indicator_cache_key(indicator: str, name: str, minutes: int, params: tuple) -> Optional[Hashable]:
+    """
+    Key of (indicator, instrument, minutes, params) at the current bar version,
+    None when there is no version yet (no bar closed in this process).
+    """
+    try:
+        instrument_name = InstrumentNameEnum(name)
+    except ValueError:
+        return None
+
+    version = indicator_version(instrument_name)
+    if version is None:
+        return None
+
+    return instrument_name, indicator, minutes, params, version
+
+
+def cached_indicator(indicator: str, name: str, minutes: int, params: tuple, compute: Callable[[], Any]) -> Any:
+    """
+    Result of `compute` for (indicator, instrument, minutes, params) at the current bar version.
+    Without a known version (no bar closed yet in this process) the value is computed every time.
+    """
+    key = indicator_cache_key(indicator, name, minutes, params)
+    if key is None:
+        return compute()
+
+    return indicator_cache.get_or_compute(key, compute)
+
+
+async def cached_indicator_async(
+    indicator: str,
+    name: str,
+    minutes: int,
+    params: tuple,
+    compute: Callable[[], Awaitable[Any]],
+) -> Any:
+    """
+    cached_indicator for coroutines: requests waiting for the same key await one task
+    instead of blocking a thread. Shares the cache with the threaded servers.
+    """
+    key = indicator_cache_key(indicator, name, minutes, params)
+    if key is None:
+        return await compute()
+
+    found, value = indicator_cache.lookup(key)
+    if found:
+        return value
+
+    task = _async_in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(compute())
+        _async_in_flight[key] = task
+
+        def finished(done: "asyncio.Future[Any]") -> None:
+            _async_in_flight.pop(key, None)
+            if not done.cancelled() and done.exception() is None:
+                indicator_cache.store(key, done.result())
+
+        task.add_done_callback(finished)
+
+    # One client going away must not cancel the computation the others wait for
+    return await asyncio.shield(task)
+
+
+def invalidate_indicator_cache(symbol: InstrumentNameEnum, p: InstrumentPrice) -> None:
+    """
+    Price update callback: once a new bar has closed, drop the results computed for older bars.
+    """
+    version = indicator_version(symbol)
+
+    with _pruned_versions_lock:
+        if version is None or version == _pruned_versions[symbol]:
+            return
+        _pruned_versions[symbol] = version
+
+    indicator_cache.evict(lambda key: key[0] == symbol and key[4] != version)
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Callable, Dict, List, Optional
+
+from app.services.engines import DEFAULT_ENGINE, ENGINE_NUMPY
+from app.services.hurst_exponent import hurst_exponent_minutes_rs_multiprocessed
+from app.services.indicator_cache import cached_indicator, cached_indicator_async
+from app.services.minute_bars import load_instrument_minute_closes, load_instrument_minute_closes_async
+from app.services.permutation_entropy import (
+    multiscale_permutation_entropy,
+    permutation_entropy_minutes_multiprocessed,
+)
+from app.services.worker_pool import run_in_pool
+
+
+IndicatorSpec = Dict[str, Any]
+
+MAX_INDICATOR_SPECS = 32
+
+# Hurst costs grow with the number and size of the R/S windows
+HURST_MAX_NUM_WINDOWS = 100
+HURST_MAX_WINDOW = 1_000_000
+HURST_MAX_MIN_POINTS = 1_000_000
+
+# Permutation entropy costs grow with m!, keep the user given parameters where a request stays cheap
+PE_MIN_M = 2
+PE_MAX_M = 8
+PE_MAX_TAU = 60
+MAX_PE_SCALES = 20
+PE_MAX_SCALE = 60
+
+
+def load_minute_closes(name: str, minutes: int) -> List[float]:
+    return load_instrument_minute_closes(name, minutes)
+
+
+async def load_minute_closes_async(name: str, minutes: int) -> List[float]:
+    return await load_instrument_minute_closes_async(name, minutes)
+
+
+def instrument_hurst(name: str, minutes: int, workers: Optional[int] = None) -> float:
+    """
+    Hurst exponent of the instrument's minute closes, computed once per bar version.
+    `workers` only changes how the value is computed, so it is not part of the cache key.
+    """
+    return cached_indicator(
+        "hurst", name, minutes, (),
+        lambda: hurst_exponent_minutes_rs_multiprocessed(load_minute_closes(name, minutes), num_workers=workers),
+    )
+
+
+def instrument_permutation_entropy(name: str, minutes: int, workers: Optional[int] = None) -> float:
+    return cached_indicator(
+        "permutation-entropy", name, minutes, (),
+        lambda: permutation_entropy_minutes_multiprocessed(load_minute_closes(name, minutes), workers=workers),
+    )
+
+
+def _hurst_in_worker(closes: List[float]) -> float:
+    return hurst_exponent_minutes_rs_multiprocessed(closes, engine=ENGINE_NUMPY)
+
+
+def _permutation_entropy_in_worker(closes: List[float]) -> float:
+    return permutation_entropy_minutes_multiprocessed(closes, engine=ENGINE_NUMPY)
+
+
+async def _off_loop(in_worker: Callable[[List[float]], float], fallback: Callable[[], float], closes: List[float]) -> float:
+    """
+    Keep the indicator math off the event loop. The numpy kernel runs whole in one pool worker;
+    the multiprocessing engine already fans out to the pool, so only its waiting moves to a thread.
+    """
+    if DEFAULT_ENGINE == ENGINE_NUMPY:
+        return await run_in_pool(in_worker, closes)
+
+    return await asyncio.to_thread(fallback)
+
+
+async def instrument_hurst_async(name: str, minutes: int, workers: Optional[int] = None) -> float:
+    async def compute() -> float:
+        closes = await load_minute_closes_async(name, minutes)
+        return await _off_loop(
+            _hurst_in_worker,
+            lambda: hurst_exponent_minutes_rs_multiprocessed(closes, num_workers=workers),
+            closes,
+        )
+
+    return await cached_indicator_async("hurst", name, minutes, (), compute)
+
+
+async def instrument_permutation_entropy_async(name: str, minutes: int, workers: Optional[int] = None) -> float:
+    async def compute() -> float:
+        closes = await load_minute_closes_async(name, minutes)
+        return await _off_loop(
+            _permutation_entropy_in_worker,
+            lambda: permutation_entropy_minutes_multiprocessed(closes, workers=workers),
+            closes,
+        )
+
+    return await cached_indicator_async("permutation-entropy", name, minutes, (), compute)
+
+
+def _bounded_int(spec: IndicatorSpec, key: str, default: int, low: int, high: int) -> int:
+    value = spec.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{key} must be an integer")
+    if not low <= value <= high:
+        raise ValueError(f"{key} must be between {low} and {high}")
+
+    return value
+
+
+def _hurst_params(spec: IndicatorSpec) -> Dict[str, Any]:
+    max_window = None
+    if spec.get("max_window") is not None:
+        max_window = _bounded_int(spec, "max_window", 0, 3, HURST_MAX_WINDOW)
+
+    return {
+        "min_points": _bounded_int(spec, "min_points", 500, 1, HURST_MAX_MIN_POINTS),
+        "min_window": _bounded_int(spec, "min_window", 10, 2, HURST_MAX_WINDOW),
+        "max_window": max_window,
+        "num_windows": _bounded_int(spec, "num_windows", 20, 5, HURST_MAX_NUM_WINDOWS),
+    }
+
+
+def _pe_params(spec: IndicatorSpec) -> Dict[str, int]:
+    return {
+        "m": _bounded_int(spec, "m", 3, PE_MIN_M, PE_MAX_M),
+        "tau": _bounded_int(spec, "tau", 1, 1, PE_MAX_TAU),
+    }
+
+
+def _pe_scales(spec: IndicatorSpec) -> List[int]:
+    scales = spec.get("scales", [1, 2, 3, 4, 5])
+    if not isinstance(scales, list) or not scales:
+        raise ValueError("scales must be a non-empty list of integers")
+    if len(scales) > MAX_PE_SCALES:
+        raise ValueError(f"At most {MAX_PE_SCALES} scales")
+
+    for scale in scales:
+        if isinstance(scale, bool) or not isinstance(scale, int) or not 1 <= scale <= PE_MAX_SCALE:
+            raise ValueError(f"scales must be integers between 1 and {PE_MAX_SCALE}")
+
+    return scales
+
+
+def _hurst(closes: List[float], spec: IndicatorSpec, workers: Optional[int]) -> float:
+    return hurst_exponent_minutes_rs_multiprocessed(closes, **_hurst_params(spec), num_workers=workers)
+
+
+def _permutation_entropy(closes: List[float], spec: IndicatorSpec, workers: Optional[int]) -> float:
+    return permutation_entropy_minutes_multiprocessed(closes, **_pe_params(spec), workers=workers)
+
+
+def _multiscale_permutation_entropy(closes: List[float], spec: IndicatorSpec, workers: Optional[int]) -> List[float]:
+    return multiscale_permutation_entropy(closes, _pe_scales(spec), **_pe_params(spec), workers=workers)
+
+
+def _validate_multiscale_permutation_entropy(spec: IndicatorSpec) -> None:
+    _pe_scales(spec)
+    _pe_params(spec)
+
+
+INDICATORS: Dict[str, Callable[[List[float], IndicatorSpec, Optional[int]], Any]] = {
+    "hurst": _hurst,
+    "permutation-entropy": _permutation_entropy,
+    "multiscale-permutation-entropy": _multiscale_permutation_entropy,
+}
+
+# Checks of the parameters that bound an indicator's cost, all run before anything is computed
+SPEC_VALIDATORS: Dict[str, Callable[[IndicatorSpec], Any]] = {
+    "hurst": _hurst_params,
+    "permutation-entropy": _pe_params,
+    "multiscale-permutation-entropy": _validate_multiscale_permutation_entropy,
+}
+
+
+def _spec_error(spec: Any) -> Optional[str]:
+    if not isinstance(spec, dict):
+        return "indicator spec must be an object"
+    if spec.get("type") not in INDICATORS:
+        return f"Unknown indicator type: {spec.get('type')}"
+
+    validate = SPEC_VALIDATORS.get(spec["type"])
+    if validate is not None:
+        try:
+            validate(spec)
+        except ValueError as e:
+            return str(e)
+
+    return None
+
+
+def evaluate_indicator_specs(
+    minute_closes: List[float],
+    specs: List[IndicatorSpec],
+    workers: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Evaluate every spec against the same minute close series.
+    A failing spec gets an "error" entry instead of failing the whole batch.
+    """
+    if not isinstance(specs, list) or not specs:
+        raise ValueError("indicators must be a non-empty list")
+    if len(specs) > MAX_INDICATOR_SPECS:
+        raise ValueError(f"At most {MAX_INDICATOR_SPECS} indicators per request")
+
+    errors = [_spec_error(spec) for spec in specs]
+    results: List[Dict[str, Any]] = []
+
+    for spec, error in zip(specs, errors):
+        if error is not None:
+            results.append({"spec": spec, "error": error})
+            continue
+
+        try:
+            results.append({"spec": spec, "value": INDICATORS[spec["type"]](minute_closes, spec, workers)})
+        except (TypeError, ValueError, OverflowError) as e:
+            results.append({"spec": spec, "error": str(e)})
+
+    return results
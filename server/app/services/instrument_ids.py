@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from threading import Lock
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import select
+
+from app.db.async_db import AsyncSessionLocal
+from app.db.db import SessionLocal
+from app.models.instrument import Instrument, InstrumentNameEnum
+
+
+# Instrument rows are only ever added by the seed, so a found id never changes
+_instrument_ids: Dict[InstrumentNameEnum, int] = {}
+_instrument_ids_lock = Lock()
+
+
+def _instrument_ids_query(names: Iterable[InstrumentNameEnum]):
+    return select(Instrument.name, Instrument.id).where(Instrument.name.in_(list(names)))
+
+
+def _store_instrument_ids(rows) -> None:
+    with _instrument_ids_lock:
+        _instrument_ids.update({name: instrument_id for name, instrument_id in rows})
+
+
+def load_instrument_ids(names: Iterable[InstrumentNameEnum] = InstrumentNameEnum) -> None:
+    with SessionLocal() as db:
+        rows = db.execute(_instrument_ids_query(names)).all()
+
+    _store_instrument_ids(rows)
+
+
+def get_instrument_id(name: InstrumentNameEnum) -> Optional[int]:
+    """
+    Id of a seeded instrument, or None. Misses are not cached, so an instrument seeded later is picked up.
+    """
+    with _instrument_ids_lock:
+        instrument_id = _instrument_ids.get(name)
+
+    if instrument_id is None:
+        load_instrument_ids([name])
+        with _instrument_ids_lock:
+            instrument_id = _instrument_ids.get(name)
+
+    return instrument_id
+
+
+async def get_instrument_id_async(name: InstrumentNameEnum) -> Optional[int]:
+    with _instrument_ids_lock:
+        instrument_id = _instrument_ids.get(name)
+
+    if instrument_id is None:
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(_instrument_ids_query([name]))).all()
+
+        _store_instrument_ids(rows)
+        with _instrument_ids_lock:
+            instrument_id = _instrument_ids.get(name)
+
+    return instrument_id
@@ -1,19 +1,33 @@
+from array import array
+import asyncio
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
+import math
 import time
-from typing import List
+from typing import AsyncIterator, Final, Iterator, List, Optional, Tuple
+from sqlalchemy import Float, Integer, cast, func, select, type_coerce
+from sqlalchemy.sql import Select
+from app.db.async_db import AsyncSessionLocal
 from app.db.db import SessionLocal
-from app.models.instrument import Instrument, InstrumentNameEnum
-from app.models.instrument_price import InstrumentPrice
+from app.models.instrument import InstrumentNameEnum
+from app.models.instrument_price import PRICE_TICK_SCALE, InstrumentPrice
+from app.services.instrument_ids import get_instrument_id, get_instrument_id_async
+from app.services.price_store import get_price_buffer
+
+# Rows fetched per round trip from the server side cursor
+HISTORY_FETCH_BATCH: Final[int] = 10_000
+
+PriceColumns = Tuple[array, array]
+
 
 @dataclass
 class ReturnType:
     price: float
     timestamp: int
-    
+
     def __iter__(self):
         return iter((self.price, self.timestamp))
-    
+
     def to_dict(self):
         return {
             "price": self.price,
@@ -21,11 +35,68 @@ class ReturnType:
         }
 
 
-def load_instrument_price_history(name: str, minutes: int) -> List[ReturnType]:
-    
-    # uncomment to show multithreading - selector
-    # time.sleep(minutes)
-    
+def price_columns_query(
+    instrument_id: int,
+    start: float,
+    end: Optional[float] = None,
+    newest_first: bool = False,
+) -> Select:
+    stmt = (
+        select(
+            cast(func.extract("epoch", InstrumentPrice.created_at), Float),
+            type_coerce(InstrumentPrice.price, Integer),
+        )
+        .where(
+            InstrumentPrice.instrument_id == instrument_id,
+            InstrumentPrice.created_at >= datetime.fromtimestamp(start, timezone.utc),
+        )
+        .order_by(InstrumentPrice.created_at.desc() if newest_first else InstrumentPrice.created_at)
+    )
+    if end is not None:
+        stmt = stmt.where(InstrumentPrice.created_at <= datetime.fromtimestamp(end, timezone.utc))
+
+    return stmt.execution_options(yield_per=HISTORY_FETCH_BATCH)
+
+
+def _extend_price_columns(columns: PriceColumns, rows) -> None:
+    timestamps, prices = columns
+    timestamps.extend(timestamp for timestamp, _ in rows)
+    prices.extend(ticks / PRICE_TICK_SCALE for _, ticks in rows)
+
+
+def select_price_columns(instrument_id: int, start: float, end: Optional[float] = None) -> PriceColumns:
+    """
+    Epoch seconds and prices of the stored ticks with start <= created_at (<= end), oldest first.
+    Reads plain (float, int) rows, no ORM objects, datetimes or Decimals are built.
+    """
+    columns = (array("d"), array("d"))
+
+    with SessionLocal() as db:
+        result = db.execute(price_columns_query(instrument_id, start, end))
+
+        for rows in result.partitions():
+            _extend_price_columns(columns, rows)
+
+    return columns
+
+
+async def select_price_columns_async(instrument_id: int, start: float, end: Optional[float] = None) -> PriceColumns:
+    columns = (array("d"), array("d"))
+
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(price_columns_query(instrument_id, start, end))
+
+        async for rows in result.partitions():
+            _extend_price_columns(columns, rows)
+
+    return columns
+
+
+def _split_lookback(name: str, minutes: int) -> Tuple[InstrumentNameEnum, float, float, List[float], List[float]]:
+    """
+    Start of the lookback and the part of it the in-memory buffer covers.
+    The buffer holds every tick after `complete_after`, math.inf when it holds none.
+    """
     if minutes <= 0:
         raise ValueError(f"minutes must be positive")
 
@@ -34,29 +105,193 @@ def load_instrument_price_history(name: str, minutes: int) -> List[ReturnType]:
     except ValueError:
         raise ValueError(f"Unknown instrument: {name}")
 
+    lookback = (datetime.now(timezone.utc) - timedelta(minutes=minutes)).timestamp()
+    complete_after, recent_timestamps, recent_prices = get_price_buffer(instrument_name).since(lookback)
+
+    return instrument_name, lookback, complete_after, recent_timestamps, recent_prices
+
+
+def load_instrument_price_columns(name: str, minutes: int) -> PriceColumns:
+    """
+    Epoch seconds and prices of the lookback, oldest first.
+    """
+    instrument_name, lookback, complete_after, recent_timestamps, recent_prices = _split_lookback(name, minutes)
+
+    # Serve from memory what the buffer covers, only older ticks come from the DB
+    if complete_after != math.inf and lookback > complete_after:
+        return array("d", recent_timestamps), array("d", recent_prices)
+
+    instrument_id = get_instrument_id(instrument_name)
+    if instrument_id is None:
+        raise ValueError(f"Instrument {name} not found in DB")
+
+    if complete_after == math.inf:
+        return select_price_columns(instrument_id, lookback)
+
+    # The DB part is strictly older than the memory part
+    timestamps, prices = select_price_columns(instrument_id, lookback, complete_after)
+    timestamps.extend(recent_timestamps)
+    prices.extend(recent_prices)
+
+    return timestamps, prices
+
+
+async def load_instrument_price_columns_async(name: str, minutes: int) -> PriceColumns:
+    instrument_name, lookback, complete_after, recent_timestamps, recent_prices = _split_lookback(name, minutes)
+
+    if complete_after != math.inf and lookback > complete_after:
+        return array("d", recent_timestamps), array("d", recent_prices)
+
+    instrument_id = await get_instrument_id_async(instrument_name)
+    if instrument_id is None:
+        raise ValueError(f"Instrument {name} not found in DB")
+
+    if complete_after == math.inf:
+        return await select_price_columns_async(instrument_id, lookback)
+
+    timestamps, prices = await select_price_columns_async(instrument_id, lookback, complete_after)
+    timestamps.extend(recent_timestamps)
+    prices.extend(recent_prices)
+
+    return timestamps, prices
+
+
+def iter_instrument_price_batches(name: str, minutes: int) -> Iterator[PriceColumns]:
+    """
+    The lookback newest first, in batches of at most HISTORY_FETCH_BATCH ticks:
+    the in-memory part, then the older ticks as they come off a server side cursor.
+    The arguments are checked right away, the ticks are only read while iterating.
+    """
+    instrument_name, lookback, complete_after, recent_timestamps, recent_prices = _split_lookback(name, minutes)
+
+    instrument_id = None
+    if complete_after == math.inf or lookback <= complete_after:
+        instrument_id = get_instrument_id(instrument_name)
+        if instrument_id is None:
+            raise ValueError(f"Instrument {name} not found in DB")
+
+    return _price_batches(instrument_id, lookback, complete_after, recent_timestamps, recent_prices)
+
+
+def _recent_price_batches(recent_timestamps: List[float], recent_prices: List[float]) -> Iterator[PriceColumns]:
+    for end in range(len(recent_timestamps), 0, -HISTORY_FETCH_BATCH):
+        begin = max(0, end - HISTORY_FETCH_BATCH)
+        yield array("d", reversed(recent_timestamps[begin:end])), array("d", reversed(recent_prices[begin:end]))
+
+
+def _price_batches(
+    instrument_id: Optional[int],
+    lookback: float,
+    complete_after: float,
+    recent_timestamps: List[float],
+    recent_prices: List[float],
+) -> Iterator[PriceColumns]:
+    yield from _recent_price_batches(recent_timestamps, recent_prices)
+
+    if instrument_id is None:
+        return
+
+    end = None if complete_after == math.inf else complete_after
     with SessionLocal() as db:
-        instrument = (
-            db.query(Instrument)
-            .filter(Instrument.name == instrument_name)
-            .first()
-        )
+        result = db.execute(price_columns_query(instrument_id, lookback, end, newest_first=True))
+
+        for rows in result.partitions():
+            columns = (array("d"), array("d"))
+            _extend_price_columns(columns, rows)
+            yield columns
+
+
+async def open_instrument_price_batches_async(name: str, minutes: int) -> AsyncIterator[PriceColumns]:
+    instrument_name, lookback, complete_after, recent_timestamps, recent_prices = _split_lookback(name, minutes)
 
-        if instrument is None:
+    instrument_id = None
+    if complete_after == math.inf or lookback <= complete_after:
+        instrument_id = await get_instrument_id_async(instrument_name)
+        if instrument_id is None:
             raise ValueError(f"Instrument {name} not found in DB")
 
-        lookback_time = datetime.now(timezone.utc) - timedelta(minutes=minutes)
+    return _price_batches_async(instrument_id, lookback, complete_after, recent_timestamps, recent_prices)
 
-        prices = (
-            db.query(InstrumentPrice)
-            .filter(
-                InstrumentPrice.instrument_id == instrument.id,
-                InstrumentPrice.created_at >= lookback_time
-            )
-            .order_by(InstrumentPrice.created_at.desc())
-            .all()
-        )
+
+async def _price_batches_async(
+    instrument_id: Optional[int],
+    lookback: float,
+    complete_after: float,
+    recent_timestamps: List[float],
+    recent_prices: List[float],
+) -> AsyncIterator[PriceColumns]:
+    for columns in _recent_price_batches(recent_timestamps, recent_prices):
+        yield columns
+
+    if instrument_id is None:
+        return
+
+    end = None if complete_after == math.inf else complete_after
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(price_columns_query(instrument_id, lookback, end, newest_first=True))
+
+        async for rows in result.partitions():
+            columns = (array("d"), array("d"))
+            _extend_price_columns(columns, rows)
+            yield columns
+
+
+def _price_batch_json(columns: PriceColumns, first: bool) -> bytes:
+    # Same text json.dumps gives for ReturnType.to_dict(), floats use repr() there too
+    timestamps, prices = columns
+    items = ", ".join(
+        f'{{"price": {price!r}, "timestamp": {int(timestamp)}}}'
+        for timestamp, price in zip(timestamps, prices)
+    )
+
+    return (items if first else ", " + items).encode("utf-8")
+
+
+def iter_price_history_json(batches: Iterator[PriceColumns]) -> Iterator[bytes]:
+    """
+    The JSON price history document, one piece per batch.
+    """
+    yield b"["
+
+    first = True
+    for columns in batches:
+        if len(columns[0]):
+            yield _price_batch_json(columns, first)
+            first = False
+
+    yield b"]"
+
+
+async def iter_price_history_json_async(batches: AsyncIterator[PriceColumns]) -> AsyncIterator[bytes]:
+    """
+    Like iter_price_history_json, the batches are formatted in a thread to keep the loop free.
+    """
+    yield b"["
+
+    first = True
+    async for columns in batches:
+        if len(columns[0]):
+            yield await asyncio.to_thread(_price_batch_json, columns, first)
+            first = False
+
+    yield b"]"
+
+
+def price_history_from_columns(columns: PriceColumns) -> List[ReturnType]:
+    """
+    Newest first, as the JSON response lists them.
+    """
+    timestamps, prices = columns
 
     return [
-        ReturnType(float(p.price), int(p.created_at.timestamp()))
-        for p in prices
-    ]
\ No newline at end of file
+        ReturnType(price, int(timestamp))
+        for timestamp, price in zip(reversed(timestamps), reversed(prices))
+    ]
+
+
+def load_instrument_price_history(name: str, minutes: int) -> List[ReturnType]:
+
+    # uncomment to show multithreading - selector
+    # time.sleep(minutes)
+
+    return price_history_from_columns(load_instrument_price_columns(name, minutes))
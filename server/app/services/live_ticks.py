@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import bisect
+import itertools
+import math
+import os
+import time
+import uuid
+from collections import deque
+from threading import Lock
+from typing import Any, Deque, Dict, Final, Iterator, List, Optional, Tuple
+
+from app.models.instrument import InstrumentNameEnum
+from app.models.instrument_price import PRICE_TICK_SCALE
+from app.services.price_store import get_price_buffer
+from app.utils.price_columns import encode_price_columns
+
+
+# Ticks per instrument a reconnecting subscriber can be resumed from
+TICK_LOG_SIZE: Final[int] = int(os.getenv("TICK_LOG_SIZE", 10_000))
+
+# Sequence numbers restart with the generating process, the stream id tells the runs apart
+TICK_STREAM_ID: Final[str] = uuid.uuid4().hex[:12]
+
+_sequences: Dict[InstrumentNameEnum, Iterator[int]] = {name: itertools.count(1) for name in InstrumentNameEnum}
+
+
+def next_sequence(name: InstrumentNameEnum) -> int:
+    """
+    Sequence number of the next published tick of the instrument. Only the generating process calls it.
+    """
+    return next(_sequences[name])
+
+
+class TickLog:
+    """
+    The latest sequence numbered ticks of one instrument, (seq, epoch seconds, price) oldest first.
+    Only an unbroken run is kept: a new stream or a skipped number starts the log over.
+    """
+
+    def __init__(self, capacity: int = TICK_LOG_SIZE):
+        self.stream: Optional[str] = None
+        self._entries: Deque[Tuple[int, float, float]] = deque(maxlen=max(1, capacity))
+        self._lock = Lock()
+
+    def append(self, stream: str, seq: int, timestamp: float, price: float) -> None:
+        with self._lock:
+            if stream != self.stream or (self._entries and seq != self._entries[-1][0] + 1):
+                self._entries.clear()
+                self.stream = stream
+
+            self._entries.append((seq, timestamp, price))
+
+    def last(self) -> Optional[Tuple[str, int, float]]:
+        """
+        (stream, seq, epoch seconds) of the newest tick, None before the first one.
+        """
+        with self._lock:
+            if not self._entries:
+                return None
+
+            seq, timestamp, _ = self._entries[-1]
+            return self.stream, seq, timestamp
+
+    def since(self, stream: str, seq: int) -> Optional[List[Tuple[int, float, float]]]:
+        """
+        Ticks after `seq`, or None when they are not all here anymore (or never were).
+        """
+        with self._lock:
+            if stream != self.stream or not self._entries:
+                return None
+
+            first_seq = self._entries[0][0]
+            last_seq = self._entries[-1][0]
+            if seq < first_seq - 1 or seq > last_seq:
+                return None
+
+            return list(itertools.islice(self._entries, seq - first_seq + 1, None))
+
+
+_logs: Dict[InstrumentNameEnum, TickLog] = {name: TickLog() for name in InstrumentNameEnum}
+
+
+def get_tick_log(name: InstrumentNameEnum) -> TickLog:
+    return _logs[name]
+
+
+def tick_delta(seq: int, timestamp: float, price: float) -> Dict[str, Any]:
+    """
+    A live tick as subscribers get it, in "deltas" and (with the instrument) as the "price" event.
+    """
+    return {"price": price, "timestamp": int(timestamp), "seq": seq}
+
+
+def subscription_snapshot(name: InstrumentNameEnum, minutes: int) -> Dict[str, Any]:
+    """
+    The lookback from the in-memory history, as the columnar price payload, up to and including tick `seq`.
+    Deltas with a higher seq follow; "complete" is false when memory does not reach back to the lookback.
+    """
+    if minutes <= 0:
+        raise ValueError("minutes must be positive")
+
+    # Read the log first: the price store gets a tick before the log does, so cutting
+    # the history at the logged tick leaves nothing in the snapshot that is not covered by seq
+    last = get_tick_log(name).last()
+
+    lookback = time.time() - minutes * 60
+    complete_after, timestamps, prices = get_price_buffer(name).since(lookback)
+
+    stream, seq = None, None
+    if last is not None:
+        stream, seq, last_timestamp = last
+        end = bisect.bisect_right(timestamps, last_timestamp)
+        timestamps, prices = timestamps[:end], prices[:end]
+
+    return {
+        "instrument": name.value,
+        "stream": stream,
+        "seq": seq,
+        "complete": complete_after != math.inf and lookback > complete_after,
+        "columns": encode_price_columns(timestamps, prices, PRICE_TICK_SCALE),
+    }
+
+
+def subscription_resume(name: InstrumentNameEnum, stream: str, seq: int) -> Optional[Dict[str, Any]]:
+    """
+    The ticks a subscriber missed after `seq`, or None when it needs a snapshot instead.
+    """
+    missed = get_tick_log(name).since(stream, seq)
+    if missed is None:
+        return None
+
+    return {
+        "instrument": name.value,
+        "stream": stream,
+        "ticks": [tick_delta(*tick) for tick in missed],
+    }
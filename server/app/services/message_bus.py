@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import json
+from abc import ABC, abstractmethod
+import os
+import selectors
+import socket
+import struct
+import time
+import traceback
+from collections import defaultdict
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, Final, List, Optional
+from urllib.parse import urlsplit
+
+try:
+    import redis
+except ImportError:  # only needed for redis:// buses
+    redis = None
+
+
+# local:// (one process), unix:///path/to/hub.sock or redis://host:port/db
+MESSAGE_BUS_URL: Final[str] = os.getenv("MESSAGE_BUS_URL", "local://")
+# A subscriber further behind than this is disconnected by the hub and reconnects
+MESSAGE_HUB_MAX_BUFFER: Final[int] = int(os.getenv("MESSAGE_HUB_MAX_BUFFER", 8 * 1024 * 1024))
+
+RECONNECT_MIN_SLEEP: Final[float] = 0.1
+RECONNECT_MAX_SLEEP: Final[float] = 5.0
+
+FRAME_HEADER = struct.Struct("!I")
+
+MessageHandler = Callable[[Dict[str, Any]], None]
+
+
+def encode_frame(channel: str, message: Dict[str, Any]) -> bytes:
+    payload = json.dumps({"channel": channel, "message": message}, separators=(",", ":")).encode("utf-8")
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+class MessageBus(ABC):
+    """
+    Publish/subscribe between the server processes. Every subscriber of a channel,
+    in any process and including the publisher, gets each message once.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, List[MessageHandler]] = defaultdict(list)
+
+    def subscribe(self, channel: str, handler: MessageHandler) -> None:
+        self._handlers[channel].append(handler)
+
+    @abstractmethod
+    def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+    def _dispatch(self, channel: str, message: Dict[str, Any]) -> None:
+        for handler in self._handlers.get(channel, []):
+            try:
+                handler(message)
+            except Exception:
+                traceback.print_exc()
+
+
+class LocalMessageBus(MessageBus):
+    """
+    Single process: handlers run right away in the publishing thread.
+    """
+
+    def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        self._dispatch(channel, message)
+
+
+class UnixSocketMessageBus(MessageBus):
+    """
+    Client of the fan-out hub started by run_message_hub. Messages are length prefixed JSON frames;
+    a reader thread dispatches them and reconnects when the hub goes away. The thread starts
+    on first use, so the bus can be created before the process forks its worker pool.
+    Messages published while disconnected are lost, live ticks are not worth replaying.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+
+        self._sock: Optional[socket.socket] = None
+        self._send_lock = Lock()
+        self._stopping = Event()
+        self._thread: Optional[Thread] = None
+
+    def subscribe(self, channel: str, handler: MessageHandler) -> None:
+        super().subscribe(channel, handler)
+        self._start()
+
+    def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        self._start()
+        frame = encode_frame(channel, message)
+
+        with self._send_lock:
+            if self._sock is None:
+                return
+            try:
+                self._sock.sendall(frame)
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        self._stopping.set()
+        with self._send_lock:
+            if self._sock is not None:
+                self._sock.close()
+
+    def _start(self) -> None:
+        with self._send_lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        sleep_time = RECONNECT_MIN_SLEEP
+
+        while not self._stopping.is_set():
+            try:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.connect(self.path)
+            except OSError:
+                time.sleep(sleep_time)
+                sleep_time = min(RECONNECT_MAX_SLEEP, sleep_time * 2)
+                continue
+
+            sleep_time = RECONNECT_MIN_SLEEP
+            with self._send_lock:
+                self._sock = sock
+
+            try:
+                self._read_frames(sock)
+            except OSError:
+                pass
+            finally:
+                with self._send_lock:
+                    self._sock = None
+                sock.close()
+
+    def _read_frames(self, sock: socket.socket) -> None:
+        buffer = bytearray()
+
+        while True:
+            data = sock.recv(64 * 1024)
+            if not data:
+                return
+            buffer += data
+
+            while len(buffer) >= FRAME_HEADER.size:
+                (length,) = FRAME_HEADER.unpack_from(buffer)
+                end = FRAME_HEADER.size + length
+                if len(buffer) < end:
+                    break
+
+                frame = json.loads(bytes(buffer[FRAME_HEADER.size:end]))
+                del buffer[:end]
+                self._dispatch(frame["channel"], frame["message"])
+
+
+class RedisMessageBus(MessageBus):
+    """
+    Redis (or compatible) pub/sub, for processes on more than one box.
+    """
+
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError("redis:// message bus requested, but the redis package is not installed")
+
+        super().__init__()
+        self._client = redis.Redis.from_url(url)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._thread: Optional[Thread] = None
+
+    def subscribe(self, channel: str, handler: MessageHandler) -> None:
+        super().subscribe(channel, handler)
+        self._pubsub.subscribe(channel)
+
+        if self._thread is None:
+            self._thread = Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        self._client.publish(channel, json.dumps(message, separators=(",", ":")))
+
+    def close(self) -> None:
+        self._pubsub.close()
+
+    def _run(self) -> None:
+        for item in self._pubsub.listen():
+            channel = item["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode("utf-8")
+            self._dispatch(channel, json.loads(item["data"]))
+
+
+def create_message_bus(url: str = MESSAGE_BUS_URL) -> MessageBus:
+    parts = urlsplit(url)
+
+    if parts.scheme == "local":
+        return LocalMessageBus()
+    if parts.scheme == "unix":
+        return UnixSocketMessageBus(parts.path)
+    if parts.scheme in ("redis", "rediss"):
+        return RedisMessageBus(url)
+
+    raise ValueError(f"Unknown message bus: {url}")
+
+
+def run_message_hub(path: str, ready: Optional[Event] = None) -> None:
+    """
+    Fan-out hub of the unix:// bus: every frame received from a client is sent to all clients.
+    Runs a selector loop in the calling thread.
+    """
+    if os.path.exists(path):
+        os.unlink(path)
+
+    server_sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server_sock.bind(path)
+    server_sock.listen()
+    server_sock.setblocking(False)
+
+    hub_selector = selectors.DefaultSelector()
+    hub_selector.register(server_sock, selectors.EVENT_READ)
+    inbufs: Dict[socket.socket, bytearray] = {}
+    outbufs: Dict[socket.socket, bytearray] = {}
+
+    def drop(sock: socket.socket) -> None:
+        hub_selector.unregister(sock)
+        inbufs.pop(sock, None)
+        outbufs.pop(sock, None)
+        sock.close()
+
+    def watch(sock: socket.socket) -> None:
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if outbufs[sock] else 0)
+        hub_selector.modify(sock, events)
+
+    if ready is not None:
+        ready.set()
+
+    while True:
+        for key, mask in hub_selector.select():
+            sock = key.fileobj
+
+            if sock is server_sock:
+                client_sock, _ = server_sock.accept()
+                client_sock.setblocking(False)
+                inbufs[client_sock] = bytearray()
+                outbufs[client_sock] = bytearray()
+                hub_selector.register(client_sock, selectors.EVENT_READ)
+                continue
+
+            if sock not in inbufs:
+                continue
+
+            if mask & selectors.EVENT_READ:
+                try:
+                    data = sock.recv(64 * 1024)
+                except (BlockingIOError, InterruptedError):
+                    data = None
+                except OSError:
+                    data = b""
+
+                if data == b"":
+                    drop(sock)
+                    continue
+
+                if data:
+                    buffer = inbufs[sock]
+                    buffer += data
+
+                    # Forward whole frames only, so a slow client never gets half of one
+                    complete = 0
+                    while len(buffer) - complete >= FRAME_HEADER.size:
+                        (length,) = FRAME_HEADER.unpack_from(buffer, complete)
+                        if len(buffer) - complete < FRAME_HEADER.size + length:
+                            break
+                        complete += FRAME_HEADER.size + length
+
+                    if complete:
+                        frames = bytes(buffer[:complete])
+                        del buffer[:complete]
+
+                        for other in list(outbufs):
+                            outbufs[other] += frames
+                            if len(outbufs[other]) > MESSAGE_HUB_MAX_BUFFER:
+                                print("[!] Message hub subscriber is too far behind, disconnecting it")
+                                drop(other)
+                            else:
+                                watch(other)
+
+            if mask & selectors.EVENT_WRITE and sock in outbufs:
+                try:
+                    sent = sock.send(outbufs[sock])
+                except (BlockingIOError, InterruptedError):
+                    continue
+                except OSError:
+                    drop(sock)
+                    continue
+
+                del outbufs[sock][:sent]
+                watch(sock)
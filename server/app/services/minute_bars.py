@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+import time
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.db.async_db import AsyncSessionLocal
+from app.db.db import SessionLocal
+from app.models.instrument import InstrumentNameEnum
+from app.models.instrument_minute_bar import InstrumentMinuteBar
+from app.services.bar_rollups import resume_bar_rollups, update_bar_rollups
+from app.services.instrument_ids import get_instrument_id, get_instrument_id_async
+from app.services.price_store import get_price_buffer
+from app.utils.tick_time_converter import MinuteBar, minute_bar_columns_from_ticks
+
+
+class MinuteBarBuilder:
+    """
+    Builds OHLC minute bars from a live tick stream (epoch seconds, price).
+    A bar is closed by the first tick of a later minute.
+    """
+
+    def __init__(self):
+        self.cur_minute: Optional[int] = None
+        self.o = self.h = self.l = self.c = 0.0
+        self.tick_count = 0
+
+    def add_tick(self, timestamp: float, price: float) -> Optional[MinuteBar]:
+        minute = int(timestamp // 60) * 60
+
+        if self.cur_minute is not None and minute < self.cur_minute:
+            return None
+
+        if minute == self.cur_minute:
+            if price > self.h:
+                self.h = price
+            if price < self.l:
+                self.l = price
+            self.c = price
+            self.tick_count += 1
+            return None
+
+        closed = self.current_bar()
+
+        self.cur_minute = minute
+        self.o = self.h = self.l = self.c = price
+        self.tick_count = 1
+
+        return closed
+
+    def restore(self, minute: int, o: float, h: float, l: float, c: float, tick_count: int) -> None:
+        """
+        Continue the given bar, as if its ticks had been added.
+        """
+        self.cur_minute = minute
+        self.o, self.h, self.l, self.c = o, h, l, c
+        self.tick_count = tick_count
+
+    def current_bar(self) -> Optional[MinuteBar]:
+        if self.cur_minute is None:
+            return None
+
+        return MinuteBar(
+            datetime.fromtimestamp(self.cur_minute, timezone.utc),
+            self.o, self.h, self.l, self.c, self.tick_count,
+        )
+
+
+_builders: Dict[InstrumentNameEnum, MinuteBarBuilder] = {name: MinuteBarBuilder() for name in InstrumentNameEnum}
+_builders_lock = Lock()
+
+# Start (epoch seconds) of the newest bar that is committed, per instrument
+_last_closed_minutes: Dict[InstrumentNameEnum, Optional[int]] = {name: None for name in InstrumentNameEnum}
+
+
+def persist_minute_bars(db: Session, instrument_id: int, bars: Iterable[MinuteBar]) -> None:
+    rows = [
+        {
+            "instrument_id": instrument_id,
+            "minute": bar.minute,
+            "open": bar.open,
+            "high": bar.high,
+            "low": bar.low,
+            "close": bar.close,
+            "tick_count": bar.tick_count,
+        }
+        for bar in bars
+    ]
+    if not rows:
+        return
+
+    stmt = insert(InstrumentMinuteBar).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_instrument_minute_bars_instrument_id_minute",
+        set_={
+            "open": stmt.excluded.open,
+            "high": stmt.excluded.high,
+            "low": stmt.excluded.low,
+            "close": stmt.excluded.close,
+            "tick_count": stmt.excluded.tick_count,
+            "updated_at": func.now(),
+        },
+    )
+    db.execute(stmt)
+
+
+def update_minute_bars(db: Session, instrument_id: int, name: InstrumentNameEnum, timestamp: float, price: float) -> Optional[MinuteBar]:
+    """
+    Feed a committed tick to the instrument's builder and store the bar it closes, if any.
+    """
+    with _builders_lock:
+        closed = _builders[name].add_tick(timestamp, price)
+
+    if closed is not None:
+        persist_minute_bars(db, instrument_id, [closed])
+        db.commit()
+        _set_last_closed_minute(name, int(closed.minute.timestamp()))
+
+    return closed
+
+
+def resume_minute_bars(db: Session, instrument_id: int, name: InstrumentNameEnum) -> None:
+    """
+    Replay the ticks after the last stored bar (as far as the price store reaches),
+    so the minute that was open when the server stopped is not lost.
+    The replayed bars are rolled up like live ones, including the buckets that were open at the stop.
+    """
+    last_minute = db.scalar(
+        select(func.max(InstrumentMinuteBar.minute))
+        .where(InstrumentMinuteBar.instrument_id == instrument_id)
+    )
+
+    if last_minute is None:
+        start = time.time() // 60 * 60
+    else:
+        start = last_minute.timestamp() + 60
+        resume_bar_rollups(name, int(last_minute.timestamp()))
+
+    _, timestamps, prices = get_price_buffer(name).since(start)
+
+    # The buffer is in time order, so the bars come out of it column-wise; the last one is still open
+    bars = minute_bar_columns_from_ticks(timestamps, prices, fill_missing_minutes=False)
+    closed = bars.bars(stop=-1)
+
+    builder = MinuteBarBuilder()
+    if len(bars):
+        builder.restore(
+            bars.minutes[-1], bars.open[-1], bars.high[-1], bars.low[-1], bars.close[-1], bars.tick_count[-1],
+        )
+
+    with _builders_lock:
+        _builders[name] = builder
+
+    persist_minute_bars(db, instrument_id, closed)
+    db.commit()
+
+    for bar in closed:
+        update_bar_rollups(db, instrument_id, name, bar)
+
+    if closed:
+        _set_last_closed_minute(name, int(closed[-1].minute.timestamp()))
+    elif last_minute is not None:
+        _set_last_closed_minute(name, int(last_minute.timestamp()))
+
+
+def _set_last_closed_minute(name: InstrumentNameEnum, minute: int) -> None:
+    with _builders_lock:
+        previous = _last_closed_minutes[name]
+        if previous is None or minute > previous:
+            _last_closed_minutes[name] = minute
+
+
+def observe_closed_minute(name: InstrumentNameEnum, minute: int) -> None:
+    """
+    A bar committed by another server process, learned from its tick messages.
+    """
+    _set_last_closed_minute(name, minute)
+
+
+def last_closed_minute(name: InstrumentNameEnum) -> Optional[int]:
+    """
+    Start of the newest committed minute bar known to this process, None before the first one.
+    """
+    with _builders_lock:
+        return _last_closed_minutes[name]
+
+
+def _minute_bars_lookback(name: str, minutes: int) -> Tuple[InstrumentNameEnum, datetime]:
+    if minutes <= 0:
+        raise ValueError(f"minutes must be positive")
+
+    try:
+        instrument_name = InstrumentNameEnum(name)
+    except ValueError:
+        raise ValueError(f"Unknown instrument: {name}")
+
+    return instrument_name, datetime.now(timezone.utc) - timedelta(minutes=minutes)
+
+
+def _minute_bars_query(instrument_id: int, lookback_time: datetime):
+    return (
+        select(
+            InstrumentMinuteBar.minute,
+            InstrumentMinuteBar.open,
+            InstrumentMinuteBar.high,
+            InstrumentMinuteBar.low,
+            InstrumentMinuteBar.close,
+            InstrumentMinuteBar.tick_count,
+        )
+        .where(
+            InstrumentMinuteBar.instrument_id == instrument_id,
+            InstrumentMinuteBar.minute >= lookback_time,
+        )
+        .order_by(InstrumentMinuteBar.minute)
+    )
+
+
+def _rows_to_minute_bars(rows) -> List[MinuteBar]:
+    return [
+        MinuteBar(minute, float(o), float(h), float(l), float(c), tick_count)
+        for minute, o, h, l, c, tick_count in rows
+    ]
+
+
+def load_instrument_minute_bars(name: str, minutes: int) -> List[MinuteBar]:
+    """
+    Closed minute bars of the lookback, oldest first.
+    """
+    instrument_name, lookback_time = _minute_bars_lookback(name, minutes)
+
+    instrument_id = get_instrument_id(instrument_name)
+    if instrument_id is None:
+        raise ValueError(f"Instrument {name} not found in DB")
+
+    with SessionLocal() as db:
+        rows = db.execute(_minute_bars_query(instrument_id, lookback_time)).all()
+
+    return _rows_to_minute_bars(rows)
+
+
+async def load_instrument_minute_bars_async(name: str, minutes: int) -> List[MinuteBar]:
+    instrument_name, lookback_time = _minute_bars_lookback(name, minutes)
+
+    instrument_id = await get_instrument_id_async(instrument_name)
+    if instrument_id is None:
+        raise ValueError(f"Instrument {name} not found in DB")
+
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(_minute_bars_query(instrument_id, lookback_time))).all()
+
+    return _rows_to_minute_bars(rows)
+
+
+def _minute_closes_query(instrument_id: int, lookback_time: datetime):
+    return _minute_bars_query(instrument_id, lookback_time).with_only_columns(InstrumentMinuteBar.close)
+
+
+def load_instrument_minute_closes(name: str, minutes: int) -> List[float]:
+    """
+    Closes of the lookback's minute bars, oldest first, without building the bars.
+    """
+    instrument_name, lookback_time = _minute_bars_lookback(name, minutes)
+
+    instrument_id = get_instrument_id(instrument_name)
+    if instrument_id is None:
+        raise ValueError(f"Instrument {name} not found in DB")
+
+    with SessionLocal() as db:
+        closes = db.scalars(_minute_closes_query(instrument_id, lookback_time)).all()
+
+    return [float(close) for close in closes]
+
+
+async def load_instrument_minute_closes_async(name: str, minutes: int) -> List[float]:
+    instrument_name, lookback_time = _minute_bars_lookback(name, minutes)
+
+    instrument_id = await get_instrument_id_async(instrument_name)
+    if instrument_id is None:
+        raise ValueError(f"Instrument {name} not found in DB")
+
+    async with AsyncSessionLocal() as db:
+        closes = (await db.scalars(_minute_closes_query(instrument_id, lookback_time))).all()
+
+    return [float(close) for close in closes]
@@ -2,9 +2,18 @@ from __future__ import annotations
 
 import math
 import itertools
-from multiprocessing import Pool, cpu_count
+from functools import lru_cache
 from typing import Iterable, List, Tuple, Optional, Dict
 
+from app.services.engines import ENGINE_NUMPY, np, resolve_engine
+from app.services.shared_series import SharedSeriesHandle, read_shared_series, shared_series
+from app.services.worker_pool import clamp_workers, get_worker_pool
+
+
+@lru_cache(maxsize=None)
+def permutation_ids(m: int) -> Dict[Tuple[int, ...], int]:
+    return {p: i for i, p in enumerate(itertools.permutations(range(m)))}
+
 
 def count_patterns_for_slice(args: Tuple[List[float], int, int, int, Dict[Tuple[int, ...], int]]) -> List[int]:
     segment, count_starts, m, tau, perm_to_id = args
@@ -20,6 +29,42 @@ def count_patterns_for_slice(args: Tuple[List[float], int, int, int, Dict[Tuple[
     return counts
 
 
+def count_patterns_for_shared_slice(args: Tuple[SharedSeriesHandle, int, int, int, int, int]) -> List[int]:
+    handle, offset, length, count_starts, m, tau = args
+    segment = read_shared_series(handle, offset, length)
+    return count_patterns_for_slice((segment, count_starts, m, tau, permutation_ids(m)))
+
+
+def ordinal_pattern_ids_numpy(series: "np.ndarray", m: int, tau: int) -> "np.ndarray":
+    """
+    Ordinal pattern index of every start position at once.
+
+    The index is the Lehmer code (factorial number system) of the rank vector:
+    L_k = #{l > k : x_l < x_k} and id = sum(L_k * (m - 1 - k)!).
+    Ties are ranked by position, the same as in count_patterns_for_slice.
+    The ids label the same m! patterns as perm_to_id, only in a different order,
+    which does not change the entropy.
+    """
+    tail = (m - 1) * tau
+    last_start = series.shape[0] - tail
+
+    # columns[k][i] == series[i + k * tau], all views without copying
+    columns = [series[k * tau : k * tau + last_start] for k in range(m)]
+
+    ids = np.zeros(last_start, dtype=np.int64)
+    for k in range(m - 1):
+        weight = math.factorial(m - 1 - k)
+        for l in range(k + 1, m):
+            ids += (columns[l] < columns[k]) * weight
+
+    return ids
+
+
+def count_patterns_numpy(series: "np.ndarray", m: int, tau: int) -> List[int]:
+    ids = ordinal_pattern_ids_numpy(series, m, tau)
+    return np.bincount(ids, minlength=math.factorial(m)).tolist()
+
+
 def compute_entropy(counts: List[int], total: int) -> float:
     probabilities = [count / total for count in counts]
     
@@ -31,6 +76,40 @@ def compute_entropy(counts: List[int], total: int) -> float:
     return H
 
 
+def count_patterns_multiprocessed(
+    minute_series: List[float],
+    m: int,
+    tau: int,
+    last_start: int,
+    workers: Optional[int],
+    chunk_starts: Optional[int],
+) -> List[int]:
+    tail = (m - 1) * tau
+    procs = clamp_workers(workers)
+
+    if chunk_starts is None:
+        chunk_starts = max(1, last_start // (procs * 4))
+
+    with shared_series(minute_series) as handle:
+        tasks: List[Tuple[SharedSeriesHandle, int, int, int, int, int]] = []
+        s = 0
+        while s < last_start:
+            e = min(last_start, s + chunk_starts)
+            count_starts = e - s
+            # the segment is [s, e + tail), workers read it from shared memory
+            tasks.append((handle, s, count_starts + tail, count_starts, m, tau))
+            s = e
+
+        partials = get_worker_pool().map(count_patterns_for_shared_slice, tasks)
+
+    counts = [0] * math.factorial(m)
+    for part in partials:
+        for i, c in enumerate(part):
+            counts[i] += c
+
+    return counts
+
+
 def permutation_entropy_minutes_multiprocessed(
     minute_series: List[float],
     *,
@@ -38,7 +117,9 @@ def permutation_entropy_minutes_multiprocessed(
     tau: int = 1,
     workers: Optional[int] = None,
     chunk_starts: Optional[int] = None,
+    engine: Optional[str] = None,
 ) -> float:
+    engine = resolve_engine(engine)
     n = len(minute_series)
 
     if m < 2:
@@ -52,32 +133,53 @@ def permutation_entropy_minutes_multiprocessed(
         raise ValueError("Series too short for given m and tau")
 
     num_perms = math.factorial(m)
-    perm_to_id = {p: i for i, p in enumerate(itertools.permutations(range(m)))}
-
-    procs = workers or max(1, cpu_count() - 1)
-
-    if chunk_starts is None:
-        chunk_starts = last_start // (procs * 4)
 
-    tasks: List[Tuple[List[float], int, int, int, Dict[Tuple[int, ...], int]]] = []
-    s = 0
-    while s < last_start:
-        e = min(last_start, s + chunk_starts)
-        segment = minute_series[s : e + tail] 
-        count_starts = e - s
-        tasks.append((segment, count_starts, m, tau, perm_to_id))
-        s = e
-
-    with Pool(processes=procs) as pool:
-        partials = pool.map(count_patterns_for_slice, tasks)
-
-    counts = [0] * num_perms
-    for part in partials:
-        for i, c in enumerate(part):
-            counts[i] += c
+    if engine == ENGINE_NUMPY:
+        counts = count_patterns_numpy(np.asarray(minute_series, dtype=np.float64), m, tau)
+    else:
+        counts = count_patterns_multiprocessed(minute_series, m, tau, last_start, workers, chunk_starts)
 
     H = compute_entropy(counts, last_start)
     Hmax = math.log(num_perms)
     Hnorm = (H / Hmax) if Hmax > 0 else 0.0
     
     return Hnorm
+
+
+def coarse_grain(minute_series: List[float], scale: int) -> List[float]:
+    """
+    Averages of consecutive non-overlapping blocks of `scale` points (Costa et al.).
+    """
+    if scale < 1:
+        raise ValueError("scale must be >= 1")
+    if scale == 1:
+        return list(minute_series)
+
+    n = len(minute_series) // scale
+
+    if np is not None:
+        blocks = np.asarray(minute_series[:n * scale], dtype=np.float64).reshape(n, scale)
+        return blocks.mean(axis=1).tolist()
+
+    return [sum(minute_series[i * scale:(i + 1) * scale]) / scale for i in range(n)]
+
+
+def multiscale_permutation_entropy(
+    minute_series: List[float],
+    scales: List[int],
+    *,
+    m: int = 3,
+    tau: int = 1,
+    workers: Optional[int] = None,
+    engine: Optional[str] = None,
+) -> List[float]:
+    return [
+        permutation_entropy_minutes_multiprocessed(
+            coarse_grain(minute_series, scale),
+            m=m,
+            tau=tau,
+            workers=workers,
+            engine=engine,
+        )
+        for scale in scales
+    ]
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import math
+import os
+from array import array
+from threading import Lock
+from typing import Dict, Final, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Float, Integer, cast, func, select, type_coerce
+
+from app.db.db import SessionLocal
+from app.models.instrument import InstrumentNameEnum
+from app.models.instrument_price import PRICE_TICK_SCALE, InstrumentPrice
+from app.services.instrument_ids import get_instrument_id
+
+
+PRICE_STORE_CAPACITY: Final[int] = int(os.getenv("PRICE_STORE_CAPACITY", 200_000))
+
+
+class TickRingBuffer:
+    """
+    Fixed size ring of (epoch seconds, price) ticks kept in packed arrays.
+    Ticks are appended in time order, so lookbacks are answered with a binary search.
+    """
+
+    def __init__(self, capacity: int = PRICE_STORE_CAPACITY):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+
+        self.capacity = capacity
+        self._timestamps = array("d", bytes(8 * capacity))
+        self._prices = array("d", bytes(8 * capacity))
+        self._start = 0
+        self._size = 0
+        # Every tick strictly after this time is in the buffer; nothing is known before loading
+        self._complete_after = math.inf
+        self._lock = Lock()
+
+    @property
+    def complete_after(self) -> float:
+        return self._complete_after
+
+    def __len__(self) -> int:
+        return self._size
+
+    def load(self, ticks: Iterable[Tuple[float, float]], complete: bool) -> None:
+        """
+        Replace the content with ticks in ascending time order.
+        `complete` means there is no older tick than the first one given.
+        """
+        with self._lock:
+            self._start = 0
+            self._size = 0
+            self._complete_after = -math.inf if complete else math.inf
+
+            for timestamp, price in ticks:
+                self._append(timestamp, price)
+
+            # Older ticks sharing the first timestamp may have been cut off by the load limit
+            if not complete and self._size > 0:
+                self._complete_after = self._timestamps[self._start]
+
+    def append(self, timestamp: float, price: float) -> None:
+        with self._lock:
+            self._append(timestamp, price)
+
+    def _append(self, timestamp: float, price: float) -> None:
+        if self._size == self.capacity:
+            evicted = self._timestamps[self._start]
+            self._start = (self._start + 1) % self.capacity
+            self._size -= 1
+            self._complete_after = max(self._complete_after, evicted)
+
+        i = (self._start + self._size) % self.capacity
+        self._timestamps[i] = timestamp
+        self._prices[i] = price
+        self._size += 1
+
+    def _timestamp_at(self, logical_index: int) -> float:
+        return self._timestamps[(self._start + logical_index) % self.capacity]
+
+    def _first_index_since(self, timestamp: float) -> int:
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._timestamp_at(mid) < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return lo
+
+    def window_version(self, timestamp: float) -> Optional[Tuple[int, float, float]]:
+        """
+        (count, first, last timestamp) of the ticks at or after `timestamp`, which changes whenever
+        `since(timestamp)` would return something different; None if the buffer does not cover it.
+        """
+        with self._lock:
+            if timestamp <= self._complete_after:
+                return None
+
+            first = self._first_index_since(timestamp)
+            count = self._size - first
+            if count <= 0:
+                return 0, 0.0, 0.0
+
+            return count, self._timestamp_at(first), self._timestamp_at(self._size - 1)
+
+    def since(self, timestamp: float) -> Tuple[float, List[float], List[float]]:
+        """
+        Timestamps and prices of the complete ticks at or after `timestamp`, oldest first,
+        together with the `complete_after` bound they were read under.
+        """
+        with self._lock:
+            complete_after = self._complete_after
+            first = self._first_index_since(timestamp)
+            while first < self._size and self._timestamp_at(first) <= complete_after:
+                first += 1
+
+            count = self._size - first
+            if count <= 0:
+                return complete_after, [], []
+
+            begin = (self._start + first) % self.capacity
+            end = begin + count
+
+            if end <= self.capacity:
+                return complete_after, self._timestamps[begin:end].tolist(), self._prices[begin:end].tolist()
+
+            wrapped = end - self.capacity
+            return (
+                complete_after,
+                self._timestamps[begin:].tolist() + self._timestamps[:wrapped].tolist(),
+                self._prices[begin:].tolist() + self._prices[:wrapped].tolist(),
+            )
+
+
+_buffers: Dict[InstrumentNameEnum, TickRingBuffer] = {name: TickRingBuffer() for name in InstrumentNameEnum}
+
+
+def get_price_buffer(name: InstrumentNameEnum) -> TickRingBuffer:
+    return _buffers[name]
+
+
+def append_tick(name: InstrumentNameEnum, timestamp: float, price: float) -> None:
+    _buffers[name].append(timestamp, price)
+
+
+def load_price_store(names: Iterable[InstrumentNameEnum] = InstrumentNameEnum) -> None:
+    """
+    Fill the buffers with the newest stored ticks. Must run before the price generation starts.
+    """
+    with SessionLocal() as db:
+        for name in names:
+            buffer = _buffers[name]
+
+            instrument_id = get_instrument_id(name)
+            if instrument_id is None:
+                # Stays unloaded, so lookups keep going to the DB and report the missing instrument
+                continue
+
+            stmt = (
+                select(
+                    cast(func.extract("epoch", InstrumentPrice.created_at), Float),
+                    type_coerce(InstrumentPrice.price, Integer),
+                )
+                .where(InstrumentPrice.instrument_id == instrument_id)
+                .order_by(InstrumentPrice.created_at.desc())
+                .limit(buffer.capacity)
+            )
+            rows = db.execute(stmt).all()
+
+            buffer.load(
+                ((timestamp, ticks / PRICE_TICK_SCALE) for timestamp, ticks in reversed(rows)),
+                complete=len(rows) < buffer.capacity,
+            )
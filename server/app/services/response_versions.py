@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import time
+from typing import Optional, Tuple
+
+from app.models.instrument import InstrumentNameEnum
+from app.services.minute_bars import last_closed_minute
+from app.services.price_store import get_price_buffer
+from app.utils.http_caching import make_etag
+
+
+def price_history_etag(name: str, minutes: int, media_type: str) -> Optional[str]:
+    """
+    Version of a price history response, known without loading it when the lookback is served from memory.
+    None means the caller has to build the response and tag its body instead.
+    """
+    try:
+        instrument_name = InstrumentNameEnum(name)
+    except ValueError:
+        return None
+
+    if minutes <= 0:
+        return None
+
+    version = get_price_buffer(instrument_name).window_version(time.time() - minutes * 60)
+    if version is None:
+        return None
+
+    return make_etag("price", instrument_name.value, minutes, media_type, version)
+
+
+def indicator_version(name: InstrumentNameEnum) -> Optional[Tuple[int, int]]:
+    """
+    Indicators read closed minute bars only, so their value changes when a bar closes
+    or when the lookback moves on to the next minute. None before a bar is known.
+    """
+    last_closed = last_closed_minute(name)
+    if last_closed is None:
+        return None
+
+    return last_closed, int(time.time() // 60)
+
+
+def indicator_etag(indicator: str, name: str, minutes: int, *params: object) -> Optional[str]:
+    try:
+        instrument_name = InstrumentNameEnum(name)
+    except ValueError:
+        return None
+
+    version = indicator_version(instrument_name)
+    if version is None:
+        return None
+
+    return make_etag(indicator, instrument_name.value, minutes, params, version)
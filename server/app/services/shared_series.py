@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from array import array
+from contextlib import contextmanager
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterator, List, Sequence
+
+
+FLOAT64_SIZE = 8
+
+
+@dataclass(frozen=True)
+class SharedSeriesHandle:
+    name: str
+    length: int
+
+
+@contextmanager
+def shared_series(values: Sequence[float]) -> Iterator[SharedSeriesHandle]:
+    """
+    Copy the series once into a float64 shared memory block.
+    Workers get only the (small, picklable) handle and read the part they need.
+    The block is unlinked when the context exits.
+    """
+    n = len(values)
+    shm = SharedMemory(create=True, size=max(1, n) * FLOAT64_SIZE)
+
+    try:
+        view = shm.buf.cast("d")
+        try:
+            view[:n] = array("d", values)
+        finally:
+            view.release()
+
+        yield SharedSeriesHandle(shm.name, n)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def read_shared_series(handle: SharedSeriesHandle, offset: int = 0, length: int | None = None) -> List[float]:
+    if length is None:
+        length = handle.length - offset
+
+    if offset < 0 or length < 0 or offset + length > handle.length:
+        raise ValueError(f"Slice [{offset}, {offset + length}) is out of the shared series bounds")
+
+    shm = SharedMemory(name=handle.name)
+
+    try:
+        view = shm.buf.cast("d")
+        try:
+            return view[offset:offset + length].tolist()
+        finally:
+            view.release()
+    finally:
+        shm.close()
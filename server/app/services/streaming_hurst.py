@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import math
+from collections import deque
+from threading import Lock
+from typing import Deque, Dict, Final, Iterable, List, Optional, Sequence, Tuple
+
+from app.models.instrument import InstrumentNameEnum
+from app.services.hurst_exponent import linreg_slope, logspace_intervals
+from app.services.instruments import load_instrument_price_columns
+from app.utils.tick_time_converter import MinuteCloseTracker, minute_bar_columns_from_ticks
+
+
+STREAMING_HURST_LOOKBACK_MINUTES: Final[int] = 24 * 60
+STREAMING_HURST_MIN_POINTS: Final[int] = 500
+STREAMING_HURST_MIN_WINDOW: Final[int] = 10
+STREAMING_HURST_NUM_WINDOWS: Final[int] = 20
+
+
+def chunk_rs(chunk: List[float], total: float, total_sq: float) -> float:
+    window = len(chunk)
+    m = total / window
+
+    cum = 0.0
+    cum_min = 0.0
+    cum_max = 0.0
+    for v in chunk:
+        cum += (v - m)
+        if cum < cum_min:
+            cum_min = cum
+        if cum > cum_max:
+            cum_max = cum
+    R = cum_max - cum_min
+
+    variance = (total_sq - window * m * m) / (window - 1)
+    if variance <= 0.0:
+        return math.nan
+
+    S = math.sqrt(variance)
+    if not (math.isfinite(R) and math.isfinite(S)):
+        return math.nan
+
+    return R / S
+
+
+class _WindowState:
+    """
+    R/S state for one window size: running sums of the chunk being filled
+    and the R/S values of the completed chunks inside the lookback.
+    """
+
+    __slots__ = ("window", "chunk", "chunk_sum", "chunk_sum_sq", "rs_values", "rs_sum")
+
+    def __init__(self, window: int):
+        self.window = window
+        self.chunk: List[float] = []
+        self.chunk_sum = 0.0
+        self.chunk_sum_sq = 0.0
+        # (index of the first point of the chunk, R/S)
+        self.rs_values: Deque[Tuple[int, float]] = deque()
+        self.rs_sum = 0.0
+
+    def push(self, value: float, index: int) -> None:
+        self.chunk.append(value)
+        self.chunk_sum += value
+        self.chunk_sum_sq += value * value
+
+        if len(self.chunk) < self.window:
+            return
+
+        rs = chunk_rs(self.chunk, self.chunk_sum, self.chunk_sum_sq)
+        if rs > 0.0 and math.isfinite(rs):
+            self.rs_values.append((index - self.window + 1, rs))
+            self.rs_sum += rs
+
+        self.chunk = []
+        self.chunk_sum = 0.0
+        self.chunk_sum_sq = 0.0
+
+    def evict_before(self, first_index: int) -> None:
+        while self.rs_values and self.rs_values[0][0] < first_index:
+            _, rs = self.rs_values.popleft()
+            self.rs_sum -= rs
+
+        if not self.rs_values:
+            self.rs_sum = 0.0
+
+    def mean_rs(self) -> float:
+        if not self.rs_values:
+            return math.nan
+
+        return self.rs_sum / len(self.rs_values)
+
+
+class IncrementalHurst:
+    """
+    Hurst exponent over the minute close increments of one instrument,
+    updated tick by tick. Only the newest chunk of every window changes when
+    a minute closes, so an update costs O(number of windows) amortized.
+
+    Chunks are aligned to the start of the stream rather than to the start
+    of the lookback, so the value can differ slightly from a batch
+    recomputation over the same minutes.
+    """
+
+    def __init__(
+        self,
+        *,
+        lookback_minutes: int = STREAMING_HURST_LOOKBACK_MINUTES,
+        min_points: int = STREAMING_HURST_MIN_POINTS,
+        min_window: int = STREAMING_HURST_MIN_WINDOW,
+        max_window: int | None = None,
+        num_windows: int = STREAMING_HURST_NUM_WINDOWS,
+    ):
+        if max_window is None:
+            max_window = max(min_window + 1, lookback_minutes // 2)
+
+        self.lookback_minutes = lookback_minutes
+        self.min_points = min_points
+        self.windows = [_WindowState(w) for w in logspace_intervals(min_window, max_window, num_windows)]
+
+        self._lock = Lock()
+        self._minutes = MinuteCloseTracker()
+        self._last_close: Optional[float] = None
+        self._num_points = 0
+        self._value: Optional[float] = None
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._value
+
+    def add_tick(self, timestamp: int, price: float) -> Optional[float]:
+        """
+        Feed one tick (epoch seconds, price).
+        Returns the new Hurst exponent when the tick closes a minute bar, otherwise None.
+        """
+        with self._lock:
+            closed = self._minutes.add_tick(timestamp, price)
+            if closed is None:
+                return None
+
+            return self._close_minute(closed[1])
+
+    def add_ticks(self, timestamps: Sequence[float], prices: Sequence[float]) -> None:
+        """
+        Feed ticks in bulk, oldest first. They are aggregated to minute bars column-wise
+        and only the bar closes go through the estimator.
+        """
+        bars = minute_bar_columns_from_ticks(timestamps, prices, fill_missing_minutes=False)
+
+        with self._lock:
+            for closed in self._minutes.add_bars(bars):
+                self._close_minute(closed[1])
+
+    def _close_minute(self, close: float) -> Optional[float]:
+        last_close = self._last_close
+        self._last_close = close
+
+        if last_close is None:
+            return None
+
+        index = self._num_points
+        self._num_points += 1
+
+        first_index = self._num_points - self.lookback_minutes
+        for state in self.windows:
+            state.push(close - last_close, index)
+            state.evict_before(first_index)
+
+        self._value = self._estimate()
+        return self._value
+
+    def _estimate(self) -> Optional[float]:
+        if min(self._num_points, self.lookback_minutes) < self.min_points:
+            return None
+
+        xs: List[float] = []
+        ys: List[float] = []
+
+        for state in self.windows:
+            rs = state.mean_rs()
+            if rs > 0.0 and math.isfinite(rs):
+                xs.append(math.log(state.window))
+                ys.append(math.log(rs))
+
+        if len(xs) < 5:
+            return None
+
+        return linreg_slope(xs, ys)
+
+
+_estimators: Dict[InstrumentNameEnum, IncrementalHurst] = {}
+_estimators_lock = Lock()
+
+
+def get_streaming_hurst(name: InstrumentNameEnum) -> IncrementalHurst:
+    with _estimators_lock:
+        estimator = _estimators.get(name)
+        if estimator is None:
+            estimator = IncrementalHurst()
+            _estimators[name] = estimator
+
+        return estimator
+
+
+def seed_streaming_hurst(names: Iterable[InstrumentNameEnum]) -> None:
+    """
+    Replay the stored ticks of the lookback, so the estimate is available
+    right after startup instead of after the lookback has elapsed again.
+    """
+    for name in names:
+        estimator = get_streaming_hurst(name)
+
+        try:
+            timestamps, prices = load_instrument_price_columns(name.value, estimator.lookback_minutes)
+        except ValueError as e:
+            print(e)
+            continue
+
+        estimator.add_ticks(timestamps, prices)
+
+
+def update_streaming_hurst(name: InstrumentNameEnum, timestamp: int, price: float) -> Optional[float]:
+    return get_streaming_hurst(name).add_tick(timestamp, price)
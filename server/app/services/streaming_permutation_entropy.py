@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import math
+from collections import deque
+from threading import Lock
+from typing import Deque, Dict, Final, Iterable, List, Optional, Sequence, Tuple
+
+from app.models.instrument import InstrumentNameEnum
+from app.services.instruments import load_instrument_price_columns
+from app.services.permutation_entropy import permutation_ids
+from app.utils.tick_time_converter import MinuteCloseTracker, minute_bar_columns_from_ticks
+
+
+ROLLING_PE_POINTS: Final[int] = 500
+ROLLING_PE_M: Final[int] = 3
+ROLLING_PE_TAU: Final[int] = 1
+ROLLING_PE_HISTORY: Final[int] = 240
+
+
+def c_log_c(c: int) -> float:
+    return c * math.log(c) if c > 0 else 0.0
+
+
+class RollingPermutationEntropy:
+    """
+    Normalized permutation entropy of the last `points` minute closes.
+
+    Every closed bar adds one ordinal pattern and evicts the oldest one.
+    With T patterns and counts c_i the entropy is H = log(T) - sum(c_i * log(c_i)) / T,
+    so only the two touched terms of the sum change per bar.
+    """
+
+    def __init__(
+        self,
+        *,
+        points: int = ROLLING_PE_POINTS,
+        m: int = ROLLING_PE_M,
+        tau: int = ROLLING_PE_TAU,
+        history: int = ROLLING_PE_HISTORY,
+    ):
+        if m < 2:
+            raise ValueError("m must be >= 2")
+        if tau < 1:
+            raise ValueError("tau must be >= 1")
+
+        tail = (m - 1) * tau
+        if points <= tail:
+            raise ValueError("points too few for given m and tau")
+
+        self.points = points
+        self.m = m
+        self.tau = tau
+        self.history = history
+        self.capacity = points - tail
+
+        self._perm_to_id = permutation_ids(m)
+        self._h_max = math.log(math.factorial(m))
+
+        self._lock = Lock()
+        self._minutes = MinuteCloseTracker()
+        self._closes: Deque[float] = deque(maxlen=tail + 1)
+        self._patterns: Deque[int] = deque()
+        self._counts = [0] * len(self._perm_to_id)
+        self._sum_c_log_c = 0.0
+        self._history: Deque[Tuple[int, float]] = deque(maxlen=history)
+
+    @property
+    def value(self) -> Optional[float]:
+        with self._lock:
+            return self._history[-1][1] if self._history else None
+
+    def series(self, last: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        (minute start in epoch seconds, PE) for the last `last` closed minutes, oldest first.
+        """
+        with self._lock:
+            values = list(self._history)
+
+        if last is not None:
+            values = values[-last:] if last > 0 else []
+
+        return values
+
+    def add_tick(self, timestamp: int, price: float) -> Optional[float]:
+        """
+        Feed one tick (epoch seconds, price).
+        Returns the new PE when the tick closes a minute bar and the window is full, otherwise None.
+        """
+        with self._lock:
+            closed = self._minutes.add_tick(timestamp, price)
+            if closed is None:
+                return None
+
+            return self._close_minute(*closed)
+
+    def add_ticks(self, timestamps: Sequence[float], prices: Sequence[float]) -> None:
+        """
+        add_tick for a whole replay, oldest first: the minutes are built at once, the patterns only see their closes.
+        """
+        bars = minute_bar_columns_from_ticks(timestamps, prices, fill_missing_minutes=False)
+
+        with self._lock:
+            for closed in self._minutes.add_bars(bars):
+                self._close_minute(*closed)
+
+    def _close_minute(self, minute: int, close: float) -> Optional[float]:
+        self._closes.append(close)
+        if len(self._closes) < self._closes.maxlen:
+            return None
+
+        vals = [self._closes[k * self.tau] for k in range(self.m)]
+        order = tuple(sorted(range(self.m), key=lambda k: (vals[k], k)))
+
+        self._change_count(self._perm_to_id[order], 1)
+        self._patterns.append(self._perm_to_id[order])
+
+        if len(self._patterns) > self.capacity:
+            self._change_count(self._patterns.popleft(), -1)
+
+        if len(self._patterns) < self.capacity:
+            return None
+
+        total = len(self._patterns)
+        H = math.log(total) - self._sum_c_log_c / total
+        Hnorm = max(0.0, H / self._h_max) if self._h_max > 0 else 0.0
+
+        self._history.append((int(minute), Hnorm))
+        return Hnorm
+
+    def _change_count(self, pattern_id: int, delta: int) -> None:
+        c = self._counts[pattern_id]
+        self._counts[pattern_id] = c + delta
+        self._sum_c_log_c += c_log_c(c + delta) - c_log_c(c)
+
+
+_engines: Dict[InstrumentNameEnum, RollingPermutationEntropy] = {}
+_engines_lock = Lock()
+
+
+def get_rolling_permutation_entropy(name: InstrumentNameEnum) -> RollingPermutationEntropy:
+    with _engines_lock:
+        engine = _engines.get(name)
+        if engine is None:
+            engine = RollingPermutationEntropy()
+            _engines[name] = engine
+
+        return engine
+
+
+def seed_rolling_permutation_entropy(names: Iterable[InstrumentNameEnum]) -> None:
+    """
+    Replay enough stored ticks to fill both the pattern window and the PE history.
+    """
+    for name in names:
+        engine = get_rolling_permutation_entropy(name)
+
+        try:
+            timestamps, prices = load_instrument_price_columns(name.value, engine.points + engine.history)
+        except ValueError as e:
+            print(e)
+            continue
+
+        engine.add_ticks(timestamps, prices)
+
+
+def update_rolling_permutation_entropy(name: InstrumentNameEnum, timestamp: int, price: float) -> Optional[float]:
+    return get_rolling_permutation_entropy(name).add_tick(timestamp, price)
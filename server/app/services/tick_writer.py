@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import os
+import time
+import traceback
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
+from queue import Empty, Queue
+from threading import Event, Thread
+from typing import Callable, Final, List, Optional
+
+import psycopg
+from sqlalchemy import insert
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.orm import Session
+
+from app.db.db import SessionLocal
+from app.models.instrument import InstrumentNameEnum
+from app.models.instrument_price import InstrumentPrice, price_to_ticks
+
+
+TICK_WRITER_BATCH_SIZE: Final[int] = int(os.getenv("TICK_WRITER_BATCH_SIZE", 500))
+TICK_WRITER_MAX_LATENCY: Final[float] = int(os.getenv("TICK_WRITER_MAX_LATENCY_MS", 50)) / 1000
+TICK_WRITER_MAX_PENDING: Final[int] = int(os.getenv("TICK_WRITER_MAX_PENDING", 20_000))
+# "insert" (multi-row INSERT ... RETURNING) or "copy" (COPY FROM STDIN, no ids returned)
+TICK_WRITER_METHOD: Final[str] = os.getenv("TICK_WRITER_METHOD", "insert")
+
+FLUSH_RETRY_MIN_SLEEP: Final[float] = 0.1
+FLUSH_RETRY_MAX_SLEEP: Final[float] = 5.0
+
+# Lost connections and an unavailable DB go away by themselves, retrying anything else only repeats it.
+# COPY runs on the raw psycopg connection, so its errors are not wrapped by SQLAlchemy.
+TRANSIENT_FLUSH_ERRORS = (OperationalError, InterfaceError, psycopg.OperationalError, psycopg.InterfaceError)
+
+
+@dataclass
+class PendingTick:
+    instrument_id: int
+    instrument_name: InstrumentNameEnum
+    price: Decimal
+    created_at: datetime
+
+
+CommittedTicksCallback = Callable[[Session, List[tuple[InstrumentNameEnum, InstrumentPrice]]], None]
+
+
+class TickWriter:
+    """
+    Collects ticks from all generator threads and writes them in bulk from one thread.
+
+    A batch is flushed when it reaches `batch_size` or its oldest tick waited `max_latency` seconds.
+    A flush that fails on a transient error (connection lost, DB unavailable) is retried until it succeeds;
+    while the DB is stalled the bounded queue fills up and `submit` blocks the producers (back-pressure).
+    A batch rejected for its content is split, so only the ticks that can never be written are dropped.
+    `on_committed` runs only after the batch is committed.
+    """
+
+    def __init__(
+        self,
+        on_committed: Optional[CommittedTicksCallback] = None,
+        *,
+        batch_size: int = TICK_WRITER_BATCH_SIZE,
+        max_latency: float = TICK_WRITER_MAX_LATENCY,
+        max_pending: int = TICK_WRITER_MAX_PENDING,
+        method: str = TICK_WRITER_METHOD,
+    ):
+        if method not in ("insert", "copy"):
+            raise ValueError(f"Unknown tick writer method: {method}")
+
+        self.on_committed = on_committed
+        self.batch_size = max(1, batch_size)
+        self.max_latency = max_latency
+        self.method = method
+
+        self._queue: Queue[PendingTick] = Queue(maxsize=max_pending)
+        self._stopping = Event()
+        self._thread: Optional[Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Flush what is queued and stop the writer thread.
+        """
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, instrument_id: int, instrument_name: InstrumentNameEnum, price: Decimal) -> PendingTick:
+        # The timestamp is taken here, a batch would otherwise get a single now() for all its rows
+        tick = PendingTick(instrument_id, instrument_name, price, datetime.now(timezone.utc))
+        self._queue.put(tick)
+        return tick
+
+    def _run(self) -> None:
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._collect_batch()
+            if batch:
+                self._flush_until_committed(batch)
+
+    def _collect_batch(self) -> List[PendingTick]:
+        try:
+            first = self._queue.get(timeout=self.max_latency)
+        except Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_latency
+
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+
+        return batch
+
+    def _flush_until_committed(self, batch: List[PendingTick]) -> None:
+        sleep_time = FLUSH_RETRY_MIN_SLEEP
+
+        while True:
+            with SessionLocal() as db:
+                try:
+                    committed = self._write(db, batch)
+                    db.commit()
+                except TRANSIENT_FLUSH_ERRORS as e:
+                    print("[!] Tick batch flush failed, retrying:", e)
+                    db.rollback()
+                    time.sleep(sleep_time)
+                    sleep_time = min(FLUSH_RETRY_MAX_SLEEP, sleep_time * 2)
+                    continue
+                except Exception as e:
+                    db.rollback()
+                    self._flush_rejected(batch, e)
+                    return
+
+                if self.on_committed is not None:
+                    try:
+                        self.on_committed(db, committed)
+                    except Exception:
+                        traceback.print_exc()
+                        db.rollback()
+
+                return
+
+    def _flush_rejected(self, batch: List[PendingTick], error: Exception) -> None:
+        if len(batch) == 1:
+            tick = batch[0]
+            print(
+                f"[!] Dropping tick {tick.instrument_name.value} {tick.price} at {tick.created_at.isoformat()}"
+                f" that cannot be written: {error}"
+            )
+            return
+
+        # Halve until the bad ticks are isolated, the rest is written as usual
+        middle = len(batch) // 2
+        self._flush_until_committed(batch[:middle])
+        self._flush_until_committed(batch[middle:])
+
+    def _write(self, db: Session, batch: List[PendingTick]) -> List[tuple[InstrumentNameEnum, InstrumentPrice]]:
+        if self.method == "copy":
+            ids: List[Optional[int]] = [None] * len(batch)
+            self._copy(db, batch)
+        else:
+            rows = [
+                {
+                    "instrument_id": tick.instrument_id,
+                    "price": tick.price,
+                    "created_at": tick.created_at,
+                    "updated_at": tick.created_at,
+                }
+                for tick in batch
+            ]
+            # SQLAlchemy sends these as multi-row VALUES and keeps RETURNING in input order
+            ids = list(db.scalars(insert(InstrumentPrice).returning(InstrumentPrice.id, sort_by_parameter_order=True), rows))
+
+        return [
+            (
+                tick.instrument_name,
+                InstrumentPrice(
+                    id=tick_id,
+                    instrument_id=tick.instrument_id,
+                    price=tick.price,
+                    created_at=tick.created_at,
+                    updated_at=tick.created_at,
+                ),
+            )
+            for tick, tick_id in zip(batch, ids)
+        ]
+
+    def _copy(self, db: Session, batch: List[PendingTick]) -> None:
+        raw_connection = db.connection().connection.driver_connection
+
+        with raw_connection.cursor() as cursor:
+            with cursor.copy(
+                "COPY instruments_prices (instrument_id, price_ticks, created_at, updated_at) FROM STDIN"
+            ) as copy:
+                for tick in batch:
+                    copy.write_row((tick.instrument_id, price_to_ticks(tick.price), tick.created_at, tick.created_at))
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import asyncio
+import atexit
+import os
+from multiprocessing import Pool, cpu_count, resource_tracker
+from multiprocessing.pool import Pool as PoolType
+from threading import Lock
+from typing import Any, Callable, Final, Optional
+
+
+MAX_POOL_WORKERS: Final[int] = int(os.getenv("ANALYTICS_POOL_WORKERS", max(1, cpu_count() - 1)))
+
+_pool: Optional[PoolType] = None
+_pool_lock = Lock()
+
+
+def _warm_up(_: int) -> int:
+    return os.getpid()
+
+
+def start_worker_pool(processes: Optional[int] = None) -> PoolType:
+    """
+    Start the process pool shared by all indicator computations.
+    Must be called from the main process before any other threads are started.
+    """
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            size = max(1, processes or MAX_POOL_WORKERS)
+            # Workers must inherit the parent's tracker, otherwise each of them
+            # would start its own and try to unlink the shared series on exit
+            resource_tracker.ensure_running()
+            _pool = Pool(processes=size)
+            # Make sure every worker is forked and idle before the first request
+            _pool.map(_warm_up, range(size), chunksize=1)
+            atexit.register(shutdown_worker_pool)
+
+        return _pool
+
+
+def get_worker_pool() -> PoolType:
+    if _pool is None:
+        return start_worker_pool()
+
+    return _pool
+
+
+def pool_size() -> int:
+    pool = get_worker_pool()
+    return pool._processes  # type: ignore[attr-defined]
+
+
+def clamp_workers(requested: Optional[int]) -> int:
+    """
+    The caller can ask for any number of workers, but the pool is bounded.
+    Oversized requests are clamped to the pool size and their tasks
+    are queued behind the ones already submitted.
+    """
+    size = pool_size()
+
+    if requested is None or requested <= 0:
+        return size
+
+    return min(requested, size)
+
+
+async def run_in_pool(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run `func(*args)` in one pool worker and await its result without blocking the event loop.
+    The pool reports back from its result thread, so the future is resolved through the loop.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(result: Any) -> None:
+        if not future.done():
+            future.set_result(result)
+
+    def reject(error: BaseException) -> None:
+        if not future.done():
+            future.set_exception(error)
+
+    get_worker_pool().apply_async(
+        func,
+        args,
+        callback=lambda result: loop.call_soon_threadsafe(resolve, result),
+        error_callback=lambda error: loop.call_soon_threadsafe(reject, error),
+    )
+
+    return await future
+
+
+def shutdown_worker_pool() -> None:
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.terminate()
+            _pool.join()
+            _pool = None
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+from typing import Final, Optional
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, gzip is always available
+    zstandard = None
+
+
+# Smaller bodies are sent as they are, compressing them costs more than it saves
+COMPRESSION_MIN_BYTES: Final[int] = 1024
+GZIP_LEVEL: Final[int] = 6
+ZSTD_LEVEL: Final[int] = 3
+
+
+def supported_encodings() -> list[str]:
+    """
+    Content codings in order of preference.
+    """
+    return (["zstd"] if zstandard is not None else []) + ["gzip"]
+
+
+def negotiate_content_encoding(accept_encoding: str | None) -> Optional[str]:
+    """
+    Best supported coding the client accepts with a non-zero q, or None for identity.
+    """
+    if not accept_encoding:
+        return None
+
+    accepted: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+
+    candidates = [
+        coding for coding in supported_encodings()
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0
+    ]
+    if not candidates:
+        return None
+
+    return max(candidates, key=lambda coding: accepted.get(coding, accepted.get("*", 0.0)))
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def make_etag(*parts: object) -> str:
+    """
+    Opaque (unquoted) entity tag for a response version described by `parts`.
+    """
+    return hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=12).hexdigest()
+
+
+def body_etag(body: bytes) -> str:
+    """
+    Entity tag of an already built body, for responses whose version is not known upfront.
+    """
+    return hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+def format_weak_etag(etag: str) -> str:
+    return f'W/"{etag}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Weak comparison of an If-None-Match header against `etag`, as required for GET.
+    """
+    if not if_none_match:
+        return False
+
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate.strip('"') == etag:
+            return True
+
+    return False
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import asyncio
+import zlib
+from dataclasses import dataclass
+from typing import AsyncIterable, AsyncIterator, Final, Iterable, Iterator, Union
+
+from app.utils.http_caching import COMPRESSION_MIN_BYTES, GZIP_LEVEL, ZSTD_LEVEL, zstandard
+
+
+LAST_CHUNK: Final[bytes] = b"0\r\n\r\n"
+
+
+@dataclass
+class StreamingResponse:
+    """
+    A response sent with Transfer-Encoding: chunked.
+    `head` is the status line and headers, `chunks` the body pieces as they are produced.
+    """
+    head: bytes
+    chunks: Union[Iterator[bytes], AsyncIterator[bytes]]
+
+
+def chunk_frame(data: bytes) -> list[bytes]:
+    """
+    Buffers of one chunk, to be written with scatter-gather instead of being joined.
+    """
+    return [b"%X\r\n" % len(data), data, b"\r\n"]
+
+
+def stream_compressor(encoding: str):
+    if encoding == "gzip":
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def compress_stream(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """
+    Compress a body piece by piece. The compressor buffers small pieces, so only full blocks come out.
+    """
+    compressor = stream_compressor(encoding)
+
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+
+    yield compressor.flush()
+
+
+async def compress_stream_async(chunks: AsyncIterable[bytes], encoding: str) -> AsyncIterator[bytes]:
+    """
+    compress_stream for the event loop: pieces worth compressing are compressed in a thread.
+    """
+    compressor = stream_compressor(encoding)
+
+    async for chunk in chunks:
+        if len(chunk) >= COMPRESSION_MIN_BYTES:
+            compressed = await asyncio.to_thread(compressor.compress, chunk)
+        else:
+            compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+
+    yield await asyncio.to_thread(compressor.flush)
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import struct
+import sys
+from array import array
+from typing import Final, Sequence
+
+
+PRICE_COLUMNS_MEDIA_TYPE: Final[str] = "application/vnd.pytrade.price-columns"
+
+# magic, tick count, price scale
+PRICE_COLUMNS_HEADER = struct.Struct("<4sII")
+PRICE_COLUMNS_MAGIC: Final[bytes] = b"PTC1"
+
+
+def encode_price_columns(timestamps: Sequence[float], prices: Sequence[float], price_scale: int) -> bytes:
+    """
+    Little-endian columnar payload, newest tick first (same order as the JSON response):
+        header   "PTC1", uint32 count, uint32 price scale
+        int64    epoch milliseconds x count
+        int32    price * price scale x count
+    """
+    if len(timestamps) != len(prices):
+        raise ValueError("timestamps and prices must have the same length")
+
+    timestamp_column = array("q", [round(timestamp * 1000) for timestamp in reversed(timestamps)])
+    price_column = array("i", [round(price * price_scale) for price in reversed(prices)])
+
+    if sys.byteorder == "big":
+        timestamp_column.byteswap()
+        price_column.byteswap()
+
+    return (
+        PRICE_COLUMNS_HEADER.pack(PRICE_COLUMNS_MAGIC, len(timestamp_column), price_scale)
+        + timestamp_column.tobytes()
+        + price_column.tobytes()
+    )
+
+
+def accepts_price_columns(accept: str | None) -> bool:
+    """
+    True when the Accept header lists the columnar media type with a non-zero q.
+    Anything else, including */*, keeps the JSON response.
+    """
+    if not accept:
+        return False
+
+    for media_range in accept.split(","):
+        media_type, *params = [part.strip() for part in media_range.split(";")]
+        if media_type.lower() != PRICE_COLUMNS_MEDIA_TYPE:
+            continue
+
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+
+        return True
+
+    return False
@@ -1,8 +1,13 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from datetime import datetime, timedelta
-from typing import Iterable, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional
+    np = None
 
 
 Tick = Tuple[datetime, float]
@@ -79,3 +84,238 @@ def minute_bars_from_ticks(
         minute_bars.append(MinuteBar(cur_minute, o, h, l, c, tick_count))
 
     return minute_bars
+
+
+@dataclass
+class MinuteBarColumns:
+    """
+    Minute bars as parallel columns, oldest first. `minutes` are the bar starts in epoch seconds.
+    """
+    minutes: List[int]
+    open: List[float]
+    high: List[float]
+    low: List[float]
+    close: List[float]
+    tick_count: List[int]
+
+    def __len__(self) -> int:
+        return len(self.minutes)
+
+    def bars(self, start: int = 0, stop: Optional[int] = None) -> List[MinuteBar]:
+        """
+        The bars start:stop as MinuteBar objects, for the callers that store or serialize them one by one.
+        """
+        return [
+            MinuteBar(datetime.fromtimestamp(minute, timezone.utc), o, h, l, c, tick_count)
+            for minute, o, h, l, c, tick_count in zip(
+                self.minutes[start:stop], self.open[start:stop], self.high[start:stop],
+                self.low[start:stop], self.close[start:stop], self.tick_count[start:stop],
+            )
+        ]
+
+
+def minute_bar_columns_from_ticks(
+    timestamps: Sequence[float],
+    prices: Sequence[float],
+    fill_missing_minutes: bool = True,
+) -> MinuteBarColumns:
+    """
+    Convert ticks given as columns (epoch seconds, prices) to minute bars.
+    The ticks must already be in ascending time order, as the price queries and the price store return them;
+    they are checked, not sorted. Missing minutes are filled with the previous close and a tick count of 0.
+    """
+    if len(timestamps) != len(prices):
+        raise ValueError("timestamps and prices must have the same length")
+
+    if np is not None:
+        return _minute_bar_columns_numpy(timestamps, prices, fill_missing_minutes)
+
+    return _minute_bar_columns_python(timestamps, prices, fill_missing_minutes)
+
+
+def _minute_bar_columns_numpy(timestamps: Sequence[float], prices: Sequence[float], fill_missing_minutes: bool) -> MinuteBarColumns:
+    ts = np.asarray(timestamps, dtype=np.float64)
+    px = np.asarray(prices, dtype=np.float64)
+    if ts.size == 0:
+        return MinuteBarColumns([], [], [], [], [], [])
+
+    minute = (ts // 60).astype(np.int64)
+
+    step = np.diff(minute)
+    if (step < 0).any():
+        i = int(np.argmax(step < 0))
+        raise ValueError(f"Ticks are not sorted: got {ts[i + 1]} after {ts[i]}")
+
+    # First tick of every minute, the bars are the runs between them
+    starts = np.concatenate(([0], np.flatnonzero(step) + 1))
+    ends = np.append(starts[1:], px.size)
+
+    bar_minutes = minute[starts]
+    o = px[starts]
+    h = np.maximum.reduceat(px, starts)
+    l = np.minimum.reduceat(px, starts)
+    c = px[ends - 1]
+    tick_count = ends - starts
+
+    if fill_missing_minutes and bar_minutes[-1] - bar_minutes[0] + 1 > bar_minutes.size:
+        offsets = bar_minutes - bar_minutes[0]
+        every_minute = np.arange(offsets[-1] + 1)
+
+        # Bar at or before every minute: itself where there is one, otherwise the one the gap follows
+        source = np.searchsorted(offsets, every_minute, side="right") - 1
+        present = offsets[source] == every_minute
+        carried = c[source]
+
+        bar_minutes = bar_minutes[0] + every_minute
+        o = np.where(present, o[source], carried)
+        h = np.where(present, h[source], carried)
+        l = np.where(present, l[source], carried)
+        c = carried
+        tick_count = np.where(present, tick_count[source], 0)
+
+    return MinuteBarColumns(
+        (bar_minutes * 60).tolist(), o.tolist(), h.tolist(), l.tolist(), c.tolist(), tick_count.tolist(),
+    )
+
+
+def _minute_bar_columns_python(timestamps: Sequence[float], prices: Sequence[float], fill_missing_minutes: bool) -> MinuteBarColumns:
+    bars = MinuteBarColumns([], [], [], [], [], [])
+    cur_minute: Optional[int] = None
+    o = h = l = c = 0.0
+    tick_count = 0
+
+    def flush() -> None:
+        bars.minutes.append(cur_minute * 60)
+        bars.open.append(o)
+        bars.high.append(h)
+        bars.low.append(l)
+        bars.close.append(c)
+        bars.tick_count.append(tick_count)
+
+    for ts, price in zip(timestamps, prices):
+        m = int(ts // 60)
+
+        if m == cur_minute:
+            if price > h:
+                h = price
+            if price < l:
+                l = price
+            c = price
+            tick_count += 1
+            continue
+
+        if cur_minute is not None:
+            if m < cur_minute:
+                raise ValueError(f"Ticks are not sorted: got {ts} after {cur_minute * 60}")
+
+            flush()
+
+            if fill_missing_minutes:
+                for gap_minute in range(cur_minute + 1, m):
+                    bars.minutes.append(gap_minute * 60)
+                    bars.open.append(c)
+                    bars.high.append(c)
+                    bars.low.append(c)
+                    bars.close.append(c)
+                    bars.tick_count.append(0)
+
+        cur_minute = m
+        o = h = l = c = price
+        tick_count = 1
+
+    if cur_minute is not None:
+        flush()
+
+    return bars
+
+
+class MinuteCloseTracker:
+    """
+    Follows a live tick stream (epoch seconds, price) and reports
+    the close of every minute bar as soon as the next minute starts.
+    """
+
+    def __init__(self):
+        self.cur_minute: Optional[int] = None
+        self.cur_close = 0.0
+
+    def add_tick(self, timestamp: int, price: float) -> Optional[Tuple[int, float]]:
+        """
+        Returns (minute start in epoch seconds, close) of the bar closed by this tick, otherwise None.
+        Late ticks from an already closed minute are ignored.
+        """
+        # Seeding replays float epoch seconds, the reported minutes stay ints like the live ones
+        minute = int(timestamp // 60)
+
+        if self.cur_minute is None:
+            self.cur_minute = minute
+            self.cur_close = price
+            return None
+
+        if minute < self.cur_minute:
+            return None
+
+        if minute == self.cur_minute:
+            self.cur_close = price
+            return None
+
+        closed = (self.cur_minute * 60, self.cur_close)
+        self.cur_minute = minute
+        self.cur_close = price
+
+        return closed
+
+    def add_bars(self, bars: MinuteBarColumns) -> List[Tuple[int, float]]:
+        """
+        Follow already built bars instead of their ticks, one step per bar.
+        Returns what add_tick would have reported for the ticks, the last bar stays open.
+        """
+        closed: List[Tuple[int, float]] = []
+
+        for minute, close in zip(bars.minutes, bars.close):
+            bar = self.add_tick(minute, close)
+            if bar is not None:
+                closed.append(bar)
+
+        return closed
+
+
+def rollup_bars(bars: Iterable[MinuteBar], seconds: int) -> List[MinuteBar]:
+    """
+    Aggregate sorted bars into bars of `seconds` length, aligned to the epoch.
+    The `minute` of a rolled up bar is the start of its period.
+    """
+    result: List[MinuteBar] = []
+    cur_start: Optional[int] = None
+    cur: Optional[MinuteBar] = None
+
+    for bar in bars:
+        start = int(bar.minute.timestamp()) // seconds * seconds
+
+        if cur is not None and start == cur_start:
+            cur = MinuteBar(
+                cur.minute,
+                cur.open,
+                max(cur.high, bar.high),
+                min(cur.low, bar.low),
+                bar.close,
+                cur.tick_count + bar.tick_count,
+            )
+            continue
+
+        if cur is not None and start < cur_start:
+            raise ValueError(f"Bars are not sorted: got {bar.minute} after {cur.minute}")
+
+        if cur is not None:
+            result.append(cur)
+
+        cur_start = start
+        cur = MinuteBar(
+            datetime.fromtimestamp(start, bar.minute.tzinfo),
+            bar.open, bar.high, bar.low, bar.close, bar.tick_count,
+        )
+
+    if cur is not None:
+        result.append(cur)
+
+    return result